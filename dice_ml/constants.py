@@ -16,6 +16,14 @@ class SamplingStrategy:
     KdTree = 'kdtree'
 
 
+class SamplingDesigns:
+    Uniform = 'uniform'
+    Sobol = 'sobol'
+    LatinHypercube = 'lhs'
+
+    ALL = [Uniform, Sobol, LatinHypercube]
+
+
 class ModelTypes:
     Classifier = 'classifier'
     Regressor = 'regressor'
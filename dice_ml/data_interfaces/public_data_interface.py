@@ -81,6 +81,8 @@ class PublicData(_BaseData):
         #     self.labelencoder[column] = LabelEncoder()
         #     self.label_encoded_data[column] = self.labelencoder[column].fit_transform(self.data_df[column])
 
+        # statistics of the training data are computed once and reused across explainer calls
+        self.invalidate_statistics()
         self._validate_and_set_permitted_range(params=params)
 
         # should move the below snippet to model agnostic dice interfaces
@@ -89,6 +91,43 @@ class PublicData(_BaseData):
         #     self.max_range = max(self.max_range, self.permitted_range[feature][1])
 
         self._validate_and_set_data_name(params=params)
+        self._get_statistics()
+
+    def invalidate_statistics(self):
+        """Drops the cached statistics of the training data. They are recomputed on next use. The cache is
+           also dropped automatically when data_df is replaced or its shape or columns change; call this
+           method after modifying the values of data_df in place."""
+        self._statistics = None
+        self._statistics_fingerprint = None
+
+    def _get_statistics(self):
+        """Returns the cache of statistics of the training data, computing the basic statistics if needed."""
+        fingerprint = (id(self.data_df), self.data_df.shape, tuple(self.data_df.columns))
+        if self._statistics is None or self._statistics_fingerprint != fingerprint:
+            statistics = {}
+            # min and max of continuous features, kept as the scalars of the column dtype
+            statistics['min'] = {feature: self.data_df[feature].min() for feature in self.continuous_feature_names}
+            statistics['max'] = {feature: self.data_df[feature].max() for feature in self.continuous_feature_names}
+            statistics['min_array'] = np.array(
+                [statistics['min'][feature] for feature in self.continuous_feature_names], dtype=float)
+            statistics['max_array'] = np.array(
+                [statistics['max'][feature] for feature in self.continuous_feature_names], dtype=float)
+            self._statistics = statistics
+            self._statistics_fingerprint = fingerprint
+        return self._statistics
+
+    def _get_cached_statistic(self, key, compute_fn):
+        """Returns a statistic of the training data from the cache, computing it with compute_fn if needed."""
+        statistics = self._get_statistics()
+        if key not in statistics:
+            statistics[key] = compute_fn()
+        return statistics[key]
+
+    def get_continuous_min_max(self):
+        """Gets the min and max values of the continuous features in the training data as two arrays,
+           in the order of continuous_feature_names."""
+        statistics = self._get_statistics()
+        return statistics['min_array'].copy(), statistics['max_array'].copy()
 
     def _validate_and_set_dataframe(self, params):
         """Validate and set the dataframe."""
@@ -152,10 +191,10 @@ class PublicData(_BaseData):
 
     def get_features_range(self, permitted_range_input=None):
         ranges = {}
+        statistics = self._get_statistics()
         # Getting default ranges based on the dataset
         for feature_name in self.continuous_feature_names:
-            ranges[feature_name] = [
-                self.data_df[feature_name].min(), self.data_df[feature_name].max()]
+            ranges[feature_name] = [statistics['min'][feature_name], statistics['max'][feature_name]]
         for feature_name in self.categorical_feature_names:
             ranges[feature_name] = self.data_df[feature_name].unique().tolist()
         feature_ranges_orig = ranges.copy()
@@ -165,6 +204,28 @@ class PublicData(_BaseData):
                 ranges[feature_name] = feature_range
         return ranges, feature_ranges_orig
 
+    def get_categorical_levels_index(self, permitted=False):
+        """Gets a hashed index of the levels of every categorical feature, built once and cached.
+
+        :param permitted: If True, the levels are taken from permitted_range instead of the training data.
+
+        :returns: A dictionary with categorical feature names as keys and pandas Index objects as values.
+                  Membership of many values is checked at once with Index.get_indexer, which returns -1
+                  for values that are not levels of the feature.
+        """
+        return self._get_cached_statistic(('levels_index', permitted),
+                                          lambda: self._compute_categorical_levels_index(permitted))
+
+    def _compute_categorical_levels_index(self, permitted):
+        levels_index = {}
+        for feature_name in self.categorical_feature_names:
+            if permitted:
+                levels = self.permitted_range[feature_name]
+            else:
+                levels = self.data_df[feature_name].unique().tolist()
+            levels_index[feature_name] = pd.Index(levels, dtype=object).unique()
+        return levels_index
+
     def get_data_type(self, col):
         """Infers data type of a continuous feature from the training data."""
         if (self.data_df[col].dtype == np.int64) or (self.data_df[col].dtype == np.int32):
@@ -181,17 +242,18 @@ class PublicData(_BaseData):
     def normalize_data(self, df):
         """Normalizes continuous features to make them fall in the range [0,1]."""
         result = df.copy()
+        statistics = self._get_statistics()
         if isinstance(df, pd.DataFrame) or isinstance(df, dict):
             for feature_name in self.continuous_feature_names:
-                max_value = self.data_df[feature_name].max()
-                min_value = self.data_df[feature_name].min()
+                max_value = statistics['max'][feature_name]
+                min_value = statistics['min'][feature_name]
                 result[feature_name] = (df[feature_name] - min_value) / (max_value - min_value)
         else:
             result = result.astype('float')
             for feature_index in self.continuous_feature_indexes:
                 feature_name = self.feature_names[feature_index]
-                max_value = self.data_df[feature_name].max()
-                min_value = self.data_df[feature_name].min()
+                max_value = statistics['max'][feature_name]
+                min_value = statistics['min'][feature_name]
                 if len(df.shape) == 1:
                     value = (df[feature_index] - min_value) / (max_value - min_value)
                     result[feature_index] = value
@@ -204,9 +266,10 @@ class PublicData(_BaseData):
         if len(df) == 0:
             return df
         result = df.copy()
+        statistics = self._get_statistics()
         for feature_name in self.continuous_feature_names:
-            max_value = self.data_df[feature_name].max()
-            min_value = self.data_df[feature_name].min()
+            max_value = statistics['max'][feature_name]
+            min_value = statistics['min'][feature_name]
             result[feature_name] = (
                                            df[feature_name] * (max_value - min_value)) + min_value
         return result
@@ -220,12 +283,13 @@ class PublicData(_BaseData):
         both continuous and discrete when provided in _generate_counterfactuals.
         """
         feature_range = {}
+        statistics = self._get_statistics()
 
         for idx, feature_name in enumerate(self.feature_names):
             feature_range[feature_name] = []
             if feature_name in self.continuous_feature_names:
-                max_value = self.data_df[feature_name].max()
-                min_value = self.data_df[feature_name].min()
+                max_value = statistics['max'][feature_name]
+                min_value = statistics['min'][feature_name]
 
                 if normalized:
                     minx = (feature_range_input[feature_name]
@@ -246,10 +310,11 @@ class PublicData(_BaseData):
         """Gets the min/max value of features in normalized or de-normalized form."""
         minx = np.array([[0.0] * len(self.ohe_encoded_feature_names)])
         maxx = np.array([[1.0] * len(self.ohe_encoded_feature_names)])
+        statistics = self._get_statistics()
 
         for idx, feature_name in enumerate(self.continuous_feature_names):
-            max_value = self.data_df[feature_name].max()
-            min_value = self.data_df[feature_name].min()
+            max_value = statistics['max'][feature_name]
+            min_value = statistics['min'][feature_name]
 
             if normalized:
                 minx[0][idx] = (self.permitted_range[feature_name]
@@ -282,6 +347,9 @@ class PublicData(_BaseData):
 
     def get_mads(self, normalized=False):
         """Computes Median Absolute Deviation of features."""
+        return dict(self._get_cached_statistic(('mads', normalized), lambda: self._compute_mads(normalized)))
+
+    def _compute_mads(self, normalized):
         mads = {}
         if normalized is False:
             for feature in self.continuous_feature_names:
@@ -308,20 +376,25 @@ class PublicData(_BaseData):
 
     def get_quantiles_from_training_data(self, quantile=0.05, normalized=False):
         """Computes required quantile of Absolute Deviations of features."""
-
+        deviations = self._get_cached_statistic(('deviations', normalized),
+                                                lambda: self._compute_deviations(normalized))
         quantiles = {}
+        for feature in self.continuous_feature_names:
+            quantiles[feature] = np.quantile(deviations[feature], quantile)
+        return quantiles
+
+    def _compute_deviations(self, normalized):
+        """Computes, for every continuous feature, the absolute deviations of the unique values of the
+           feature from their median. Quantiles of these deviations are taken by get_quantiles_from_training_data."""
         if normalized is False:
-            for feature in self.continuous_feature_names:
-                quantiles[feature] = np.quantile(
-                    abs(list(set(self.data_df[feature].tolist())) - np.median(
-                        list(set(self.data_df[feature].tolist())))), quantile)
+            train_df = self.data_df
         else:
-            normalized_train_df = self.normalize_data(self.data_df)
-            for feature in self.continuous_feature_names:
-                quantiles[feature] = np.quantile(
-                    abs(list(set(normalized_train_df[feature].tolist())) - np.median(
-                        list(set(normalized_train_df[feature].tolist())))), quantile)
-        return quantiles
+            train_df = self.normalize_data(self.data_df)
+        deviations = {}
+        for feature in self.continuous_feature_names:
+            unique_values = list(set(train_df[feature].tolist()))
+            deviations[feature] = np.sort(abs(unique_values - np.median(unique_values)))
+        return deviations
 
     def create_ohe_params(self):
         if len(self.categorical_feature_names) > 0:
@@ -420,6 +493,13 @@ class PublicData(_BaseData):
 
     def get_decimal_precisions(self, output_type="list"):
         """"Gets the precision of continuous features in the data."""
+        precisions, precisions_dict = self._get_cached_statistic('precisions', self._compute_decimal_precisions)
+        if output_type == "list":
+            return list(precisions)
+        elif output_type == "dict":
+            return defaultdict(int, precisions_dict)
+
+    def _compute_decimal_precisions(self):
         # if the precision of a continuous feature is not given, we use the maximum precision of the modes to capture the
         # precision of majority of values in the column.
         precisions_dict = defaultdict(int)
@@ -437,10 +517,7 @@ class PublicData(_BaseData):
                         maxp = prec
                 precisions[ix] = maxp
                 precisions_dict[col] = maxp
-        if output_type == "list":
-            return precisions
-        elif output_type == "dict":
-            return precisions_dict
+        return precisions, precisions_dict
 
     def get_decoded_data(self, data, encoding='one-hot'):
         """Gets the original data from encoded data."""
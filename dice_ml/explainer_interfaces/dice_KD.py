@@ -66,7 +66,7 @@ class DiceKD(ExplainerBase):
                                 values in the training set; the weight for a categorical feature is equal to 1 by default.
         :param stopping_threshold: Minimum threshold for counterfactuals target class probability.
         :param posthoc_sparsity_param: Parameter for the post-hoc operation on continuous features to enhance sparsity.
-        :param posthoc_sparsity_algorithm: Perform either linear or binary search. Takes "linear" or "binary".
+        :param posthoc_sparsity_algorithm: Perform linear, binary or grid search. Takes "linear", "binary" or "grid".
                                            Prefer binary search when a feature range is large (for instance, income
                                            varying from 10k to 1000k) and only if the features share a monotonic
                                            relationship with predicted outcome in the model.
@@ -75,57 +75,119 @@ class DiceKD(ExplainerBase):
         :return: A CounterfactualExamples object to store and visualize the resulting counterfactual explanations
                  (see diverse_counterfactuals.py).
         """
-        data_df_copy = self.data_interface.data_df.copy()
-
-        features_to_vary = self.setup(features_to_vary, permitted_range, query_instance, feature_weights)
-
-        # Prepares user defined query_instance for DiCE.
-        query_instance_orig = query_instance.copy()
-        query_instance = self.data_interface.prepare_query_instance(query_instance=query_instance)
-
-        # find the predicted value of query_instance
-        test_pred = self.predict_fn(query_instance)[0]
-
-        query_instance[self.data_interface.outcome_name] = test_pred
-        desired_class = self.misc_init(stopping_threshold, desired_class, desired_range, test_pred)
-        if desired_range is not None:
-            if desired_range[0] > desired_range[1]:
-                raise ValueError("Invalid Range!")
-
-        if desired_class == "opposite" and self.model.model_type == ModelTypes.Classifier:
-            if self.num_output_nodes == 2:
-                desired_class = 1.0 - test_pred
-
-            elif self.num_output_nodes > 2:
-                raise ValueError("Desired class can't be opposite if the number of classes is more than 2.")
-
-        if isinstance(desired_class, int) and desired_class > self.num_output_nodes - 1:
-            raise ValueError("Desired class should be within 0 and num_classes-1.")
-
-        # Partitioned dataset and KD Tree for each class (binary) of the dataset
-        self.dataset_with_predictions, self.KD_tree, self.predictions = \
-            self.build_KD_tree(data_df_copy, desired_range, desired_class, self.predicted_outcome_name)
-
-        query_instance, cfs_preds = self.find_counterfactuals(data_df_copy,
-                                                              query_instance, query_instance_orig,
-                                                              desired_range,
-                                                              desired_class,
-                                                              total_CFs, features_to_vary,
-                                                              permitted_range,
-                                                              sparsity_weight,
-                                                              stopping_threshold,
-                                                              posthoc_sparsity_param,
-                                                              posthoc_sparsity_algorithm, verbose)
-        self.cfs_preds = cfs_preds
-
-        return exp.CounterfactualExamples(data_interface=self.data_interface,
-                                          final_cfs_df=self.final_cfs_df,
-                                          test_instance_df=query_instance,
-                                          final_cfs_df_sparse=self.final_cfs_df_sparse,
-                                          posthoc_sparsity_param=posthoc_sparsity_param,
-                                          desired_range=desired_range,
-                                          desired_class=desired_class,
-                                          model_type=self.model.model_type)
+        return self._generate_counterfactuals_batch(
+            query_instance, total_CFs, desired_range=desired_range, desired_class=desired_class,
+            features_to_vary=features_to_vary, permitted_range=permitted_range, sparsity_weight=sparsity_weight,
+            feature_weights=feature_weights, stopping_threshold=stopping_threshold,
+            posthoc_sparsity_param=posthoc_sparsity_param, posthoc_sparsity_algorithm=posthoc_sparsity_algorithm,
+            verbose=verbose)[0]
+
+    def _generate_counterfactuals_batch(self, query_instances, total_CFs, desired_range=None,
+                                        desired_class="opposite", features_to_vary="all",
+                                        permitted_range=None, sparsity_weight=1,
+                                        feature_weights="inverse_mad", stopping_threshold=0.5,
+                                        posthoc_sparsity_param=0.1, posthoc_sparsity_algorithm="linear",
+                                        verbose=False):
+        """Generates diverse counterfactual explanations for a block of query instances. Setup and the
+           predictions of the query instances are done once for the whole block, and the KD tree of each
+           desired class is built once per explainer, see get_KD_tree.
+
+        :param query_instances: A dataframe with one or more rows. Test points of interest.
+        :param other_parameters: These are the same as the _generate_counterfactuals method.
+
+        :return: A list of CounterfactualExamples objects, one per query instance.
+        """
+        features_to_vary = self.setup(features_to_vary, permitted_range, query_instances, feature_weights)
+
+        # Prepares user defined query_instances for DiCE.
+        query_instances = self.data_interface.prepare_query_instance(query_instance=query_instances)
+
+        # find the predicted values of all query_instances at once
+        test_preds = self.predict_fn(query_instances)
+
+        num_queries = query_instances.shape[0]
+        test_instance_dfs = []
+        final_cfs_dfs = []
+        cfs_preds_list = []
+        query_desired_classes = []
+        target_cf_classes = []
+        stopping_thresholds = []
+        for ix in range(num_queries):
+            query_instance = query_instances[ix:(ix+1)].reset_index(drop=True)
+            query_instance_orig = query_instance.copy()
+            test_pred = test_preds[ix]
+
+            query_instance[self.data_interface.outcome_name] = test_pred
+            query_desired_class = self.misc_init(stopping_threshold, desired_class, desired_range, test_pred)
+            if desired_range is not None:
+                if desired_range[0] > desired_range[1]:
+                    raise ValueError("Invalid Range!")
+
+            if query_desired_class == "opposite" and self.model.model_type == ModelTypes.Classifier:
+                if self.num_output_nodes == 2:
+                    query_desired_class = 1.0 - test_pred
+
+                elif self.num_output_nodes > 2:
+                    raise ValueError("Desired class can't be opposite if the number of classes is more than 2.")
+
+            if isinstance(query_desired_class, int) and query_desired_class > self.num_output_nodes - 1:
+                raise ValueError("Desired class should be within 0 and num_classes-1.")
+
+            # Partitioned dataset and KD Tree for each class (binary) of the dataset
+            self.dataset_with_predictions, self.KD_tree, self.predictions = self.get_KD_tree(
+                desired_range, query_desired_class, self.predicted_outcome_name)
+
+            # the post-hoc sparsity search of all query instances runs together below
+            query_instance, cfs_preds = self.find_counterfactuals(self.data_interface.data_df,
+                                                                  query_instance, query_instance_orig,
+                                                                  desired_range,
+                                                                  query_desired_class,
+                                                                  total_CFs, features_to_vary,
+                                                                  permitted_range,
+                                                                  sparsity_weight,
+                                                                  stopping_threshold,
+                                                                  None,
+                                                                  posthoc_sparsity_algorithm, verbose)
+            test_instance_dfs.append(query_instance)
+            final_cfs_dfs.append(self.final_cfs_df)
+            cfs_preds_list.append(cfs_preds)
+            query_desired_classes.append(query_desired_class)
+            if self.model.model_type == ModelTypes.Classifier:
+                target_cf_classes.append(self.target_cf_class[0][0])
+            stopping_thresholds.append(self.stopping_threshold)
+
+        # post-hoc operation on continuous features to enhance sparsity - only for public data.
+        # The searches of all query instances run together.
+        final_cfs_dfs_sparse = [None] * num_queries
+        if posthoc_sparsity_param is not None and posthoc_sparsity_param > 0 and \
+                'data_df' in self.data_interface.__dict__:
+            for ix in range(num_queries):
+                if len(final_cfs_dfs[ix]) > 0:
+                    final_cfs_dfs_sparse[ix] = final_cfs_dfs[ix].copy()
+            self.do_posthoc_sparsity_enhancement_batch(
+                final_cfs_dfs_sparse, test_instance_dfs, posthoc_sparsity_param, posthoc_sparsity_algorithm,
+                target_cf_classes=target_cf_classes if self.model.model_type == ModelTypes.Classifier else None,
+                stopping_thresholds=stopping_thresholds,
+                target_cf_ranges=[self.target_cf_range] * num_queries
+                if self.model.model_type == ModelTypes.Regressor else None)
+
+        cf_examples_arr = []
+        for ix in range(num_queries):
+            self.final_cfs_df = final_cfs_dfs[ix]
+            self.final_cfs_df_sparse = final_cfs_dfs_sparse[ix]
+            if self.final_cfs_df_sparse is not None:
+                self.round_to_precision()
+            self.cfs_preds = cfs_preds_list[ix]
+
+            cf_examples_arr.append(exp.CounterfactualExamples(data_interface=self.data_interface,
+                                                              final_cfs_df=self.final_cfs_df,
+                                                              test_instance_df=test_instance_dfs[ix],
+                                                              final_cfs_df_sparse=self.final_cfs_df_sparse,
+                                                              posthoc_sparsity_param=posthoc_sparsity_param,
+                                                              desired_range=desired_range,
+                                                              desired_class=query_desired_classes[ix],
+                                                              model_type=self.model.model_type))
+        return cf_examples_arr
 
     def predict_fn(self, input_instance):
         """returns predictions"""
@@ -223,7 +285,7 @@ class DiceKD(ExplainerBase):
 
         # Making the one-hot-encoded version of query instance match the one-hot encoded version of the dataset
         query_instance_df_dummies = pd.get_dummies(query_instance_orig)
-        for col in pd.get_dummies(data_df_copy[self.data_interface.feature_names]).columns:
+        for col in self.get_training_dummy_columns():
             if col not in query_instance_df_dummies.columns:
                 query_instance_df_dummies[col] = 0
 
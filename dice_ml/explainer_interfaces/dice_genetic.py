@@ -5,16 +5,66 @@ This code is similar to 'GeCo: Quality Counterfactual Explanations in Real Time'
 from dice_ml.explainer_interfaces.explainer_base import ExplainerBase
 import numpy as np
 import pandas as pd
-import random
 import timeit
 import copy
+from collections import OrderedDict
 from sklearn.preprocessing import LabelEncoder
 
 from dice_ml import diverse_counterfactuals as exp
 from dice_ml.constants import ModelTypes
+from dice_ml.utils.exception import UserConfigValidationException
+from dice_ml.utils.parallel import create_worker_pool, evolve_islands_in_parallel
+from dice_ml.utils.rng import get_rng, spawn_rngs
+
+
+class FitnessCache:
+    """Bounded least-recently-used cache of the loss terms of the genomes evaluated for one query instance,
+       keyed by the bytes of the label-encoded genome."""
+
+    def __init__(self, maxsize):
+        """
+        :param maxsize: Maximum number of genomes kept in the cache.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def get(self, key):
+        """Returns the loss terms cached for key, or None."""
+        terms = self._entries.get(key)
+        if terms is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return terms
+
+    def put(self, key, terms):
+        """Caches the loss terms of key, evicting the least recently used genome when the cache is full."""
+        self._entries[key] = terms
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
 
 
 class DiceGenetic(ExplainerBase):
+    # attributes that hold the state of the search of one query instance, see get_search_context
+    _search_context_attributes = ('x1', 'test_pred', 'start_time', 'rng', 'query_instance_normalized', 'fitness_cache')
+    # attributes sent with every task to the workers running islands, see get_island_context
+    _island_context_attributes = ('x1', 'query_instance_normalized', 'mutation_ranges', 'total_CFs', 'population_size',
+                                  'yloss_type', 'proximity_weight', 'sparsity_weight', 'feature_weights_list')
+    # attributes that workers running islands do not need, see get_island_worker_explainer
+    _island_worker_dropped_attributes = ('label_encoded_data', 'dataset_with_predictions', 'KD_tree', 'predictions',
+                                         'fitness_cache', 'cfs', 'final_cfs', 'final_cfs_df', 'final_cfs_df_sparse')
 
     def __init__(self, data_interface, model_interface):
         """Init method
@@ -35,6 +85,24 @@ class DiceGenetic(ExplainerBase):
         self.cf_init_weights = []  # total_CFs, algorithm, features_to_vary
         self.loss_weights = []  # yloss_type, diversity_loss_type, feature_weights
         self.feature_weights_input = ''
+        # random number generator of the current query instance, set by _generate_counterfactuals_batch
+        self.rng = get_rng()
+        # values that mutated genes take, see get_mutation_ranges
+        self.mutation_ranges = None
+        # cache of the loss terms of the genomes of the current query instance, see compute_loss
+        self.fitness_cache = None
+        self.fitness_cache_size = 10000
+        # maximum number of candidates scored by do_random_init, None for 1000 per genome to initialize
+        self.max_init_model_rows = None
+        # island model of the genetic search, see evolve_islands
+        self.num_islands = 1
+        self.migration_interval = 10
+        self.island_executor = None
+        # pool of workers running the islands, shared by the query instances of a generate_counterfactuals call
+        self._island_pool = None
+        # identifies the search of the current query instance, so that workers know when to reset their cache
+        self._search_id = 0
+        self._island_search_id = None
 
         # Initializing a label encoder to obtain label-encoded values for categorical variables
         self.labelencoder = {}
@@ -45,6 +113,9 @@ class DiceGenetic(ExplainerBase):
             self.labelencoder[column] = LabelEncoder()
             self.label_encoded_data[column] = self.labelencoder[column].fit_transform(
                 self.data_interface.data_df[column])
+        # lookup tables from label-encoded values to the levels of the categorical features
+        self.label_levels = {column: np.asarray(self.labelencoder[column].classes_, dtype=object)
+                             for column in self.data_interface.categorical_feature_names}
 
         self.predicted_outcome_name = self.data_interface.outcome_name + '_pred'
 
@@ -92,26 +163,58 @@ class DiceGenetic(ExplainerBase):
             self.feature_weights_list = [feature_weights_list]
 
     def do_random_init(self, num_inits, features_to_vary, query_instance, desired_class, desired_range):
-        remaining_cfs = np.zeros((num_inits, self.data_interface.number_of_features))
-        # kx is the number of valid inits found so far
-        kx = 0
+        """Draws num_inits random genomes in the target class or target range. Candidates are drawn and scored by
+           the model in blocks, sized from the fraction of valid candidates seen so far, and the valid ones are
+           kept. Once max_init_model_rows candidates have been scored, the population is completed with invalid
+           candidates, and with unscored random genomes if fewer than num_inits candidates were scored.
+        """
+        max_model_rows = self.max_init_model_rows
+        if max_model_rows is None:
+            max_model_rows = 1000 * num_inits
         precisions = self.data_interface.get_decimal_precisions()
-        while kx < num_inits:
-            one_init = np.zeros(self.data_interface.number_of_features)
-            for jx, feature in enumerate(self.data_interface.feature_names):
-                if feature in features_to_vary:
-                    if feature in self.data_interface.continuous_feature_names:
-                        one_init[jx] = np.round(np.random.uniform(
-                            self.feature_range[feature][0], self.feature_range[feature][1]), precisions[jx])
-                    else:
-                        one_init[jx] = np.random.choice(self.feature_range[feature])
-                else:
-                    one_init[jx] = query_instance[jx]
-            if self.is_cf_valid(self.predict_fn_scores(one_init)):
-                remaining_cfs[kx] = one_init
-                kx += 1
+        valid_inits = []
+        num_valid = 0
+        invalid_inits = []
+        num_invalid = 0
+        model_rows_used = 0
+        block_size = max(2 * num_inits, 100)
+        while num_valid < num_inits and model_rows_used < max_model_rows:
+            block_size = min(block_size, max_model_rows - model_rows_used)
+            candidates = self._draw_random_genomes(block_size, features_to_vary, query_instance, precisions)
+            validity = self._decide_sparsity_validity(self.predict_fn_scores(candidates))
+            model_rows_used += block_size
+            valid_inits.append(candidates[validity])
+            num_valid += int(validity.sum())
+            # invalid candidates of all blocks are kept as fallback, up to the number of inits
+            if num_invalid < num_inits:
+                invalid_inits.append(candidates[~validity][:num_inits - num_invalid])
+                num_invalid += len(invalid_inits[-1])
+            if num_valid > 0:
+                # enough rows to find the missing inits at the acceptance rate seen so far, with some margin
+                block_size = int(np.ceil(1.5 * (num_inits - num_valid) * model_rows_used / num_valid))
+            else:
+                block_size *= 2
+            block_size = max(block_size, 100)
+
+        num_missing = num_inits - min(num_valid, num_inits) - min(num_invalid, num_inits)
+        if num_missing > 0:
+            invalid_inits.append(self._draw_random_genomes(num_missing, features_to_vary, query_instance, precisions))
+        remaining_cfs = np.concatenate(valid_inits + invalid_inits)[:num_inits]
         return remaining_cfs
 
+    def _draw_random_genomes(self, size, features_to_vary, query_instance, precisions):
+        """Draws size random genomes in the feature ranges. Features that are not to be varied keep the value of
+           the query instance."""
+        genomes = np.tile(np.asarray(query_instance, dtype=float), (size, 1))
+        for jx, feature in enumerate(self.data_interface.feature_names):
+            if feature in features_to_vary:
+                if feature in self.data_interface.continuous_feature_names:
+                    genomes[:, jx] = np.round(self.rng.uniform(
+                        self.feature_range[feature][0], self.feature_range[feature][1], size=size), precisions[jx])
+                else:
+                    genomes[:, jx] = self.rng.choice(self.feature_range[feature], size=size)
+        return genomes
+
     def do_KD_init(self, features_to_vary, query_instance, cfs, desired_class, desired_range):
         cfs = self.label_encode(cfs)
         cfs = cfs.reset_index(drop=True)
@@ -132,7 +235,7 @@ class DiceGenetic(ExplainerBase):
                             if self.feature_range[feature][0] <= query_instance[jx] <= self.feature_range[feature][1]:
                                 one_init[jx] = query_instance[jx]
                             else:
-                                one_init[jx] = np.random.uniform(
+                                one_init[jx] = self.rng.uniform(
                                     self.feature_range[feature][0], self.feature_range[feature][1])
                     else:
                         if cfs.iat[kx, jx] in self.feature_range[feature]:
@@ -141,18 +244,29 @@ class DiceGenetic(ExplainerBase):
                             if query_instance[jx] in self.feature_range[feature]:
                                 one_init[jx] = query_instance[jx]
                             else:
-                                one_init[jx] = np.random.choice(self.feature_range[feature])
+                                one_init[jx] = self.rng.choice(self.feature_range[feature])
             self.cfs[kx] = one_init
             kx += 1
 
-        new_array = [tuple(row) for row in self.cfs]
-        uniques = np.unique(new_array, axis=0)
+        uniques = self.get_unique_rows(self.cfs)
 
         if len(uniques) != self.population_size:
             remaining_cfs = self.do_random_init(
                 self.population_size - len(uniques), features_to_vary, query_instance, desired_class, desired_range)
             self.cfs = np.concatenate([uniques, remaining_cfs])
 
+    @staticmethod
+    def get_unique_rows(population):
+        """Returns the unique genomes of a population in lexicographic order, like np.unique(population, axis=0).
+           Duplicates are found through a hash of the bytes of every genome, so that only the unique genomes are
+           sorted. The parents of the next generation are drawn from the first half of the population in this
+           order."""
+        # adding 0.0 turns -0.0 into 0.0 so that both have the same bytes
+        population_bytes = np.ascontiguousarray(population, dtype=float) + 0.0
+        genomes = population_bytes.view(np.dtype((np.void, population_bytes.itemsize * population_bytes.shape[1])))
+        uniques = population[~pd.Series(genomes.ravel()).duplicated().values]
+        return uniques[np.lexsort(uniques.T[::-1])]
+
     def do_cf_initializations(self, total_CFs, initialization, algorithm, features_to_vary, desired_range,
                               desired_class,
                               query_instance, query_instance_df_dummies, verbose):
@@ -179,8 +293,7 @@ class DiceGenetic(ExplainerBase):
         elif initialization == 'kdtree':
             # Partitioned dataset and KD Tree for each class (binary) of the dataset
             self.dataset_with_predictions, self.KD_tree, self.predictions = \
-                self.build_KD_tree(self.data_interface.data_df.copy(),
-                                   desired_range, desired_class, self.predicted_outcome_name)
+                self.get_KD_tree(desired_range, desired_class, self.predicted_outcome_name)
             if self.KD_tree is None:
                 self.cfs = self.do_random_init(
                     self.population_size, features_to_vary, query_instance, desired_class, desired_range)
@@ -217,7 +330,10 @@ class DiceGenetic(ExplainerBase):
                                   algorithm="DiverseCF", features_to_vary="all", permitted_range=None,
                                   yloss_type="hinge_loss", diversity_loss_type="dpp_style:inverse_dist",
                                   feature_weights="inverse_mad", stopping_threshold=0.5, posthoc_sparsity_param=0.1,
-                                  posthoc_sparsity_algorithm="binary", maxiterations=500, thresh=1e-2, verbose=False):
+                                  posthoc_sparsity_algorithm="binary", maxiterations=500, thresh=1e-2, verbose=False,
+                                  random_seed=None, fitness_cache_size=10000,
+                                  max_init_model_rows=None, num_islands=1, migration_interval=10,
+                                  island_executor=None, stack_populations=False):
         """Generates diverse counterfactual explanations
 
         :param query_instance: A dictionary of feature names and values. Test point of interest.
@@ -246,7 +362,7 @@ class DiceGenetic(ExplainerBase):
                                 equal to 1 by default.
         :param stopping_threshold: Minimum threshold for counterfactuals target class probability.
         :param posthoc_sparsity_param: Parameter for the post-hoc operation on continuous features to enhance sparsity.
-        :param posthoc_sparsity_algorithm: Perform either linear or binary search. Takes "linear" or "binary".
+        :param posthoc_sparsity_algorithm: Perform linear, binary or grid search. Takes "linear", "binary" or "grid".
                                            Prefer binary search when a feature range is large
                                            (for instance, income varying from 10k to 1000k) and only if the features
                                            share a monotonic relationship with predicted outcome in the model.
@@ -254,42 +370,147 @@ class DiceGenetic(ExplainerBase):
         :param thresh: The genetic algorithm stops when the difference between the previous best loss and current
                        best loss is less than thresh
         :param verbose: Parameter to determine whether to print 'Diverse Counterfactuals found!'
+        :param random_seed: Random seed for reproducibility, or a numpy.random.Generator to draw from. The query
+                            instances of a batch draw from independent streams derived from it.
+        :param fitness_cache_size: Maximum number of genomes whose loss terms are cached, so that genomes that
+                                   survive across generations are not scored by the model again. 0 or None
+                                   disables the cache. The hits, misses and hit rate of every query instance are
+                                   stored in the fitness_cache_stats attribute of the explainer.
+        :param max_init_model_rows: Maximum number of random candidates scored by the model to initialize the
+                                    population of a query instance. Defaults to 1000 per genome to initialize.
+                                    If too few candidates are in the target class or range, the population is
+                                    completed with invalid candidates.
+        :param num_islands: Number of sub-populations (islands) evolved in parallel workers for every query
+                            instance. The islands exchange their fittest members every migration_interval
+                            generations and are merged into the final counterfactuals. Defaults to 1, a single
+                            population evolved in the current process.
+        :param migration_interval: Number of generations between two migrations when num_islands > 1.
+        :param island_executor: The concurrent.futures.Executor class used to create the pool of workers running
+                                the islands. Defaults to ProcessPoolExecutor.
+        :param stack_populations: In batch mode, evolves the populations of all query instances side by side, so
+                                  that every generation scores the new genomes of all of them in a single model
+                                  call. A query instance whose search converges drops out while the others
+                                  continue. The counterfactuals are the same as without stacking.
 
         :return: A CounterfactualExamples object to store and visualize the resulting counterfactual explanations
                  (see diverse_counterfactuals.py).
         """
-
+        return self._generate_counterfactuals_batch(
+            query_instance, total_CFs, initialization=initialization, desired_range=desired_range,
+            desired_class=desired_class, proximity_weight=proximity_weight, sparsity_weight=sparsity_weight,
+            diversity_weight=diversity_weight, categorical_penalty=categorical_penalty, algorithm=algorithm,
+            features_to_vary=features_to_vary, permitted_range=permitted_range, yloss_type=yloss_type,
+            diversity_loss_type=diversity_loss_type, feature_weights=feature_weights,
+            stopping_threshold=stopping_threshold, posthoc_sparsity_param=posthoc_sparsity_param,
+            posthoc_sparsity_algorithm=posthoc_sparsity_algorithm, maxiterations=maxiterations, thresh=thresh,
+            verbose=verbose, random_seed=random_seed, fitness_cache_size=fitness_cache_size,
+            max_init_model_rows=max_init_model_rows, num_islands=num_islands,
+            migration_interval=migration_interval, island_executor=island_executor,
+            stack_populations=stack_populations)[0]
+
+    def _generate_counterfactuals_batch(self, query_instances, total_CFs, initialization="kdtree",
+                                        desired_range=None, desired_class="opposite", proximity_weight=0.2,
+                                        sparsity_weight=0.2, diversity_weight=5.0, categorical_penalty=0.1,
+                                        algorithm="DiverseCF", features_to_vary="all", permitted_range=None,
+                                        yloss_type="hinge_loss", diversity_loss_type="dpp_style:inverse_dist",
+                                        feature_weights="inverse_mad", stopping_threshold=0.5,
+                                        posthoc_sparsity_param=0.1, posthoc_sparsity_algorithm="binary",
+                                        maxiterations=500, thresh=1e-2, verbose=False, random_seed=None,
+                                        fitness_cache_size=10000, max_init_model_rows=None, num_islands=1,
+                                        migration_interval=10, island_executor=None, stack_populations=False):
+        """Generates diverse counterfactual explanations for a block of query instances. Setup, label encoding
+           and the predictions of the query instances are done once for the whole block before the genetic
+           algorithm runs for every query instance.
+
+        :param query_instances: A dataframe with one or more rows. Test points of interest.
+        :param other_parameters: These are the same as the _generate_counterfactuals method.
+
+        :return: A list of CounterfactualExamples objects, one per query instance.
+        """
+        if num_islands < 1 or migration_interval < 1:
+            raise UserConfigValidationException(
+                "num_islands and migration_interval should be positive integers.")
+        if stack_populations and num_islands > 1:
+            raise UserConfigValidationException(
+                "stack_populations cannot be combined with num_islands > 1.")
         self.population_size = 10 * total_CFs
 
-        self.start_time = timeit.default_timer()
-
-        features_to_vary = self.setup(features_to_vary, permitted_range, query_instance, feature_weights)
-
-        # Prepares user defined query_instance for DiCE.
-        query_instance_orig = query_instance
-        query_instance = self.data_interface.prepare_query_instance(query_instance=query_instance)
-        query_instance = self.label_encode(query_instance)
-        query_instance = np.array(query_instance.values[0])
-        self.x1 = query_instance
-
-        # find the predicted value of query_instance
-        test_pred = self.predict_fn(query_instance)
-        self.test_pred = test_pred
-
-        desired_class = self.misc_init(stopping_threshold, desired_class, desired_range, test_pred)
-
-        query_instance_df_dummies = pd.get_dummies(query_instance_orig)
-        for col in pd.get_dummies(self.data_interface.data_df[self.data_interface.feature_names]).columns:
-            if col not in query_instance_df_dummies.columns:
-                query_instance_df_dummies[col] = 0
-
-        self.do_param_initializations(total_CFs, initialization, desired_range, desired_class, query_instance,
-                                      query_instance_df_dummies, algorithm, features_to_vary, permitted_range,
-                                      yloss_type, diversity_loss_type, feature_weights, proximity_weight,
-                                      sparsity_weight, diversity_weight, categorical_penalty, verbose)
-
-        query_instance_df = self.find_counterfactuals(query_instance, desired_range, desired_class, features_to_vary,
-                                                      maxiterations, thresh, verbose)
+        features_to_vary = self.setup(features_to_vary, permitted_range, query_instances, feature_weights)
+        # do_param_initializations replaces self.feature_range with its label-encoded version
+        feature_range = self.feature_range
+
+        # Prepares user defined query_instances for DiCE.
+        query_instances_orig = self.data_interface.prepare_query_instance(query_instance=query_instances)
+        query_instances = self.label_encode(query_instances_orig.copy())
+        query_instances = np.array(query_instances.values)
+
+        # find the predicted values of all query_instances at once
+        test_preds = self.predict_fn(query_instances)
+
+        data_df_dummies_columns = self.get_training_dummy_columns()
+
+        query_rngs = spawn_rngs(random_seed, query_instances.shape[0])
+        self.fitness_cache_size = fitness_cache_size
+        self.max_init_model_rows = max_init_model_rows
+        self.num_islands = num_islands
+        self.migration_interval = migration_interval
+        self.island_executor = island_executor
+        self.fitness_cache_stats = []
+        cf_examples_arr = []
+        searches = []
+        for ix in range(query_instances.shape[0]):
+            self.start_time = timeit.default_timer()
+            self.rng = query_rngs[ix]
+            query_instance = query_instances[ix]
+            self.x1 = query_instance
+            test_pred = test_preds[ix:(ix+1)]
+            self.test_pred = test_pred
+
+            query_desired_class = self.misc_init(stopping_threshold, desired_class, desired_range, test_pred)
+
+            query_instance_df_dummies = pd.get_dummies(query_instances_orig[ix:(ix+1)])
+            for col in data_df_dummies_columns:
+                if col not in query_instance_df_dummies.columns:
+                    query_instance_df_dummies[col] = 0
+
+            self.feature_range = feature_range
+            self.do_param_initializations(total_CFs, initialization, desired_range, query_desired_class,
+                                          query_instance, query_instance_df_dummies, algorithm, features_to_vary,
+                                          permitted_range, yloss_type, diversity_loss_type, feature_weights,
+                                          proximity_weight, sparsity_weight, diversity_weight, categorical_penalty,
+                                          verbose)
+
+            if stack_populations:
+                # the populations of all query instances evolve together once they are all initialized
+                self.prepare_search(features_to_vary)
+                search = self.get_search_context()
+                search.update({'query_instance': query_instance, 'desired_class': query_desired_class,
+                               'population': self.cfs.copy(), 'search_state': self.get_initial_search_state()})
+                searches.append(search)
+                continue
+
+            query_instance_df = self.find_counterfactuals(query_instance, desired_range, query_desired_class,
+                                                          features_to_vary, maxiterations, thresh, verbose)
+            cf_examples_arr.append(self._get_cf_examples(query_instance_df, query_desired_class, desired_range,
+                                                         posthoc_sparsity_param))
+
+        if stack_populations:
+            self.evolve_populations(searches, desired_range, features_to_vary, maxiterations, thresh)
+            for search in searches:
+                self.set_search_context(search)
+                self.misc_init(stopping_threshold, desired_class, desired_range, self.test_pred)
+                query_instance_df = self.select_final_cfs(search['population'], search['query_instance'], verbose)
+                cf_examples_arr.append(self._get_cf_examples(query_instance_df, search['desired_class'],
+                                                             desired_range, posthoc_sparsity_param))
+        return cf_examples_arr
+
+    def _get_cf_examples(self, query_instance_df, desired_class, desired_range, posthoc_sparsity_param):
+        """Wraps the final counterfactuals of the current query instance in a CounterfactualExamples object
+           and records the statistics of its fitness cache."""
+        if self.fitness_cache is not None:
+            self.fitness_cache_stats.append({'hits': self.fitness_cache.hits,
+                                             'misses': self.fitness_cache.misses,
+                                             'hit_rate': self.fitness_cache.hit_rate})
 
         return exp.CounterfactualExamples(data_interface=self.data_interface,
                                           test_instance_df=query_instance_df,
@@ -320,6 +541,10 @@ class DiceGenetic(ExplainerBase):
 
         input_instance = self.label_decode(input_instance)
         output = self.model.get_output(input_instance, model_score=True)
+        return self._get_custom_predictions(output, desired_class)
+
+    def _get_custom_predictions(self, output, desired_class):
+        """Returns the predicted classes for the scores in output, see _predict_fn_custom."""
         desired_class = int(desired_class)
         maxvalues = np.max(output, 1)
         predicted_values = np.argmax(output, 1)
@@ -333,26 +558,41 @@ class DiceGenetic(ExplainerBase):
 
     def compute_yloss(self, cfs, desired_range, desired_class):
         """Computes the first part (y-loss) of the loss function."""
+        return self._compute_yloss_and_predictions(cfs, desired_range, desired_class)[0]
+
+    def get_loss_model_output(self, cfs):
+        """Returns the model output the y-loss is computed from: the prediction scores of a classifier or the
+           predicted values of a regressor."""
+        if self.model.model_type == ModelTypes.Classifier:
+            return np.array(self.predict_fn_scores(cfs))
+        return self.predict_fn(cfs)
+
+    def _compute_yloss_and_predictions(self, cfs, desired_range, desired_class, model_output=None):
+        """Computes the y-loss of cfs together with their predicted classes (see _predict_fn_custom) or
+           predicted values, from a single model call. model_output is the output of get_loss_model_output for
+           cfs, if it is already known."""
         yloss = 0.0
+        if model_output is None:
+            model_output = self.get_loss_model_output(cfs)
         if self.model.model_type == ModelTypes.Classifier:
-            predicted_value = np.array(self.predict_fn_scores(cfs))
+            predicted_value = model_output
             if self.yloss_type == 'hinge_loss':
                 maxvalue = np.full((len(predicted_value)), -np.inf)
                 for c in range(self.num_output_nodes):
                     if c != desired_class:
                         maxvalue = np.maximum(maxvalue, predicted_value[:, c])
                 yloss = np.maximum(0, maxvalue - predicted_value[:, int(desired_class)])
-            return yloss
+            return yloss, self._get_custom_predictions(predicted_value, desired_class)
 
         elif self.model.model_type == ModelTypes.Regressor:
-            predicted_value = self.predict_fn(cfs)
+            predicted_value = model_output
             if self.yloss_type == 'hinge_loss':
                 yloss = np.zeros(len(predicted_value))
                 for i in range(len(predicted_value)):
                     if not desired_range[0] <= predicted_value[i] <= desired_range[1]:
                         yloss[i] = min(abs(predicted_value[i] - desired_range[0]),
                                        abs(predicted_value[i] - desired_range[1]))
-            return yloss
+            return yloss, predicted_value
 
     def compute_proximity_loss(self, x_hat_unnormalized, query_instance_normalized):
         """Compute weighted distance between two vectors."""
@@ -374,111 +614,350 @@ class DiceGenetic(ExplainerBase):
         return sparsity_loss / len(
             self.data_interface.feature_names)  # Dividing by the number of features to normalize sparsity loss
 
-    def compute_loss(self, cfs, desired_range, desired_class):
-        """Computes the overall loss"""
-        self.yloss = self.compute_yloss(cfs, desired_range, desired_class)
-        self.proximity_loss = self.compute_proximity_loss(cfs, self.query_instance_normalized) \
+    def compute_loss_terms(self, cfs, desired_range, desired_class, model_output=None):
+        """Computes the y-loss, proximity loss, sparsity loss and prediction of every row of cfs. model_output is
+           the output of get_loss_model_output for cfs, if it is already known.
+
+        :returns: A float array with one row per counterfactual and the four terms as columns.
+        """
+        yloss, predictions = self._compute_yloss_and_predictions(cfs, desired_range, desired_class, model_output)
+        proximity_loss = self.compute_proximity_loss(cfs, self.query_instance_normalized) \
             if self.proximity_weight > 0 else 0.0
-        self.sparsity_loss = self.compute_sparsity_loss(cfs) if self.sparsity_weight > 0 else 0.0
+        sparsity_loss = self.compute_sparsity_loss(cfs) if self.sparsity_weight > 0 else 0.0
+        return np.column_stack([np.broadcast_to(term, len(cfs)) for term in
+                                (yloss, proximity_loss, sparsity_loss, np.ravel(predictions))]).astype(float)
+
+    def lookup_loss_terms(self, cfs):
+        """Looks the genomes of cfs up in the fitness cache.
+
+        :returns: A tuple with the loss terms of cfs, filled for the genomes found in the cache, the positions of
+                  the other genomes and the cache keys of all genomes.
+        """
+        terms = np.zeros((len(cfs), 4))
+        missing = np.arange(len(cfs))
+        keys = None
+        if self.fitness_cache is not None:
+            keys = [cf.tobytes() for cf in cfs]
+            missing = []
+            for i, key in enumerate(keys):
+                cached_terms = self.fitness_cache.get(key)
+                if cached_terms is None:
+                    missing.append(i)
+                else:
+                    terms[i] = cached_terms
+        return terms, missing, keys
+
+    def compute_loss(self, cfs, desired_range, desired_class, cached_terms=None, model_output=None):
+        """Computes the overall loss. The loss terms of the genomes found in the fitness cache are reused and
+           only the other genomes are scored by the model.
+
+        :param cached_terms: The output of lookup_loss_terms for cfs, if the cache was already looked up.
+        :param model_output: The output of get_loss_model_output for the genomes missing from the cache, if it is
+                             already known.
+        """
+        if cached_terms is None:
+            cached_terms = self.lookup_loss_terms(cfs)
+        terms, missing, keys = cached_terms
+        if len(missing) > 0:
+            terms[missing] = self.compute_loss_terms(cfs[missing], desired_range, desired_class, model_output)
+            if self.fitness_cache is not None:
+                for i in missing:
+                    self.fitness_cache.put(keys[i], terms[i].copy())
+
+        self.yloss, self.proximity_loss, self.sparsity_loss, self.population_preds = terms.T
         self.loss = np.reshape(np.array(self.yloss + (self.proximity_weight * self.proximity_loss) +
                                         self.sparsity_weight * self.sparsity_loss), (-1, 1))
         index = np.reshape(np.arange(len(cfs)), (-1, 1))
         self.loss = np.concatenate([index, self.loss], axis=1)
         return self.loss
 
-    def mate(self, k1, k2, features_to_vary, query_instance):
-        """Performs mating and produces new offsprings"""
-        # chromosome for offspring
-        one_init = np.zeros(self.data_interface.number_of_features)
-        for j in range(self.data_interface.number_of_features):
-            gp1 = k1[j]
-            gp2 = k2[j]
-            feat_name = self.data_interface.feature_names[j]
-
-            # random probability
-            prob = random.random()
-
-            if prob < 0.40:
-                # if prob is less than 0.40, insert gene from parent 1
-                one_init[j] = gp1
-            elif prob < 0.80:
-                # if prob is between 0.40 and 0.80, insert gene from parent 2
-                one_init[j] = gp2
+    def get_mutation_ranges(self, features_to_vary):
+        """Precomputes the values that mutated genes take: the positions, ranges and decimal precisions of the
+           continuous features to vary, and the positions and label-encoded levels of the categorical features
+           to vary."""
+        continuous_positions = []
+        categorical_levels = []
+        for jx, feature in enumerate(self.data_interface.feature_names):
+            if feature not in features_to_vary:
+                continue
+            if feature in self.data_interface.continuous_feature_names:
+                continuous_positions.append(jx)
             else:
-                # otherwise insert random gene(mutate) for maintaining diversity
-                if feat_name in features_to_vary:
-                    if feat_name in self.data_interface.continuous_feature_names:
-                        one_init[j] = np.random.uniform(self.feature_range[feat_name][0],
-                                                        self.feature_range[feat_name][0])
-                    else:
-                        one_init[j] = np.random.choice(self.feature_range[feat_name])
-                else:
-                    one_init[j] = query_instance[j]
-        return one_init
+                categorical_levels.append((jx, np.asarray(self.feature_range[feature], dtype=float)))
+        continuous_positions = np.array(continuous_positions, dtype=int)
+        continuous_features = [self.data_interface.feature_names[jx] for jx in continuous_positions]
+        lows = np.array([self.feature_range[feature][0] for feature in continuous_features], dtype=float)
+        highs = np.array([self.feature_range[feature][1] for feature in continuous_features], dtype=float)
+        precisions = self.data_interface.get_decimal_precisions()
+        scales = np.array([10.0 ** precisions[jx] for jx in continuous_positions])
+        return continuous_positions, lows, highs, scales, categorical_levels
 
-    def find_counterfactuals(self, query_instance, desired_range, desired_class,
-                             features_to_vary, maxiterations, thresh, verbose):
-        """Finds counterfactuals by generating cfs through the genetic algorithm"""
-        population = self.cfs.copy()
-        iterations = 0
-        previous_best_loss = -np.inf
-        current_best_loss = np.inf
-        stop_cnt = 0
-        cfs_preds = [np.inf] * self.total_CFs
-        to_pred = None
+    def mate(self, k1, k2, features_to_vary, query_instance):
+        """Performs mating and produces new offsprings. k1 and k2 are either two parents or two arrays with one
+           parent per row, in which case one offspring is produced per pair of rows in a single vectorized step."""
+        if self.mutation_ranges is None:
+            self.mutation_ranges = self.get_mutation_ranges(features_to_vary)
+        continuous_positions, lows, highs, scales, categorical_levels = self.mutation_ranges
+
+        parents1 = np.atleast_2d(k1)
+        parents2 = np.atleast_2d(k2)
+        num_offsprings = len(parents1)
+
+        # random genes (mutations) for maintaining diversity, features that are not to be varied keep the value
+        # of the query instance
+        mutations = np.tile(np.asarray(query_instance, dtype=float), (num_offsprings, 1))
+        # a mutated continuous gene is drawn uniformly from the feature range, at the precision of the feature
+        continuous_mutations = self.rng.uniform(lows, highs, size=(num_offsprings, len(continuous_positions)))
+        mutations[:, continuous_positions] = np.clip(np.round(continuous_mutations * scales) / scales, lows, highs)
+        for jx, levels in categorical_levels:
+            mutations[:, jx] = levels[self.rng.integers(len(levels), size=num_offsprings)]
+
+        # random probability per gene: below 0.40 the gene comes from parent 1, between 0.40 and 0.80 from
+        # parent 2, and otherwise it mutates
+        prob = self.rng.random(parents1.shape)
+        offsprings = np.where(prob < 0.40, parents1, np.where(prob < 0.80, parents2, mutations))
+        return offsprings if np.ndim(k1) > 1 else offsprings[0]
+
+    def get_initial_search_state(self):
+        """Returns the state of a genetic search that has not run yet, see evolve_population."""
+        return {'iterations': 0, 'previous_best_loss': -np.inf, 'current_best_loss': np.inf, 'stop_cnt': 0,
+                'cfs_preds': [np.inf] * self.total_CFs, 'converged': False}
+
+    def evolve_population(self, population, search_state, query_instance, desired_range, desired_class,
+                          features_to_vary, maxiterations, thresh):
+        """Runs the genetic algorithm on population until search_state counts maxiterations generations or the
+           search converges. search_state holds the generation count and the convergence state of the search
+           (see get_initial_search_state) and is updated in place, so that a search can be resumed.
+
+        :returns: The last generation, with its fittest members first.
+        """
+        while search_state['iterations'] < maxiterations and self.total_CFs > 0:
+            if self._update_convergence(search_state, desired_range, desired_class, thresh):
+                break
+            population = self.get_unique_rows(population)
+            population_fitness = self.compute_loss(population, desired_range, desired_class)
+            population = self._next_generation(population, population_fitness, search_state, query_instance,
+                                               features_to_vary)
+        return population
+
+    def _update_convergence(self, search_state, desired_range, desired_class, thresh):
+        """Counts the generations in a row in which the best loss barely changed while the fittest members
+           were in the target class or range, and returns True once the search has converged."""
+        cfs_preds = search_state['cfs_preds']
+        if abs(search_state['previous_best_loss'] - search_state['current_best_loss']) <= thresh and \
+                (self.model.model_type == ModelTypes.Classifier and all(i == desired_class for i in cfs_preds) or
+                 (self.model.model_type == ModelTypes.Regressor and
+                  all(desired_range[0] <= i <= desired_range[1] for i in cfs_preds))):
+            search_state['stop_cnt'] += 1
+        else:
+            search_state['stop_cnt'] = 0
+        if search_state['stop_cnt'] >= 5:
+            search_state['converged'] = True
+            return True
+        search_state['previous_best_loss'] = search_state['current_best_loss']
+        return False
+
+    def _next_generation(self, population, population_fitness, search_state, query_instance, features_to_vary):
+        """Returns the next generation of population given the loss of its members (see compute_loss), and
+           counts the generation in search_state."""
+        population_fitness = population_fitness[population_fitness[:, 1].argsort()]
+
+        search_state['current_best_loss'] = population_fitness[0][1]
+
+        if self.total_CFs > 0:
+            # predictions of the fittest members, computed together with their loss
+            search_state['cfs_preds'] = self.population_preds[population_fitness[:self.total_CFs, 0].astype(int)]
+
+        # self.total_CFS of the next generation obtained from the fittest members of current generation
+        top_members = self.total_CFs
+        new_generation_1 = np.array([population[int(tup[0])] for tup in population_fitness[:top_members]])
+
+        # rest of the next generation obtained from top 50% of fittest members of current generation
+        rest_members = self.population_size - top_members
+        new_generation_2 = None
+        if rest_members > 0:
+            parents1 = population[self.rng.integers(int(len(population) / 2), size=rest_members)]
+            parents2 = population[self.rng.integers(int(len(population) / 2), size=rest_members)]
+            new_generation_2 = self.mate(parents1, parents2, features_to_vary, query_instance)
+
+        if new_generation_2 is not None:
+            if self.total_CFs > 0:
+                population = np.concatenate([new_generation_1, new_generation_2])
+            else:
+                population = new_generation_2
+        else:
+            raise SystemError("The number of total_Cfs is greater than the population size!")
+        search_state['iterations'] += 1
+        return population
+
+    def evolve_populations(self, searches, desired_range, features_to_vary, maxiterations, thresh):
+        """Runs the genetic algorithm on the populations of several query instances side by side. In every
+           generation, the genomes of all populations that are missing from their fitness cache are scored in a
+           single model call. The search of a query instance stops when it converges or has run maxiterations
+           generations, while the others continue.
+
+        :param searches: A list with one dictionary per query instance, holding the query instance, its desired
+                         class, its population, its search state (see get_initial_search_state) and the search
+                         context set by prepare_search. The populations and search states are updated in place.
+        """
+        while self.total_CFs > 0:
+            active_searches = []
+            for search in searches:
+                if search['search_state']['iterations'] < maxiterations and \
+                        not self._update_convergence(search['search_state'], desired_range, search['desired_class'],
+                                                     thresh):
+                    active_searches.append(search)
+            if len(active_searches) == 0:
+                break
 
+            cached_terms = []
+            for search in active_searches:
+                self.set_search_context(search)
+                search['population'] = self.get_unique_rows(search['population'])
+                cached_terms.append(self.lookup_loss_terms(search['population']))
+            missing_genomes = [search['population'][terms[1]] for search, terms in zip(active_searches, cached_terms)]
+            num_missing = np.cumsum([0] + [len(genomes) for genomes in missing_genomes])
+            model_output = None
+            if num_missing[-1] > 0:
+                model_output = self.get_loss_model_output(np.concatenate(missing_genomes))
+
+            for ix, search in enumerate(active_searches):
+                self.set_search_context(search)
+                search_output = None if model_output is None else model_output[num_missing[ix]:num_missing[ix + 1]]
+                population_fitness = self.compute_loss(search['population'], desired_range, search['desired_class'],
+                                                       cached_terms=cached_terms[ix], model_output=search_output)
+                search['population'] = self._next_generation(search['population'], population_fitness,
+                                                             search['search_state'], search['query_instance'],
+                                                             features_to_vary)
+
+    def evolve_islands(self, population, query_instance, desired_range, desired_class, features_to_vary,
+                       maxiterations, thresh):
+        """Runs the genetic algorithm on self.num_islands sub-populations (islands) in parallel workers. All islands
+           start from population and evolve independently, each with its own random stream. Every
+           self.migration_interval generations, the fittest total_CFs members of every island migrate to the next
+           island, where they replace offsprings. The islands are merged once all of them have converged or run
+           maxiterations generations.
+
+        :returns: The unique members of all islands, fittest first.
+        """
+        island_rngs = spawn_rngs(self.rng, self.num_islands)
+        populations = [population.copy() for _ in range(self.num_islands)]
+        search_states = [self.get_initial_search_state() for _ in range(self.num_islands)]
+        evolve_kwargs = {'query_instance': query_instance, 'desired_range': desired_range,
+                         'desired_class': desired_class, 'features_to_vary': features_to_vary, 'thresh': thresh}
+
+        if self._island_pool is not None:
+            self.run_island_epochs(self._island_pool, populations, search_states, island_rngs, maxiterations,
+                                   evolve_kwargs)
+        else:
+            with create_worker_pool(self.get_island_worker_explainer(), self.num_islands,
+                                    executor=self.island_executor) as pool:
+                self.run_island_epochs(pool, populations, search_states, island_rngs, maxiterations, evolve_kwargs)
+
+        population = self.get_unique_rows(np.concatenate(populations))
+        population_fitness = self.compute_loss(population, desired_range, desired_class)
+        return population[population_fitness[population_fitness[:, 1].argsort(), 0].astype(int)]
+
+    def run_island_epochs(self, pool, populations, search_states, island_rngs, maxiterations, evolve_kwargs):
+        """Evolves the islands in pool, one migration interval at a time, until all of them have converged or
+           run maxiterations generations. populations and search_states are updated in place."""
+        island_context = self.get_island_context()
+        while True:
+            active_islands = [ix for ix in range(self.num_islands) if not search_states[ix]['converged'] and
+                              search_states[ix]['iterations'] < maxiterations]
+            if len(active_islands) == 0:
+                break
+            epoch_maxiterations = [min(search_states[ix]['iterations'] + self.migration_interval, maxiterations)
+                                   for ix in active_islands]
+            evolve_islands_in_parallel(pool, active_islands, populations, search_states, island_rngs,
+                                       epoch_maxiterations, island_context, evolve_kwargs)
+
+            # ring migration: the elites of an island replace offsprings of the next one
+            elites = [island_population[:self.total_CFs] for island_population in populations]
+            for ix in range(self.num_islands):
+                migrants = elites[ix - 1]
+                populations[ix] = np.concatenate([populations[ix][:len(populations[ix]) - len(migrants)],
+                                                  migrants])
+
+    def get_island_worker_explainer(self):
+        """Returns a copy of the explainer for the workers running islands, without the training data, the
+           cached KD trees and the results of previous searches."""
+        worker_explainer = copy.copy(self)
+        worker_explainer.invalidate_KD_trees()
+        for attribute in self._island_worker_dropped_attributes:
+            setattr(worker_explainer, attribute, None)
+        worker_explainer._island_pool = None
+        return worker_explainer
+
+    def get_island_context(self):
+        """Returns the attributes a worker needs to evolve an island of the search of the current query
+           instance, see set_island_context."""
+        island_context = {attribute: getattr(self, attribute) for attribute in self._island_context_attributes}
+        island_context.update({'search_id': self._search_id, 'fitness_cache_size': self.fitness_cache_size})
+        return island_context
+
+    def set_island_context(self, island_context):
+        """Sets the attributes returned by get_island_context in a worker. The fitness cache of the worker is
+           reset when the island belongs to the search of another query instance."""
+        for attribute in self._island_context_attributes:
+            setattr(self, attribute, island_context[attribute])
+        if self._island_search_id != island_context['search_id']:
+            self._island_search_id = island_context['search_id']
+            fitness_cache_size = island_context['fitness_cache_size']
+            self.fitness_cache = FitnessCache(fitness_cache_size) if fitness_cache_size else None
+
+    def generate_counterfactuals(self, query_instances, total_CFs, *args, **kwargs):
+        """Same as ExplainerBase.generate_counterfactuals. With num_islands > 1, the pool of workers running the
+           islands is created once and used for all the query instances."""
+        if kwargs.get('num_islands', 1) <= 1 or self._island_pool is not None or \
+                kwargs.get('n_jobs') is not None or kwargs.get('executor') is not None:
+            return super().generate_counterfactuals(query_instances, total_CFs, *args, **kwargs)
+        with create_worker_pool(self.get_island_worker_explainer(), kwargs['num_islands'],
+                                executor=kwargs.get('island_executor')) as pool:
+            self._island_pool = pool
+            try:
+                return super().generate_counterfactuals(query_instances, total_CFs, *args, **kwargs)
+            finally:
+                self._island_pool = None
+
+    def prepare_search(self, features_to_vary):
+        """Sets the context of the genetic search for the current query instance self.x1: its normalized
+           values, the values that mutated genes take and an empty fitness cache."""
         self.query_instance_normalized = self.data_interface.normalize_data(self.x1)
         self.query_instance_normalized = self.query_instance_normalized.astype('float')
+        self.mutation_ranges = self.get_mutation_ranges(features_to_vary)
+        self.fitness_cache = FitnessCache(self.fitness_cache_size) if self.fitness_cache_size else None
+        self._search_id += 1
 
-        while iterations < maxiterations and self.total_CFs > 0:
-            if abs(previous_best_loss - current_best_loss) <= thresh and \
-                    (self.model.model_type == ModelTypes.Classifier and all(i == desired_class for i in cfs_preds) or
-                     (self.model.model_type == ModelTypes.Regressor and
-                      all(desired_range[0] <= i <= desired_range[1] for i in cfs_preds))):
-                stop_cnt += 1
-            else:
-                stop_cnt = 0
-            if stop_cnt >= 5:
-                break
-            previous_best_loss = current_best_loss
-            population = np.unique(tuple(map(tuple, population)), axis=0)
-
-            population_fitness = self.compute_loss(population, desired_range, desired_class)
-            population_fitness = population_fitness[population_fitness[:, 1].argsort()]
+    def get_search_context(self):
+        """Returns the attributes of the explainer that are specific to the search of the current query
+           instance, see prepare_search."""
+        return {attribute: getattr(self, attribute) for attribute in self._search_context_attributes}
 
-            current_best_loss = population_fitness[0][1]
-            to_pred = np.array([population[int(tup[0])] for tup in population_fitness[:self.total_CFs]])
+    def set_search_context(self, search_context):
+        """Restores the attributes returned by get_search_context, so that the search of another query instance
+           can resume."""
+        for attribute in self._search_context_attributes:
+            setattr(self, attribute, search_context[attribute])
 
-            if self.total_CFs > 0:
-                if self.model.model_type == ModelTypes.Classifier:
-                    cfs_preds = self._predict_fn_custom(to_pred, desired_class)
-                else:
-                    cfs_preds = self.predict_fn(to_pred)
-
-            # self.total_CFS of the next generation obtained from the fittest members of current generation
-            top_members = self.total_CFs
-            new_generation_1 = np.array([population[int(tup[0])] for tup in population_fitness[:top_members]])
-
-            # rest of the next generation obtained from top 50% of fittest members of current generation
-            rest_members = self.population_size - top_members
-            new_generation_2 = None
-            if rest_members > 0:
-                new_generation_2 = np.zeros((rest_members, self.data_interface.number_of_features))
-                for new_gen_idx in range(rest_members):
-                    parent1 = random.choice(population[:int(len(population) / 2)])
-                    parent2 = random.choice(population[:int(len(population) / 2)])
-                    child = self.mate(parent1, parent2, features_to_vary, query_instance)
-                    new_generation_2[new_gen_idx] = child
-
-            if new_generation_2 is not None:
-                if self.total_CFs > 0:
-                    population = np.concatenate([new_generation_1, new_generation_2])
-                else:
-                    population = new_generation_2
-            else:
-                raise SystemError("The number of total_Cfs is greater than the population size!")
-            iterations += 1
+    def find_counterfactuals(self, query_instance, desired_range, desired_class,
+                             features_to_vary, maxiterations, thresh, verbose):
+        """Finds counterfactuals by generating cfs through the genetic algorithm"""
+        population = self.cfs.copy()
+        self.prepare_search(features_to_vary)
 
+        if self.num_islands > 1 and self.total_CFs > 0:
+            population = self.evolve_islands(population, query_instance, desired_range, desired_class,
+                                             features_to_vary, maxiterations, thresh)
+        else:
+            population = self.evolve_population(population, self.get_initial_search_state(), query_instance,
+                                                desired_range, desired_class, features_to_vary, maxiterations,
+                                                thresh)
+        return self.select_final_cfs(population, query_instance, verbose)
+
+    def select_final_cfs(self, population, query_instance, verbose):
+        """Keeps the valid counterfactuals among the fittest total_CFs members of the last generation and
+           stores them in final_cfs_df."""
         self.cfs_preds = []
         self.final_cfs = []
         i = 0
@@ -527,40 +1006,28 @@ class DiceGenetic(ExplainerBase):
         return input_instance
 
     def label_decode(self, labelled_input):
-        """Transforms label encoded data back to categorical values
+        """Transforms label encoded data back to categorical values. labelled_input is either one label encoded
+           instance or an array with one instance per row. The columns are decoded at once with lookup tables.
         """
-        num_to_decode = 1
-        if len(labelled_input.shape) > 1:
-            num_to_decode = len(labelled_input)
-        else:
-            labelled_input = [labelled_input]
-
-        input_instance = []
-
-        for j in range(num_to_decode):
-            temp = {}
-            for i in range(len(labelled_input[j])):
-                if self.data_interface.feature_names[i] in self.data_interface.categorical_feature_names:
-                    enc = self.labelencoder[self.data_interface.feature_names[i]]
-                    val = enc.inverse_transform(np.array([labelled_input[j][i]], dtype=np.int32))
-                    temp[self.data_interface.feature_names[i]] = val[0]
-                else:
-                    temp[self.data_interface.feature_names[i]] = labelled_input[j][i]
-            input_instance.append(temp)
-        input_instance_df = pd.DataFrame(input_instance, columns=self.data_interface.feature_names)
+        labelled_input = np.asarray(labelled_input)
+        if labelled_input.ndim == 1:
+            labelled_input = labelled_input.reshape(1, -1)
+
+        columns = {}
+        for i, feature in enumerate(self.data_interface.feature_names):
+            if feature in self.label_levels:
+                columns[feature] = self.label_levels[feature][labelled_input[:, i].astype(np.int32)]
+            else:
+                columns[feature] = labelled_input[:, i]
+        input_instance_df = pd.DataFrame(columns, columns=self.data_interface.feature_names)
+        if labelled_input.dtype == object:
+            input_instance_df = input_instance_df.infer_objects()
         return input_instance_df
 
     def label_decode_cfs(self, cfs_arr):
-        ret_df = None
-        if cfs_arr is None:
+        if cfs_arr is None or len(cfs_arr) == 0:
             return None
-        for cf in cfs_arr:
-            df = self.label_decode(cf)
-            if ret_df is None:
-                ret_df = df
-            else:
-                ret_df = ret_df.append(df)
-        return ret_df
+        return self.label_decode(np.array(cfs_arr))
 
     def get_valid_feature_range(self, normalized=False):
         ret = self.data_interface.get_valid_feature_range(self.feature_range, normalized=normalized)
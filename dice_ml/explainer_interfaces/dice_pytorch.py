@@ -5,12 +5,12 @@ from dice_ml.explainer_interfaces.explainer_base import ExplainerBase
 import torch
 
 import numpy as np
-import random
 import timeit
 import copy
 
 from dice_ml import diverse_counterfactuals as exp
 from dice_ml.counterfactual_explanations import CounterfactualExplanations
+from dice_ml.utils.rng import get_rng
 
 
 class DicePyTorch(ExplainerBase):
@@ -47,6 +47,8 @@ class DicePyTorch(ExplainerBase):
         self.feature_weights_input = ''
         self.hyperparameters = [1, 1, 1]  # proximity_weight, diversity_weight, categorical_penalty
         self.optimizer_weights = []  # optimizer, learning_rate
+        # random number generator of the current call, see generate_counterfactuals()
+        self.rng = get_rng()
 
     def generate_counterfactuals(self, query_instance, total_CFs, desired_class="opposite", proximity_weight=0.5,
                                  diversity_weight=1.0, categorical_penalty=0.1, algorithm="DiverseCF", features_to_vary="all",
@@ -54,7 +56,8 @@ class DicePyTorch(ExplainerBase):
                                  feature_weights="inverse_mad", optimizer="pytorch:adam", learning_rate=0.05, min_iter=500,
                                  max_iter=5000, project_iter=0, loss_diff_thres=1e-5, loss_converge_maxiter=1, verbose=False,
                                  init_near_query_instance=True, tie_random=False, stopping_threshold=0.5,
-                                 posthoc_sparsity_param=0.1, posthoc_sparsity_algorithm="linear"):
+                                 posthoc_sparsity_param=0.1, posthoc_sparsity_algorithm="linear",
+                                 random_seed=None):
         """Generates diverse counterfactual explanations
 
         :param query_instance: Test point of interest. A dictionary of feature names and values or a single row dataframe
@@ -90,13 +93,16 @@ class DicePyTorch(ExplainerBase):
         :param tie_random: Used in rounding off CFs and intermediate projection.
         :param stopping_threshold: Minimum threshold for counterfactuals target class probability.
         :param posthoc_sparsity_param: Parameter for the post-hoc operation on continuous features to enhance sparsity.
-        :param posthoc_sparsity_algorithm: Perform either linear or binary search. Takes "linear" or "binary".
+        :param posthoc_sparsity_algorithm: Perform linear, binary or grid search. Takes "linear", "binary" or "grid".
                                            Prefer binary search when a feature range is large
                                            (for instance, income varying from 10k to 1000k) and only if the features
                                            share a monotonic relationship with predicted outcome in the model.
+        :param random_seed: Random seed for reproducibility, or a numpy.random.Generator to draw from.
         :return: A CounterfactualExamples object to store and visualize the resulting
                  counterfactual explanations (see diverse_counterfactuals.py).
         """
+        self.rng = get_rng(random_seed)
+
         # check feature MAD validity and throw warnings
         if feature_weights == "inverse_mad":
             self.data_interface.get_valid_mads(display_warnings=True, return_mads=False)
@@ -150,7 +156,7 @@ class DicePyTorch(ExplainerBase):
 
     def predict_fn_for_sparsity(self, input_instance):
         """prediction function for sparsity correction"""
-        input_instance = self.data_interface.get_ohe_min_max_normalized_data(input_instance).iloc[0].values
+        input_instance = self.data_interface.get_ohe_min_max_normalized_data(input_instance).values
         return self.predict_fn(torch.tensor(input_instance).float())
 
     def do_cf_initializations(self, total_CFs, algorithm, features_to_vary):
@@ -177,7 +183,7 @@ class DicePyTorch(ExplainerBase):
             for ix in range(self.total_CFs):
                 one_init = []
                 for jx in range(self.minx.shape[1]):
-                    one_init.append(np.random.uniform(self.minx[0][jx], self.maxx[0][jx]))
+                    one_init.append(self.rng.uniform(self.minx[0][jx], self.maxx[0][jx]))
                 self.cfs.append(torch.tensor(one_init).float())
                 self.cfs[ix].requires_grad = True
 
@@ -334,7 +340,7 @@ class DicePyTorch(ExplainerBase):
                     if init_near_query_instance:
                         self.cfs[n].data[i] = query_instance[i]+(n*0.01)
                     else:
-                        self.cfs[n].data[i] = np.random.uniform(self.minx[0][i], self.maxx[0][i])
+                        self.cfs[n].data[i] = self.rng.uniform(self.minx[0][i], self.maxx[0][i])
                 else:
                     self.cfs[n].data[i] = query_instance[i]
 
@@ -355,7 +361,7 @@ class DicePyTorch(ExplainerBase):
                     cf[v[0]:v[-1]+1] == np.amax(cf[v[0]:v[-1]+1])).flatten().tolist()
                 if len(maxs) > 1:
                     if self.tie_random:
-                        ix = random.choice(maxs)
+                        ix = maxs[self.rng.integers(len(maxs))]
                     else:
                         ix = maxs[0]
                 else:
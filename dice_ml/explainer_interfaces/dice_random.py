@@ -6,11 +6,60 @@ A simple implementation.
 from dice_ml.explainer_interfaces.explainer_base import ExplainerBase
 import numpy as np
 import pandas as pd
-import random
 import timeit
 
 from dice_ml import diverse_counterfactuals as exp
-from dice_ml.constants import ModelTypes
+from dice_ml.constants import ModelTypes, SamplingDesigns
+from dice_ml.utils.exception import UserConfigValidationException
+from dice_ml.utils.rng import get_rng, spawn_rngs
+
+
+class UniqueRowsReservoir:
+    """Accumulates the unique rows of a stream of dataframes and keeps a uniform random sample of at most
+       capacity of them. Rows are deduplicated by their hash, so adding a row takes constant time
+       however many rows have been seen, and the rows that are not kept are never stored."""
+
+    def __init__(self, capacity, rng=None):
+        """Init method
+
+        :param capacity: Maximum number of rows kept.
+        :param rng: numpy.random.Generator used by the reservoir sample.
+        """
+        self.capacity = capacity
+        self.rng = get_rng(rng)
+        self.num_unique = 0
+        self.columns = None
+        self.dtypes = None
+        self._seen = set()
+        self._rows = []
+
+    def add(self, df):
+        """Adds the rows of a dataframe. Rows equal to a row added before are ignored."""
+        if len(df) == 0:
+            return
+        if self.columns is None:
+            self.columns = df.columns
+            self.dtypes = df.dtypes
+        hashes = pd.util.hash_pandas_object(df, index=False).values
+        values = df.to_numpy(dtype=object)
+        for row_ix, row_hash in enumerate(hashes):
+            if row_hash in self._seen:
+                continue
+            self._seen.add(row_hash)
+            # reservoir sampling: the i-th unique row replaces a kept row with probability capacity/i
+            if self.num_unique < self.capacity:
+                self._rows.append(values[row_ix])
+            else:
+                slot = self.rng.integers(self.num_unique + 1)
+                if slot < self.capacity:
+                    self._rows[slot] = values[row_ix]
+            self.num_unique += 1
+
+    def to_frame(self):
+        """Returns the rows kept as a dataframe, or None if no row was added."""
+        if self.columns is None:
+            return None
+        return pd.DataFrame(self._rows, columns=self.columns).astype(self.dtypes)
 
 
 class DiceRandom(ExplainerBase):
@@ -38,7 +87,9 @@ class DiceRandom(ExplainerBase):
     def _generate_counterfactuals(self, query_instance, total_CFs, desired_range=None,
                                   desired_class="opposite", permitted_range=None,
                                   features_to_vary="all", stopping_threshold=0.5, posthoc_sparsity_param=0.1,
-                                  posthoc_sparsity_algorithm="linear", sample_size=1000, random_seed=None, verbose=False):
+                                  posthoc_sparsity_algorithm="linear", sample_size=1000, random_seed=None, verbose=False,
+                                  adaptive=False, max_model_rows=None, time_budget=None, sampling="uniform",
+                                  shared_pool=False):
         """Generate counterfactuals by randomly sampling features.
 
         :param query_instance: Test point of interest. A dictionary of feature names and values or a single row dataframe.
@@ -52,28 +103,73 @@ class DiceRandom(ExplainerBase):
         :param features_to_vary: Either a string "all" or a list of feature names to vary.
         :param stopping_threshold: Minimum threshold for counterfactuals target class probability.
         :param posthoc_sparsity_param: Parameter for the post-hoc operation on continuous features to enhance sparsity.
-        :param posthoc_sparsity_algorithm: Perform either linear or binary search. Takes "linear" or "binary".
+        :param posthoc_sparsity_algorithm: Perform linear, binary or grid search. Takes "linear", "binary" or "grid".
                                            Prefer binary search when a feature range is large
                                            (for instance, income varying from 10k to 1000k) and only if the features
                                            share a monotonic relationship with predicted outcome in the model.
-        :param sample_size: Sampling size
-        :param random_seed: Random seed for reproducibility
+        :param sample_size: Sampling size. With adaptive sampling, the first sweep uses a smaller sample.
+        :param random_seed: Random seed for reproducibility, or a numpy.random.Generator to draw from. The query
+                            instances of a batch draw from independent streams derived from it.
+        :param adaptive: If True, sampling starts with a small sample that is doubled after every sweep over the
+                         features, up to sample_size, as long as not enough counterfactuals have been found and the
+                         budget allows. Without max_model_rows and time_budget, the budget is what a single
+                         non-adaptive sweep could use, sample_size rows per feature to vary.
+        :param max_model_rows: Maximum number of candidate rows scored by the model per query instance.
+        :param time_budget: Wall-clock budget of the search in seconds. A round of scoring is skipped when the
+                            time the model took per row so far predicts that it would not end within the budget.
+                            The budget used by every query instance, the rows scored by the model and the seconds
+                            until the query instance left the search, is stored in the budget_used attribute of the
+                            explainer.
+        :param sampling: Design used to sample the features, "uniform", "sobol" or "lhs". "sobol" and "lhs" draw
+                         the continuous features jointly from a scrambled Sobol sequence or a Latin hypercube and
+                         stratify the levels of categorical features, which covers feature_range more evenly than
+                         independent uniform samples. They require scipy>=1.7.
+        :param shared_pool: If True, the query instances of a batch share one pool of random samples and one choice
+                            of the features to change in every round. The pool is spliced into the features of every
+                            query instance, so sampling is done once per batch instead of once per query instance.
 
         :returns: A CounterfactualExamples object that contains the dataframe of generated counterfactuals as an attribute.
         """
-        self.features_to_vary = self.setup(features_to_vary, permitted_range, query_instance, feature_weights=None)
+        return self._generate_counterfactuals_batch(
+            query_instance, total_CFs, desired_range=desired_range, desired_class=desired_class,
+            permitted_range=permitted_range, features_to_vary=features_to_vary,
+            stopping_threshold=stopping_threshold, posthoc_sparsity_param=posthoc_sparsity_param,
+            posthoc_sparsity_algorithm=posthoc_sparsity_algorithm, sample_size=sample_size,
+            random_seed=random_seed, verbose=verbose, adaptive=adaptive, max_model_rows=max_model_rows,
+            time_budget=time_budget, sampling=sampling, shared_pool=shared_pool)[0]
 
-        if features_to_vary == "all":
-            self.fixed_features_values = {}
-        else:
-            self.fixed_features_values = {}
-            for feature in self.data_interface.feature_names:
-                if feature not in features_to_vary:
-                    self.fixed_features_values[feature] = query_instance[feature].iat[0]
+    def _generate_counterfactuals_batch(self, query_instances, total_CFs, desired_range=None,
+                                        desired_class="opposite", permitted_range=None,
+                                        features_to_vary="all", stopping_threshold=0.5, posthoc_sparsity_param=0.1,
+                                        posthoc_sparsity_algorithm="linear", sample_size=1000, random_seed=None,
+                                        verbose=False, adaptive=False, max_model_rows=None, time_budget=None,
+                                        sampling="uniform", shared_pool=False):
+        """Generate counterfactuals for a block of query instances by randomly sampling features.
+           Setup runs once for the whole block and, in every round, the candidates of all query instances
+           that still need counterfactuals are scored in a single model call.
+
+        :param query_instances: A dataframe with one or more rows. Test points of interest.
+        :param other_parameters: These are the same as the _generate_counterfactuals method.
 
-        # Do predictions once on the query_instance and reuse across to reduce the number
+        :returns: A list of CounterfactualExamples objects, one per query instance.
+        """
+        if sampling not in SamplingDesigns.ALL:
+            raise UserConfigValidationException(
+                "Unsupported sampling design {0} provided. Please choose one of {1}".format(sampling, SamplingDesigns.ALL))
+        if sampling != SamplingDesigns.Uniform:
+            try:
+                from scipy.stats import qmc  # noqa: F401
+            except ImportError:
+                raise UserConfigValidationException(
+                    "The {0} sampling design requires scipy>=1.7. Please upgrade scipy or use "
+                    "sampling=\"uniform\"".format(sampling))
+        query_instances = self.data_interface.prepare_query_instance(query_instances)
+        self.features_to_vary = self.setup(features_to_vary, permitted_range, query_instances, feature_weights=None)
+        num_queries = query_instances.shape[0]
+
+        # Do predictions once on the query instances and reuse across to reduce the number
         # inferences.
-        model_predictions = self.predict_fn(query_instance)
+        model_predictions = self.predict_fn(query_instances)
 
         # number of output nodes of ML model
         self.num_output_nodes = None
@@ -81,109 +177,285 @@ class DiceRandom(ExplainerBase):
             self.num_output_nodes = model_predictions.shape[1]
 
         # query_instance need no transformation for generating CFs using random sampling.
-        # find the predicted value of query_instance
-        test_pred = model_predictions[0]
+        # find the target class (and the stopping threshold that goes with it) of every query instance
+        target_cf_classes = np.full(num_queries, np.nan)
+        stopping_thresholds = np.full(num_queries, stopping_threshold, dtype=float)
         if self.model.model_type == ModelTypes.Classifier:
-            self.target_cf_class = self.infer_target_cfs_class(desired_class, test_pred, self.num_output_nodes)
+            for ix in range(num_queries):
+                target_cf_classes[ix] = self.infer_target_cfs_class(
+                    desired_class, model_predictions[ix], self.num_output_nodes)
+                # TODO Generalize this for multi-class
+                if target_cf_classes[ix] == 0 and stopping_threshold > 0.5:
+                    stopping_thresholds[ix] = 0.25
+                elif target_cf_classes[ix] == 1 and stopping_threshold < 0.5:
+                    stopping_thresholds[ix] = 0.75
         elif self.model.model_type == ModelTypes.Regressor:
             self.target_cf_range = self.infer_target_cfs_range(desired_range)
-        # fixing features that are to be fixed
         self.total_CFs = total_CFs
 
-        self.stopping_threshold = stopping_threshold
-        if self.model.model_type == ModelTypes.Classifier:
-            # TODO Generalize this for multi-class
-            if self.target_cf_class == 0 and self.stopping_threshold > 0.5:
-                self.stopping_threshold = 0.25
-            elif self.target_cf_class == 1 and self.stopping_threshold < 0.5:
-                self.stopping_threshold = 0.75
-
-        # get random samples for each feature independently
         start_time = timeit.default_timer()
-        random_instances = self.get_samples(
-            self.fixed_features_values,
-            self.feature_range, sampling_random_seed=random_seed, sampling_size=sample_size)
-        # Generate copies of the query instance that will be changed one feature
-        # at a time to encourage sparsity.
-        cfs_df = None
-        candidate_cfs = pd.DataFrame(
-            np.repeat(query_instance.values, sample_size, axis=0), columns=query_instance.columns)
+        deadline = None if time_budget is None else start_time + time_budget
+        # every query instance draws from its own stream, derived from random_seed, for the sampling, the
+        # choice of features and the final selection, so that its results do not depend on the rest of the batch
+        rngs = spawn_rngs(random_seed, num_queries + 1)
+        query_rngs = rngs[:num_queries]
+        # the shared pool draws from a stream of its own, next to the streams of the query instances
+        pool_rng = rngs[num_queries] if shared_pool else None
+        if adaptive:
+            current_sample_size = min(sample_size, max(10, 2 * total_CFs))
+            max_sample_size = sample_size
+            if max_model_rows is not None:
+                current_sample_size = max(1, min(current_sample_size, max_model_rows))
+                # a larger budget allows larger samples, as long as a sweep can still change every feature
+                max_sample_size = max(sample_size, max_model_rows // len(self.features_to_vary))
+            if max_model_rows is None and time_budget is None:
+                # never score more rows than a single sweep of the non-adaptive mode could
+                max_model_rows = sample_size * len(self.features_to_vary)
+        else:
+            current_sample_size = sample_size
+
+        # valid candidates are deduplicated by hash and capped at total_CFs with a reservoir sample
+        cf_reservoirs = [UniqueRowsReservoir(total_CFs, query_rngs[ix]) for ix in range(num_queries)]
+        model_rows_used = np.zeros(num_queries, dtype=int)
+        budget_exhausted = np.zeros(num_queries, dtype=bool)
+        pending_queries = list(range(num_queries))
+        # time spent by the model on the rows scored so far, to project the duration of the next round
+        scoring_time = {'seconds': 0.0, 'rows': 0}
+        # time at which every query instance last left a sweep, done or with its budget exhausted
+        query_end_times = np.full(num_queries, start_time)
+        # In adaptive mode, the query instances that still need counterfactuals after a sweep are swept
+        # again with a sample twice as large, until they are done or their budget is exhausted.
+        while len(pending_queries) > 0:
+            self._do_sampling_sweep(
+                query_instances, pending_queries, features_to_vary, current_sample_size, total_CFs, query_rngs,
+                target_cf_classes, stopping_thresholds, cf_reservoirs, model_rows_used, budget_exhausted,
+                max_model_rows, deadline, sampling, pool_rng, scoring_time, query_end_times)
+            if not adaptive:
+                break
+            pending_queries = [ix for ix in pending_queries if not budget_exhausted[ix] and
+                               cf_reservoirs[ix].num_unique < total_CFs]
+            current_sample_size = min(2 * current_sample_size, max_sample_size)
+
+        self.budget_used = [{'model_rows': int(model_rows_used[ix]),
+                             'elapsed': float(query_end_times[ix] - start_time),
+                             'budget_exhausted': bool(budget_exhausted[ix])} for ix in range(num_queries)]
+
+        # the counterfactuals of all query instances are scored in a single model call
+        cfs_dfs = [cf_reservoirs[ix].to_frame() for ix in range(num_queries)]
+        found_dfs = [cfs_df for cfs_df in cfs_dfs if cfs_df is not None and len(cfs_df) > 0]
+        cfs_pred_scores = [None] * num_queries
+        if len(found_dfs) > 0:
+            all_scores = self.predict_fn(pd.concat(found_dfs, ignore_index=True))
+            offset = 0
+            for ix, cfs_df in enumerate(cfs_dfs):
+                if cfs_df is not None and len(cfs_df) > 0:
+                    cfs_pred_scores[ix] = all_scores[offset:offset+len(cfs_df)]
+                    offset += len(cfs_df)
+        final_cfs_dfs = []
+        test_instance_dfs = []
+        for ix in range(num_queries):
+            final_cfs_dfs.append(self._select_final_cfs(cfs_dfs[ix], total_CFs, cfs_pred_scores[ix]))
+            test_instance_df = self.data_interface.prepare_query_instance(query_instances[ix:(ix+1)])
+            test_instance_df[self.data_interface.outcome_name] = \
+                np.array(np.round(self.get_model_output_from_scores((model_predictions[ix],)), self.outcome_precision))
+            test_instance_dfs.append(test_instance_df)
+
+        # post-hoc operation on continuous features to enhance sparsity - only for public data.
+        # The searches of all query instances run together.
+        final_cfs_dfs_sparse = [None] * num_queries
+        if posthoc_sparsity_param is not None and posthoc_sparsity_param > 0 and \
+                'data_df' in self.data_interface.__dict__:
+            for ix in range(num_queries):
+                if final_cfs_dfs[ix] is not None:
+                    final_cfs_dfs_sparse[ix] = final_cfs_dfs[ix].copy()
+            self.do_posthoc_sparsity_enhancement_batch(
+                final_cfs_dfs_sparse, test_instance_dfs, posthoc_sparsity_param, posthoc_sparsity_algorithm,
+                target_cf_classes=target_cf_classes, stopping_thresholds=stopping_thresholds,
+                target_cf_ranges=[self.target_cf_range] * num_queries
+                if self.model.model_type == ModelTypes.Regressor else None)
+
+        cf_examples_arr = []
+        for ix in range(num_queries):
+            cf_examples_arr.append(self._build_counterfactual_examples(
+                final_cfs_dfs[ix], test_instance_dfs[ix], final_cfs_dfs_sparse[ix], desired_range,
+                desired_class, posthoc_sparsity_param, start_time, verbose))
+        return cf_examples_arr
+
+    def _do_sampling_sweep(self, query_instances, queries, features_to_vary, sample_size, total_CFs, query_rngs,
+                           target_cf_classes, stopping_thresholds, cf_reservoirs, model_rows_used, budget_exhausted,
+                           max_model_rows, deadline, sampling="uniform", pool_rng=None, scoring_time=None,
+                           query_end_times=None):
+        """Samples candidates for the given query instances, changing one feature at a time, then two features,
+           and so on. Valid candidates are added to cf_reservoirs and the rows scored by the model are added to
+           model_rows_used. A query instance leaves the sweep once it has enough counterfactuals or when its
+           budget is exhausted, in which case budget_exhausted is set. If pool_rng is given, the samples and the
+           features changed in every round are drawn once from it and shared by all the query instances.
+           scoring_time accumulates the seconds spent by the model and the rows it scored, and is used to skip the
+           rounds that would not end before the deadline. query_end_times records the time at which every query
+           instance leaves the sweep."""
+        if scoring_time is None:
+            scoring_time = {'seconds': 0.0, 'rows': 0}
+        if query_end_times is None:
+            query_end_times = np.zeros(query_instances.shape[0])
+        if self._exceeds_deadline(deadline, scoring_time, len(queries) * sample_size):
+            # nothing is sampled for a sweep whose first round cannot end in time
+            budget_exhausted[list(queries)] = True
+            query_end_times[list(queries)] = timeit.default_timer()
+            return
+        # candidates are kept as typed column blocks, one array per column of the query instances, and are
+        # only turned into dataframes when they are passed to the model or returned
+        columns = query_instances.columns.tolist()
+        query_values = {column: np.asarray(
+            query_instances[column].values,
+            dtype=float if column in self.data_interface.continuous_feature_names else object) for column in columns}
+        candidate_cfs = {}
+        random_instances = {}
+        shared_instances = None
+        if pool_rng is not None:
+            # only the features to vary are ever spliced into the candidates, the others are not sampled
+            shared_fixed_values = {feature: query_instances[feature].iat[0]
+                                   for feature in self.data_interface.feature_names
+                                   if feature not in self.features_to_vary}
+            sample_columns = dict(zip(
+                self.data_interface.feature_names,
+                self._get_sample_columns(pool_rng, shared_fixed_values, self.feature_range, sample_size, sampling)))
+            shared_instances = [sample_columns[column] for column in columns]
+        for ix in queries:
+            # fixing features that are to be fixed
+            fixed_features_values = {}
+            if features_to_vary != "all":
+                for feature in self.data_interface.feature_names:
+                    if feature not in features_to_vary:
+                        fixed_features_values[feature] = query_values[feature][ix]
+            self.fixed_features_values = fixed_features_values
+
+            if shared_instances is not None:
+                random_instances[ix] = shared_instances
+            else:
+                # get random samples for each feature independently
+                sample_columns = dict(zip(
+                    self.data_interface.feature_names,
+                    self._get_sample_columns(query_rngs[ix], fixed_features_values, self.feature_range, sample_size,
+                                             sampling)))
+                random_instances[ix] = [sample_columns[column] for column in columns]
+            # Generate copies of the query instance that will be changed one feature
+            # at a time to encourage sparsity.
+            candidate_cfs[ix] = [
+                np.repeat(query_values[column][ix:(ix+1)], sample_size) for column in columns]
+
+        vary_positions = np.array([columns.index(feature) for feature in self.features_to_vary])
+        active_queries = list(queries)
         # Loop to change one feature at a time, then two features, and so on.
         for num_features_to_vary in range(1, len(self.features_to_vary)+1):
-            selected_features = np.random.choice(self.features_to_vary, (sample_size, 1), replace=True)
-            for k in range(sample_size):
-                candidate_cfs.at[k, selected_features[k][0]] = random_instances.at[k, selected_features[k][0]]
-            scores = self.predict_fn(candidate_cfs)
-            validity = self.decide_cf_validity(scores)
-            if sum(validity) > 0:
-                rows_to_add = candidate_cfs[validity == 1]
-
-                if cfs_df is None:
-                    cfs_df = rows_to_add.copy()
-                else:
-                    cfs_df = cfs_df.append(rows_to_add)
-                cfs_df.drop_duplicates(inplace=True)
-                # Always change at least 2 features before stopping
-                if num_features_to_vary >= 2 and len(cfs_df) >= total_CFs:
+            if self._exceeds_deadline(deadline, scoring_time, len(active_queries) * sample_size):
+                budget_exhausted[active_queries] = True
+                break
+            if max_model_rows is not None:
+                within_budget = [ix for ix in active_queries if model_rows_used[ix] + sample_size <= max_model_rows]
+                budget_exhausted[list(set(active_queries) - set(within_budget))] = True
+                query_end_times[list(set(active_queries) - set(within_budget))] = timeit.default_timer()
+                active_queries = within_budget
+                if len(active_queries) == 0:
                     break
 
+            if pool_rng is not None:
+                shared_masks = self._get_position_masks(
+                    vary_positions[pool_rng.integers(len(vary_positions), size=sample_size)])
+            for ix in active_queries:
+                if pool_rng is not None:
+                    position_masks = shared_masks
+                else:
+                    position_masks = self._get_position_masks(
+                        vary_positions[query_rngs[ix].integers(len(vary_positions), size=sample_size)])
+                for pos, rows in position_masks:
+                    candidate_cfs[ix][pos][rows] = random_instances[ix][pos][rows]
+            # candidates of all the active query instances are scored and validated together
+            scoring_start = timeit.default_timer()
+            scores = self.predict_fn(self._candidates_to_df(columns, [candidate_cfs[ix] for ix in active_queries]))
+            scoring_time['seconds'] += timeit.default_timer() - scoring_start
+            scoring_time['rows'] += len(active_queries) * sample_size
+            model_rows_used[active_queries] += sample_size
+            all_validity = self.decide_cf_validity(
+                scores,
+                target_cf_class=np.repeat(target_cf_classes[active_queries], sample_size),
+                stopping_threshold=np.repeat(stopping_thresholds[active_queries], sample_size))
+            still_active_queries = []
+            for pos, ix in enumerate(active_queries):
+                validity = all_validity[pos*sample_size:(pos+1)*sample_size]
+                if validity.any():
+                    cf_reservoirs[ix].add(self._candidates_to_df(
+                        columns, [[column[validity == 1] for column in candidate_cfs[ix]]]))
+                    # Always change at least 2 features before stopping
+                    if num_features_to_vary >= 2 and cf_reservoirs[ix].num_unique >= total_CFs:
+                        query_end_times[ix] = timeit.default_timer()
+                        continue
+                still_active_queries.append(ix)
+            active_queries = still_active_queries
+            if len(active_queries) == 0:
+                break
+        query_end_times[active_queries] = timeit.default_timer()
+
+    @staticmethod
+    def _exceeds_deadline(deadline, scoring_time, num_rows):
+        """Checks whether scoring num_rows more rows would end after the deadline, at the time per row the model
+           took so far."""
+        if deadline is None:
+            return False
+        seconds_per_row = scoring_time['seconds'] / scoring_time['rows'] if scoring_time['rows'] > 0 else 0.0
+        return timeit.default_timer() + num_rows * seconds_per_row > deadline
+
+    @staticmethod
+    def _get_position_masks(selected_positions):
+        """Returns (position, row mask) pairs for the columns selected for every row of the candidates."""
+        return [(pos, selected_positions == pos) for pos in np.unique(selected_positions)]
+
+    @staticmethod
+    def _candidates_to_df(columns, candidate_blocks):
+        """Stacks the column blocks of one or more sets of candidates into a single dataframe."""
+        return pd.DataFrame({column: np.concatenate([block[pos] for block in candidate_blocks])
+                             for pos, column in enumerate(columns)}, columns=columns)
+
+    def _select_final_cfs(self, cfs_df, total_CFs, cfs_pred_scores=None):
+        """Selects the final counterfactuals of a query instance from its valid candidates. The model scores of
+           the candidates are computed unless they are given in cfs_pred_scores."""
         self.total_cfs_found = 0
         self.valid_cfs_found = False
+        final_cfs_df = None
+        self.cfs_preds = None
+        self.cfs_pred_scores = None
+        self.final_cfs = None
         if cfs_df is not None and len(cfs_df) > 0:
-            if len(cfs_df) > total_CFs:
-                cfs_df = cfs_df.sample(total_CFs)
             cfs_df.reset_index(inplace=True, drop=True)
-            if len(cfs_df) > 0:
-                self.cfs_pred_scores = self.predict_fn(cfs_df)
-                cfs_df[self.data_interface.outcome_name] = self.get_model_output_from_scores(self.cfs_pred_scores)
-            else:
-                if self.model.model_type == ModelTypes.Classifier:
-                    self.cfs_pred_scores = [0]*self.num_output_nodes
-                else:
-                    self.cfs_pred_scores = [0]
             self.total_cfs_found = len(cfs_df)
-
             self.valid_cfs_found = True if self.total_cfs_found >= self.total_CFs else False
-            if len(cfs_df) > 0:
-                final_cfs_df = cfs_df[self.data_interface.feature_names + [self.data_interface.outcome_name]]
-                final_cfs_df[self.data_interface.outcome_name] = \
-                    final_cfs_df[self.data_interface.outcome_name].round(self.outcome_precision)
-                self.cfs_preds = final_cfs_df[[self.data_interface.outcome_name]].values
-                self.final_cfs = final_cfs_df[self.data_interface.feature_names].values
-            else:
-                final_cfs_df = None
-                self.cfs_preds = None
-                self.cfs_pred_scores = None
-                self.final_cfs = None
-        else:
-            final_cfs_df = None
-            self.cfs_preds = None
-            self.cfs_pred_scores = None
-            self.final_cfs = None
-        test_instance_df = self.data_interface.prepare_query_instance(query_instance)
-        test_instance_df[self.data_interface.outcome_name] = \
-            np.array(np.round(self.get_model_output_from_scores((test_pred,)), self.outcome_precision))
-        # post-hoc operation on continuous features to enhance sparsity - only for public data
-        if posthoc_sparsity_param is not None and posthoc_sparsity_param > 0 and \
-                self.final_cfs is not None and 'data_df' in self.data_interface.__dict__:
-            final_cfs_df_sparse = final_cfs_df.copy()
-            final_cfs_df_sparse = self.do_posthoc_sparsity_enhancement(
-                final_cfs_df_sparse, test_instance_df, posthoc_sparsity_param, posthoc_sparsity_algorithm)
-        else:
-            final_cfs_df_sparse = None
+            if len(cfs_df) == 0:
+                return final_cfs_df
+
+            self.cfs_pred_scores = self.predict_fn(cfs_df) if cfs_pred_scores is None else cfs_pred_scores
+            cfs_df[self.data_interface.outcome_name] = self.get_model_output_from_scores(self.cfs_pred_scores)
+            final_cfs_df = cfs_df[self.data_interface.feature_names + [self.data_interface.outcome_name]]
+            final_cfs_df[self.data_interface.outcome_name] = \
+                final_cfs_df[self.data_interface.outcome_name].round(self.outcome_precision)
+            self.cfs_preds = final_cfs_df[[self.data_interface.outcome_name]].values
+            self.final_cfs = final_cfs_df[self.data_interface.feature_names].values
+        return final_cfs_df
 
+    def _build_counterfactual_examples(self, final_cfs_df, test_instance_df, final_cfs_df_sparse, desired_range,
+                                       desired_class, posthoc_sparsity_param, start_time, verbose):
+        """Wraps the final counterfactuals of a query instance into a CounterfactualExamples object."""
+        total_cfs_found = 0 if final_cfs_df is None else len(final_cfs_df)
         self.elapsed = timeit.default_timer() - start_time
         m, s = divmod(self.elapsed, 60)
-        if self.valid_cfs_found:
+        if total_cfs_found >= self.total_CFs:
             if verbose:
                 print('Diverse Counterfactuals found! total time taken: %02d' %
                       m, 'min %02d' % s, 'sec')
         else:
-            if self.total_cfs_found == 0:
+            if total_cfs_found == 0:
                 print('No Counterfactuals found for the given configuration, perhaps try with different parameters...',
                       '; total time taken: %02d' % m, 'min %02d' % s, 'sec')
             else:
-                print('Only %d (required %d) ' % (self.total_cfs_found, self.total_CFs),
+                print('Only %d (required %d) ' % (total_cfs_found, self.total_CFs),
                       'Diverse Counterfactuals found for the given configuration, perhaps try with different parameters...',
                       '; total time taken: %02d' % m, 'min %02d' % s, 'sec')
 
@@ -196,45 +468,93 @@ class DiceRandom(ExplainerBase):
                                           desired_range=desired_range,
                                           model_type=self.model.model_type)
 
-    def get_samples(self, fixed_features_values, feature_range, sampling_random_seed, sampling_size):
+    def get_samples(self, fixed_features_values, feature_range, sampling_random_seed, sampling_size,
+                    sampling="uniform"):
+        """Samples the features within their ranges.
 
-        # first get required parameters
-        precisions = self.data_interface.get_decimal_precisions(output_type="dict")
+        :param fixed_features_values: Dictionary with the values of the features that are not allowed to vary.
+        :param feature_range: Dictionary with feature names as keys and ranges in list as values.
+        :param sampling_random_seed: Random seed for reproducibility, or a numpy.random.Generator to draw from.
+        :param sampling_size: Number of samples.
+        :param sampling: Sampling design, "uniform", "sobol" or "lhs".
 
-        categorical_features_frequencies = {}
-        for feature in self.data_interface.categorical_feature_names:
-            categorical_features_frequencies[feature] = len(self.data_interface.data_df[feature].value_counts())
+        :returns: A dataframe with one column per feature and sampling_size rows.
+        """
+        rng = get_rng(sampling_random_seed)
+        columns = self._get_sample_columns(rng, fixed_features_values, feature_range, sampling_size, sampling)
+        return pd.DataFrame(dict(zip(self.data_interface.feature_names, columns)))
 
-        if sampling_random_seed is not None:
-            random.seed(sampling_random_seed)
+    def _get_sample_columns(self, rng, fixed_features_values, feature_range, sampling_size, sampling="uniform"):
+        """Samples the features within their ranges and returns one typed array per feature, in the order of
+           feature_names. Categorical features are sampled as codes into the array of their levels and decoded
+           in a single indexing operation. With the "sobol" and "lhs" designs, every feature that varies gets a
+           column of a space-filling design over the unit hypercube, which is scaled to its range."""
+        precisions = self.data_interface.get_decimal_precisions(output_type="dict")
+        varying_features = [feature for feature in self.data_interface.feature_names
+                            if feature not in fixed_features_values]
+        unit_samples = None
+        if sampling != SamplingDesigns.Uniform and len(varying_features) > 0:
+            unit_samples = dict(zip(varying_features,
+                                    self.get_unit_design(sampling, len(varying_features), sampling_size, rng).T))
 
-        samples = []
+        columns = []
         for feature in self.data_interface.feature_names:
             if feature in fixed_features_values:
-                sample = [fixed_features_values[feature]]*sampling_size
+                column = np.full(sampling_size, fixed_features_values[feature])
             elif feature in self.data_interface.continuous_feature_names:
                 low = feature_range[feature][0]
                 high = feature_range[feature][1]
-                sample = self.get_continuous_samples(
-                    low, high, precisions[feature], size=sampling_size,
-                    seed=sampling_random_seed)
+                if unit_samples is None:
+                    column = self.get_continuous_samples(low, high, precisions[feature], size=sampling_size, rng=rng)
+                else:
+                    column = self.scale_continuous_samples(unit_samples[feature], low, high, precisions[feature])
             else:
-                if sampling_random_seed is not None:
-                    random.seed(sampling_random_seed)
-                sample = random.choices(feature_range[feature], k=sampling_size)
+                levels = np.asarray(feature_range[feature], dtype=object)
+                if unit_samples is None:
+                    codes = rng.integers(len(levels), size=sampling_size)
+                else:
+                    # the points of the design are split into equally sized strata by rank, one per level
+                    ranks = np.argsort(np.argsort(unit_samples[feature], kind='stable'), kind='stable')
+                    codes = ranks * len(levels) // sampling_size
+                column = levels[codes]
+            columns.append(column)
+        return columns
+
+    @staticmethod
+    def get_unit_design(sampling, num_dimensions, size, rng):
+        """Draws size points of a scrambled Sobol sequence or of a Latin hypercube in [0, 1)^num_dimensions.
+
+        :returns: A float array of shape (size, num_dimensions).
+        """
+        from scipy.stats import qmc
 
-            samples.append(sample)
-        samples = pd.DataFrame(dict(zip(self.data_interface.feature_names, samples)))
-        return samples
+        if sampling == SamplingDesigns.Sobol:
+            # Sobol points are balanced in blocks of powers of two, the first size points of the block are used
+            design = qmc.Sobol(num_dimensions, scramble=True, seed=rng)
+            return design.random_base2(int(np.ceil(np.log2(max(size, 1)))))[:size]
+        return qmc.LatinHypercube(num_dimensions, seed=rng).random(size)
 
-    def get_continuous_samples(self, low, high, precision, size=1000, seed=None):
-        if seed is not None:
-            np.random.seed(seed)
+    @staticmethod
+    def scale_continuous_samples(unit_samples, low, high, precision):
+        """Scales samples in [0, 1) to [low, high] at the given decimal precision."""
+        if precision == 0:
+            result = np.floor(int(low) + unit_samples * (int(high) - int(low) + 1))
+        else:
+            result = np.round(low + unit_samples * (high - low + 10**-precision), precision)
+        return np.clip(result, low, high)
+
+    def get_continuous_samples(self, low, high, precision, size=1000, seed=None, rng=None):
+        """Samples a continuous feature uniformly within [low, high] at the given decimal precision.
+
+        :param rng: numpy.random.Generator to sample from. If None, a generator is created from seed.
+
+        :returns: A float array with size samples.
+        """
+        if rng is None:
+            rng = get_rng(seed)
 
         if precision == 0:
-            result = np.random.randint(low, high+1, size).tolist()
-            result = [float(r) for r in result]
+            result = rng.integers(int(low), int(high)+1, size).astype(float)
         else:
-            result = np.random.uniform(low, high+(10**-precision), size)
-            result = [round(r, precision) for r in result]
+            result = np.round(rng.uniform(low, high+(10**-precision), size), precision)
         return result
@@ -5,12 +5,12 @@ from dice_ml.explainer_interfaces.explainer_base import ExplainerBase
 import tensorflow as tf
 
 import numpy as np
-import random
 import timeit
 import copy
 
 from dice_ml import diverse_counterfactuals as exp
 from dice_ml.counterfactual_explanations import CounterfactualExplanations
+from dice_ml.utils.rng import get_rng
 
 
 class DiceTensorFlow2(ExplainerBase):
@@ -47,6 +47,8 @@ class DiceTensorFlow2(ExplainerBase):
         self.feature_weights_input = ''
         self.hyperparameters = [1, 1, 1]  # proximity_weight, diversity_weight, categorical_penalty
         self.optimizer_weights = []  # optimizer, learning_rate
+        # random number generator of the current call, see generate_counterfactuals()
+        self.rng = get_rng()
 
     def generate_counterfactuals(self, query_instance, total_CFs, desired_class="opposite", proximity_weight=0.5,
                                  diversity_weight=1.0, categorical_penalty=0.1, algorithm="DiverseCF",
@@ -55,7 +57,8 @@ class DiceTensorFlow2(ExplainerBase):
                                  optimizer="tensorflow:adam", learning_rate=0.05, min_iter=500, max_iter=5000,
                                  project_iter=0, loss_diff_thres=1e-5, loss_converge_maxiter=1, verbose=False,
                                  init_near_query_instance=True, tie_random=False, stopping_threshold=0.5,
-                                 posthoc_sparsity_param=0.1, posthoc_sparsity_algorithm="linear"):
+                                 posthoc_sparsity_param=0.1, posthoc_sparsity_algorithm="linear",
+                                 random_seed=None):
         """Generates diverse counterfactual explanations
 
         :param query_instance: Test point of interest. A dictionary of feature names and values or a single row dataframe
@@ -93,14 +96,17 @@ class DiceTensorFlow2(ExplainerBase):
         :param tie_random: Used in rounding off CFs and intermediate projection.
         :param stopping_threshold: Minimum threshold for counterfactuals target class probability.
         :param posthoc_sparsity_param: Parameter for the post-hoc operation on continuous features to enhance sparsity.
-        :param posthoc_sparsity_algorithm: Perform either linear or binary search. Takes "linear" or "binary".
+        :param posthoc_sparsity_algorithm: Perform linear, binary or grid search. Takes "linear", "binary" or "grid".
                                            Prefer binary search when a feature range is large
                                            (for instance, income varying from 10k to 1000k) and only if the features
                                            share a monotonic relationship with predicted outcome in the model.
+        :param random_seed: Random seed for reproducibility, or a numpy.random.Generator to draw from.
 
         :return: A CounterfactualExamples object to store and visualize the resulting counterfactual explanations
                 (see diverse_counterfactuals.py).
         """
+        self.rng = get_rng(random_seed)
+
         # check feature MAD validity and throw warnings
         if feature_weights == "inverse_mad":
             self.data_interface.get_valid_mads(display_warnings=True, return_mads=False)
@@ -178,7 +184,7 @@ class DiceTensorFlow2(ExplainerBase):
             for ix in range(self.total_CFs):
                 one_init = [[]]
                 for jx in range(self.minx.shape[1]):
-                    one_init[0].append(np.random.uniform(self.minx[0][jx], self.maxx[0][jx]))
+                    one_init[0].append(self.rng.uniform(self.minx[0][jx], self.maxx[0][jx]))
                 self.cfs.append(tf.Variable(one_init, dtype=tf.float32))
 
     def do_loss_initializations(self, yloss_type, diversity_loss_type, feature_weights):
@@ -335,7 +341,7 @@ class DiceTensorFlow2(ExplainerBase):
                     if init_near_query_instance:
                         one_init.append(query_instance[0][i]+(n*0.01))
                     else:
-                        one_init.append(np.random.uniform(self.minx[0][i], self.maxx[0][i]))
+                        one_init.append(self.rng.uniform(self.minx[0][i], self.maxx[0][i]))
                 else:
                     one_init.append(query_instance[0][i])
             one_init = np.array([one_init], dtype=np.float32)
@@ -358,7 +364,7 @@ class DiceTensorFlow2(ExplainerBase):
                     cf[0, v[0]:v[-1]+1] == np.amax(cf[0, v[0]:v[-1]+1])).flatten().tolist()
                 if len(maxs) > 1:
                     if self.tie_random:
-                        ix = random.choice(maxs)
+                        ix = maxs[self.rng.integers(len(maxs))]
                     else:
                         ix = maxs[0]
                 else:
@@ -8,10 +8,13 @@ import pandas as pd
 from tqdm import tqdm
 
 from collections.abc import Iterable
+import numbers
 from sklearn.neighbors import KDTree
 from dice_ml.counterfactual_explanations import CounterfactualExplanations
+from dice_ml.feature_importance import count_feature_changes, FeatureImportanceAccumulator
 from dice_ml.utils.exception import UserConfigValidationException
 from dice_ml.constants import ModelTypes
+from dice_ml.utils.parallel import generate_counterfactuals_in_parallel
 
 
 class ExplainerBase(ABC):
@@ -24,6 +27,8 @@ class ExplainerBase(ABC):
         """
         # initiating data and model related parameters
         self.data_interface = data_interface
+        # partitions of the training data and their KD trees, see get_KD_tree
+        self.invalidate_KD_trees()
         if model_interface is not None:
             # self.data_interface.create_ohe_params()
             self.model = model_interface
@@ -49,7 +54,8 @@ class ExplainerBase(ABC):
                                  desired_class="opposite", desired_range=None,
                                  permitted_range=None, features_to_vary="all",
                                  stopping_threshold=0.5, posthoc_sparsity_param=0.1,
-                                 posthoc_sparsity_algorithm="linear", verbose=False, **kwargs):
+                                 posthoc_sparsity_algorithm="linear", verbose=False, batch_mode=False,
+                                 n_jobs=None, executor=None, **kwargs):
         """General method for generating counterfactuals.
 
         :param query_instances: Input point(s) for which counterfactuals are to be generated.
@@ -65,11 +71,24 @@ class ExplainerBase(ABC):
         :param features_to_vary: Either a string "all" or a list of feature names to vary.
         :param stopping_threshold: Minimum threshold for counterfactuals target class probability.
         :param posthoc_sparsity_param: Parameter for the post-hoc operation on continuous features to enhance sparsity.
-        :param posthoc_sparsity_algorithm: Perform either linear or binary search. Takes "linear" or "binary".
+        :param posthoc_sparsity_algorithm: Perform linear, binary or grid search. Takes "linear", "binary" or "grid".
                                            Prefer binary search when a feature range is large (for instance,
                                            income varying from 10k to 1000k) and only if the features share a
                                            monotonic relationship with predicted outcome in the model.
+                                           Grid search moves features towards the query instance like linear
+                                           search, but scores all the candidate values of a feature in one
+                                           batched model call.
         :param verbose: Whether to output detailed messages.
+        :param batch_mode: Whether to generate counterfactuals for all query instances in one batched pass.
+                           Setup runs once and the candidates of all query instances are scored together.
+                           Explainers without a batched implementation fall back to one query instance at a time.
+        :param n_jobs: Number of worker processes across which the query instances are distributed. -1 uses all
+                       available CPUs. Each query instance gets its own seed derived from random_seed, also when
+                       the query instances are processed sequentially, so results do not depend on the number of
+                       workers. Defaults to None, which generates counterfactuals sequentially in the current
+                       process.
+        :param executor: The concurrent.futures.Executor class used to create the pool of workers when n_jobs is
+                         set. Defaults to ProcessPoolExecutor.
         :param sample_size: Sampling size
         :param random_seed: Random seed for reproducibility
         :param kwargs: Other parameters accepted by specific explanation method
@@ -80,16 +99,13 @@ class ExplainerBase(ABC):
         if total_CFs <= 0:
             raise UserConfigValidationException(
                 "The number of counterfactuals generated per query instance (total_CFs) should be a positive integer.")
-        cf_examples_arr = []
-        query_instances_list = []
-        if isinstance(query_instances, pd.DataFrame):
-            for ix in range(query_instances.shape[0]):
-                query_instances_list.append(query_instances[ix:(ix+1)])
-        elif isinstance(query_instances, Iterable):
-            query_instances_list = query_instances
-        for query_instance in tqdm(query_instances_list):
-            res = self._generate_counterfactuals(
-                query_instance, total_CFs,
+        parallel = n_jobs is not None or executor is not None
+        if batch_mode and parallel:
+            raise UserConfigValidationException(
+                "batch_mode cannot be combined with n_jobs or executor.")
+        if batch_mode:
+            cf_examples_arr = self._generate_counterfactuals_batch(
+                self._stack_query_instances(query_instances), total_CFs,
                 desired_class=desired_class,
                 desired_range=desired_range,
                 permitted_range=permitted_range,
@@ -99,9 +115,87 @@ class ExplainerBase(ABC):
                 posthoc_sparsity_algorithm=posthoc_sparsity_algorithm,
                 verbose=verbose,
                 **kwargs)
-            cf_examples_arr.append(res)
+            return CounterfactualExplanations(cf_examples_list=cf_examples_arr)
+
+        cf_examples_arr = []
+        query_instances_list = []
+        if isinstance(query_instances, pd.DataFrame):
+            for ix in range(query_instances.shape[0]):
+                query_instances_list.append(query_instances[ix:(ix+1)])
+        elif isinstance(query_instances, Iterable):
+            query_instances_list = query_instances
+        # the sequential path runs in the current process with the same per-query seeds as the workers
+        cf_examples_arr = generate_counterfactuals_in_parallel(
+            self, list(query_instances_list), total_CFs,
+            n_jobs=n_jobs if parallel else 1,
+            executor=executor,
+            desired_class=desired_class,
+            desired_range=desired_range,
+            permitted_range=permitted_range,
+            features_to_vary=features_to_vary,
+            stopping_threshold=stopping_threshold,
+            posthoc_sparsity_param=posthoc_sparsity_param,
+            posthoc_sparsity_algorithm=posthoc_sparsity_algorithm,
+            verbose=verbose,
+            **kwargs)
         return CounterfactualExplanations(cf_examples_list=cf_examples_arr)
 
+    def iter_counterfactuals(self, source, total_CFs, chunk_size=100, sink=None, **kwargs):
+        """Generates counterfactuals for a stream of query instances, one chunk at a time. Unlike
+           generate_counterfactuals, the counterfactual examples are yielded as soon as their chunk is
+           done and are not accumulated, so memory does not grow with the number of query instances.
+
+        :param source: The query instances. This can be a dataframe, an iterable of dataframes (for instance,
+                       the reader returned by pandas.read_csv with chunksize set) or a parquet reader
+                       exposing iter_batches (for instance, pyarrow.parquet.ParquetFile).
+        :param total_CFs: Total number of counterfactuals required per query instance.
+        :param chunk_size: Maximum number of query instances passed to generate_counterfactuals at a time.
+        :param sink: Optional callable that is called with every CounterfactualExamples object as soon as it
+                     is produced, for instance a dice_ml.utils.sinks.JSONLinesSink writing results to disk.
+        :param kwargs: Other parameters accepted by the generate_counterfactuals method, such as
+                       desired_class, batch_mode or n_jobs.
+
+        :returns: A generator of CounterfactualExamples objects, one per query instance, in the order of
+                  the query instances.
+        """
+        if isinstance(chunk_size, bool) or not isinstance(chunk_size, numbers.Integral) or chunk_size <= 0:
+            raise UserConfigValidationException("The chunk size (chunk_size) should be a positive integer.")
+        if sink is not None and not callable(sink):
+            raise UserConfigValidationException("The sink should be a callable or None.")
+        query_chunks = self._iter_query_chunks(source, chunk_size)
+        return self._iter_counterfactuals(query_chunks, total_CFs, sink, **kwargs)
+
+    def _iter_counterfactuals(self, query_chunks, total_CFs, sink, **kwargs):
+        """Generator behind iter_counterfactuals, run once its arguments are validated."""
+        for query_instances in query_chunks:
+            cf_examples_list = self.generate_counterfactuals(query_instances, total_CFs, **kwargs).cf_examples_list
+            for cf_examples in cf_examples_list:
+                if sink is not None:
+                    sink(cf_examples)
+                yield cf_examples
+
+    @staticmethod
+    def _iter_query_chunks(source, chunk_size):
+        """Splits a source of query instances into dataframes of at most chunk_size rows."""
+        if isinstance(source, pd.DataFrame):
+            source = [source]
+        elif hasattr(source, 'iter_batches'):
+            source = source.iter_batches(batch_size=chunk_size)
+        elif not isinstance(source, Iterable):
+            raise ValueError("Unsupported source of query instances: %s" % type(source).__name__)
+        return ExplainerBase._split_query_frames(source, chunk_size)
+
+    @staticmethod
+    def _split_query_frames(source, chunk_size):
+        for frame in source:
+            if not isinstance(frame, pd.DataFrame):
+                if hasattr(frame, 'to_pandas'):
+                    frame = frame.to_pandas()
+                else:
+                    raise ValueError("Unsupported chunk of query instances: %s" % type(frame).__name__)
+            for ix in range(0, frame.shape[0], chunk_size):
+                yield frame.iloc[ix:(ix+chunk_size)]
+
     @abstractmethod
     def _generate_counterfactuals(self, query_instance, total_CFs,
                                   desired_class="opposite", desired_range=None,
@@ -124,7 +218,7 @@ class ExplainerBase(ABC):
         :param features_to_vary: Either a string "all" or a list of feature names to vary.
         :param stopping_threshold: Minimum threshold for counterfactuals target class probability.
         :param posthoc_sparsity_param: Parameter for the post-hoc operation on continuous features to enhance sparsity.
-        :param posthoc_sparsity_algorithm: Perform either linear or binary search. Takes "linear" or "binary".
+        :param posthoc_sparsity_algorithm: Perform linear, binary or grid search. Takes "linear", "binary" or "grid".
                                            Prefer binary search when a feature range is large (for instance,
                                            income varying from 10k to 1000k) and only if the features share a
                                            monotonic relationship with predicted outcome in the model.
@@ -138,6 +232,44 @@ class ExplainerBase(ABC):
         """
         pass
 
+    def _generate_counterfactuals_batch(self, query_instances, total_CFs,
+                                        desired_class="opposite", desired_range=None,
+                                        permitted_range=None, features_to_vary="all",
+                                        stopping_threshold=0.5, posthoc_sparsity_param=0.1,
+                                        posthoc_sparsity_algorithm="linear", verbose=False, **kwargs):
+        """Internal method for generating counterfactuals for a block of query instances. Explainer classes
+           that can share setup and model calls across query instances override this method; the default
+           implementation generates counterfactuals one query instance at a time.
+
+        :param query_instances: A dataframe with one or more rows for which counterfactuals are to be generated.
+        :param other_parameters: These are the same as the _generate_counterfactuals method.
+
+        :returns: A list of CounterfactualExamples objects, one per query instance.
+        """
+        cf_examples_arr = []
+        for ix in tqdm(range(query_instances.shape[0])):
+            cf_examples_arr.append(self._generate_counterfactuals(
+                query_instances[ix:(ix+1)], total_CFs,
+                desired_class=desired_class,
+                desired_range=desired_range,
+                permitted_range=permitted_range,
+                features_to_vary=features_to_vary,
+                stopping_threshold=stopping_threshold,
+                posthoc_sparsity_param=posthoc_sparsity_param,
+                posthoc_sparsity_algorithm=posthoc_sparsity_algorithm,
+                verbose=verbose,
+                **kwargs))
+        return cf_examples_arr
+
+    def _stack_query_instances(self, query_instances):
+        """Stacks the query instances into a single dataframe with one row per query instance."""
+        if isinstance(query_instances, pd.DataFrame):
+            return query_instances.reset_index(drop=True)
+        elif isinstance(query_instances, Iterable):
+            return pd.concat([self.data_interface.prepare_query_instance(query_instance)
+                              for query_instance in query_instances], ignore_index=True)
+        raise ValueError("Query instances should be a pandas dataframe or a list of query instances")
+
     def setup(self, features_to_vary, permitted_range, query_instance, feature_weights):
         if features_to_vary == 'all':
             features_to_vary = self.data_interface.feature_names
@@ -145,16 +277,73 @@ class ExplainerBase(ABC):
         if permitted_range is None:  # use the precomputed default
             self.feature_range = self.data_interface.permitted_range
             feature_ranges_orig = self.feature_range
+            levels_index = self.data_interface.get_categorical_levels_index(permitted=True)
         else:  # compute the new ranges based on user input
             self.feature_range, feature_ranges_orig = self.data_interface.get_features_range(permitted_range)
-        self.check_query_instance_validity(features_to_vary, permitted_range, query_instance, feature_ranges_orig)
+            levels_index = self.data_interface.get_categorical_levels_index()
+        self.check_query_instance_validity(features_to_vary, permitted_range, query_instance, feature_ranges_orig,
+                                           levels_index=levels_index)
 
         # check feature MAD validity and throw warnings
         self.check_mad_validity(feature_weights)
 
         return features_to_vary
 
-    def check_query_instance_validity(self, features_to_vary, permitted_range, query_instance, feature_ranges_orig):
+    def check_query_instance_validity(self, features_to_vary, permitted_range, query_instance, feature_ranges_orig,
+                                      levels_index=None):
+        """Raises a ValueError for the first invalid value in the query instances. All rows are checked,
+           so that a block of query instances can be validated at once.
+
+        :param levels_index: Optional dictionary with a pandas Index of the values of every categorical feature
+                             in feature_ranges_orig, as returned by get_categorical_levels_index of the data
+                             interface. Built from feature_ranges_orig if not given.
+        """
+        if levels_index is None:
+            levels_index = {feature: pd.Index(feature_ranges_orig[feature], dtype=object).unique()
+                            for feature in self.data_interface.categorical_feature_names}
+        errors = self._get_query_instance_errors(features_to_vary, permitted_range, query_instance,
+                                                 self.feature_range, levels_index)
+        for feature in self.data_interface.categorical_feature_names:
+            outside_dataset = errors[('outside_dataset', feature)].values
+            outside_permitted_range = errors[('outside_permitted_range', feature)].values
+            invalid_rows = np.flatnonzero(outside_dataset | outside_permitted_range)
+            if len(invalid_rows) == 0:
+                continue
+            if outside_dataset[invalid_rows[0]]:
+                raise ValueError("Feature", feature, "has a value outside the dataset.")
+            raise ValueError("Feature:", feature, "is outside the permitted range and isn't allowed to vary.")
+
+    def validate_query_instances(self, query_instances, features_to_vary="all", permitted_range=None):
+        """Checks a batch of query instances at once and reports the invalid values of every row, instead
+           of raising on the first invalid row.
+
+        :param query_instances: Input point(s) for which counterfactuals are to be generated.
+                                This can be a dataframe with one or more rows, or a list of query instances.
+        :param features_to_vary: Either a string "all" or a list of feature names to vary.
+        :param permitted_range: Dictionary with feature names as keys and permitted range in list as values.
+                                Defaults to the range inferred from training data.
+
+        :returns: A boolean dataframe with one row per query instance. Its columns are pairs of an error and
+                  a categorical feature name. The error "outside_dataset" flags values not seen in the dataset
+                  (or outside the permitted range given to the data interface) and the error
+                  "outside_permitted_range" flags values outside permitted_range of features that are not
+                  allowed to vary. Rows with any error are given by errors.any(axis=1). A ValueError is raised if
+                  the columns of the query instances themselves are invalid.
+        """
+        query_instances = self._stack_query_instances(query_instances)
+        if features_to_vary == 'all':
+            features_to_vary = self.data_interface.feature_names
+        if permitted_range is None:
+            feature_range = self.data_interface.permitted_range
+            levels_index = self.data_interface.get_categorical_levels_index(permitted=True)
+        else:
+            feature_range, _ = self.data_interface.get_features_range(permitted_range)
+            levels_index = self.data_interface.get_categorical_levels_index()
+        return self._get_query_instance_errors(features_to_vary, permitted_range, query_instances,
+                                               feature_range, levels_index)
+
+    def _get_query_instance_errors(self, features_to_vary, permitted_range, query_instance, feature_range,
+                                   levels_index):
         for feature in query_instance:
             if feature == self.data_interface.outcome_name:
                 raise ValueError("Target", self.data_interface.outcome_name, "present in query instance")
@@ -162,17 +351,18 @@ class ExplainerBase(ABC):
             if feature not in self.data_interface.feature_names:
                 raise ValueError("Feature", feature, "not present in training data!")
 
+        errors = {}
         for feature in self.data_interface.categorical_feature_names:
-            if query_instance[feature].values[0] not in feature_ranges_orig[feature]:
-                raise ValueError("Feature", feature, "has a value outside the dataset.")
-
-            if feature not in features_to_vary and permitted_range is not None:
-                if feature in permitted_range and feature in self.data_interface.continuous_feature_names:
-                    if not permitted_range[feature][0] <= query_instance[feature].values[0] <= permitted_range[feature][1]:
-                        raise ValueError("Feature:", feature, "is outside the permitted range and isn't allowed to vary.")
-                elif feature in permitted_range and feature in self.data_interface.categorical_feature_names:
-                    if query_instance[feature].values[0] not in self.feature_range[feature]:
-                        raise ValueError("Feature:", feature, "is outside the permitted range and isn't allowed to vary.")
+            values = query_instance[feature].values.astype(object)
+            errors[('outside_dataset', feature)] = levels_index[feature].get_indexer(values) < 0
+            outside_permitted_range = np.zeros(len(values), dtype=bool)
+            if feature not in features_to_vary and permitted_range is not None and feature in permitted_range:
+                permitted_levels = pd.Index(feature_range[feature], dtype=object).unique()
+                outside_permitted_range = permitted_levels.get_indexer(values) < 0
+            errors[('outside_permitted_range', feature)] = outside_permitted_range
+        columns = pd.MultiIndex.from_arrays([[error for error, _ in errors], [feature for _, feature in errors]],
+                                            names=['error', 'feature'])
+        return pd.DataFrame(errors, index=query_instance.index, columns=columns)
 
     def local_feature_importance(self, query_instances, cf_examples_list=None,
                                  total_CFs=10,
@@ -279,7 +469,7 @@ class ExplainerBase(ABC):
                            desired_class="opposite", desired_range=None,
                            permitted_range=None, features_to_vary="all", stopping_threshold=0.5,
                            posthoc_sparsity_param=0.1, posthoc_sparsity_algorithm="linear", 
-                           atol = 1e-8, **kwargs):
+                           atol = 1e-8, n_jobs=None, executor=None, **kwargs):
         """ Estimate feature importance scores for the given inputs.
 
         :param query_instances: A list of inputs for which to compute the
@@ -289,6 +479,9 @@ class ExplainerBase(ABC):
                                  all the following parameters are ignored.
         :param total_CFs: The number of counterfactuals to generate per input
                           (default is 10)
+        :param n_jobs: Number of worker processes used to generate the counterfactuals. See generate_counterfactuals.
+        :param executor: The concurrent.futures.Executor class used to create the pool of workers.
+                         See generate_counterfactuals.
         :param other_parameters: These are the same as the generate_counterfactuals method.
 
         :returns: An object of class CounterfactualExplanations that includes
@@ -305,70 +498,47 @@ class ExplainerBase(ABC):
                 stopping_threshold=stopping_threshold,
                 posthoc_sparsity_param=posthoc_sparsity_param,
                 posthoc_sparsity_algorithm=posthoc_sparsity_algorithm,
+                n_jobs=n_jobs,
+                executor=executor,
                 **kwargs).cf_examples_list
         allcols = self.data_interface.categorical_feature_names + self.data_interface.continuous_feature_names
+        change_counts, num_cfs = count_feature_changes(
+            cf_examples_list, self.data_interface.categorical_feature_names,
+            self.data_interface.continuous_feature_names, atol=atol)
+
         summary_importance = None
         local_importances = None
         if global_importance:
-            summary_importance = {}
-            # Initializing importance vector
-            for col in allcols:
-                summary_importance[col] = 0
+            overall_num_cfs = num_cfs.sum()
+            summary_counts = change_counts.sum(axis=0)
+            if overall_num_cfs > 0:
+                summary_counts = summary_counts / overall_num_cfs
+            summary_importance = dict(zip(allcols, summary_counts.tolist()))
 
         if local_importance:
-            local_importances = [{} for _ in range(len(cf_examples_list))]
-            # Initializing local importance for the ith query instance
+            local_importances = []
             for i in range(len(cf_examples_list)):
-                for col in allcols:
-                    local_importances[i][col] = 0
-
-        overall_num_cfs = 0
-        # Summarizing the found counterfactuals
-        for i in range(len(cf_examples_list)):
-            cf_examples = cf_examples_list[i]
-            org_instance = cf_examples.test_instance_df
-
-            if cf_examples.final_cfs_df_sparse is not None:
-                df = cf_examples.final_cfs_df_sparse
-            else:
-                df = cf_examples.final_cfs_df
-
-            if df is None:
-                continue
-
-            per_query_point_cfs = 0
-            for index, row in df.iterrows():
-                per_query_point_cfs += 1
-                for col in self.data_interface.continuous_feature_names:
-                    if not np.isclose(org_instance[col].iat[0], row[col], atol = atol):
-                        if summary_importance is not None:
-                            summary_importance[col] += 1
-                        if local_importances is not None:
-                            local_importances[i][col] += 1
-                for col in self.data_interface.categorical_feature_names:
-                    if org_instance[col].iat[0] != row[col]:
-                        if summary_importance is not None:
-                            summary_importance[col] += 1
-                        if local_importances is not None:
-                            local_importances[i][col] += 1
-
-            if local_importances is not None:
-                for col in allcols:
-                    if per_query_point_cfs > 0:
-                        local_importances[i][col] /= per_query_point_cfs
-
-            overall_num_cfs += per_query_point_cfs
-
-        if summary_importance is not None:
-            for col in allcols:
-                if overall_num_cfs > 0:
-                    summary_importance[col] /= overall_num_cfs
+                local_counts = change_counts[i]
+                if num_cfs[i] > 0:
+                    local_counts = local_counts / num_cfs[i]
+                local_importances.append(dict(zip(allcols, local_counts.tolist())))
 
         return CounterfactualExplanations(
             cf_examples_list,
             local_importance=local_importances,
             summary_importance=summary_importance)
 
+    def get_feature_importance_accumulator(self, atol=1e-8):
+        """Returns an empty FeatureImportanceAccumulator over the features of this explainer. Global feature
+           importance can then be estimated incrementally, by updating the accumulator with counterfactual
+           examples shard by shard and merging accumulators built on different shards.
+
+        :param atol: Absolute tolerance below which a continuous feature is considered unchanged.
+        """
+        return FeatureImportanceAccumulator(self.data_interface.categorical_feature_names,
+                                            self.data_interface.continuous_feature_names,
+                                            atol=atol)
+
     def predict_fn(self, input_instance):
         """prediction function"""
         return self.model.get_output(input_instance)
@@ -378,13 +548,13 @@ class ExplainerBase(ABC):
         return self.model.get_output(input_instance)
 
     def do_posthoc_sparsity_enhancement(self, final_cfs_sparse, query_instance, posthoc_sparsity_param,
-                                        posthoc_sparsity_algorithm):
+                                        posthoc_sparsity_algorithm, grid_size=1000):
         """Post-hoc method to encourage sparsity in a generated counterfactuals.
 
         :param final_cfs_sparse: Final CFs in original user-fed format, in a pandas dataframe.
         :param query_instance: Query instance in original user-fed format, in a pandas dataframe.
         :param posthoc_sparsity_param: Parameter for the post-hoc operation on continuous features to enhance sparsity.
-        :param posthoc_sparsity_algorithm: Perform either linear or binary search.
+        :param posthoc_sparsity_algorithm: Perform linear, binary or grid search.
                                            Prefer binary search when a feature range is
                                            large (for instance, income varying from 10k to 1000k)
                                            and only if the features share a monotonic relationship
@@ -392,7 +562,35 @@ class ExplainerBase(ABC):
         """
         if final_cfs_sparse is None:
             return final_cfs_sparse
-
+        return self.do_posthoc_sparsity_enhancement_batch(
+            [final_cfs_sparse], [query_instance], posthoc_sparsity_param, posthoc_sparsity_algorithm,
+            grid_size=grid_size)[0]
+
+    def do_posthoc_sparsity_enhancement_batch(self, final_cfs_sparse_list, query_instances_list,
+                                              posthoc_sparsity_param, posthoc_sparsity_algorithm,
+                                              target_cf_classes=None, stopping_thresholds=None,
+                                              target_cf_ranges=None, grid_size=1000):
+        """Post-hoc method to encourage sparsity in the generated counterfactuals of one or more query instances.
+           The searches of all counterfactuals advance in lockstep: at every step, the counterfactuals that
+           need a prediction are scored together in a single model call.
+
+        :param final_cfs_sparse_list: A list with the final CFs of every query instance in original user-fed
+                                      format, each in a pandas dataframe (or None). The dataframes are modified
+                                      in place.
+        :param query_instances_list: A list with the query instances in original user-fed format, each in a
+                                     pandas dataframe.
+        :param posthoc_sparsity_param: Parameter for the post-hoc operation on continuous features to enhance sparsity.
+        :param posthoc_sparsity_algorithm: Perform linear, binary or grid search.
+        :param target_cf_classes: A list with the target class of every query instance.
+                                  Defaults to self.target_cf_class for all query instances.
+        :param stopping_thresholds: A list with the stopping threshold of every query instance.
+                                    Defaults to self.stopping_threshold for all query instances.
+        :param target_cf_ranges: A list with the target range of every query instance.
+                                 Defaults to self.target_cf_range for all query instances.
+        :param grid_size: Maximum number of candidate values scored at once per feature and CF by the grid search.
+
+        :returns: The list of sparsified dataframes.
+        """
         # quantiles of the deviation from median for every continuous feature
         quantiles = self.data_interface.get_quantiles_from_training_data(quantile=posthoc_sparsity_param)
         mads = self.data_interface.get_valid_mads()
@@ -409,109 +607,235 @@ class ExplainerBase(ABC):
         precs = self.data_interface.get_decimal_precisions()
         decimal_prec = dict(zip(self.data_interface.continuous_feature_names, precs))
 
-        cfs_preds_sparse = []
-
-        for cf_ix in list(final_cfs_sparse.index):
-            current_pred = self.predict_fn_for_sparsity(final_cfs_sparse.loc[[cf_ix]][self.data_interface.feature_names])
-            for feature in features_sorted:
-                # current_pred = self.predict_fn_for_sparsity(final_cfs_sparse.iat[[cf_ix]][self.data_interface.feature_names])
-                # feat_ix = self.data_interface.continuous_feature_names.index(feature)
-                diff = query_instance[feature].iat[0] - int(final_cfs_sparse.at[cf_ix, feature])
-                if(abs(diff) <= quantiles[feature]):
-                    if posthoc_sparsity_algorithm == "linear":
-                        final_cfs_sparse = self.do_linear_search(diff, decimal_prec, query_instance, cf_ix,
-                                                                 feature, final_cfs_sparse, current_pred)
-
-                    elif posthoc_sparsity_algorithm == "binary":
-                        final_cfs_sparse = self.do_binary_search(
-                            diff, decimal_prec, query_instance, cf_ix, feature, final_cfs_sparse, current_pred)
-
-            temp_preds = self.predict_fn_for_sparsity(final_cfs_sparse.loc[[cf_ix]][self.data_interface.feature_names])
-            cfs_preds_sparse.append(temp_preds)
-
-        final_cfs_sparse[self.data_interface.outcome_name] = self.get_model_output_from_scores(cfs_preds_sparse)
-        # final_cfs_sparse[self.data_interface.outcome_name] = np.round(final_cfs_sparse[self.data_interface.outcome_name], 3)
-        return final_cfs_sparse
-
-    def do_linear_search(self, diff, decimal_prec, query_instance, cf_ix, feature, final_cfs_sparse, current_pred_orig):
+        feature_names = self.data_interface.feature_names
+        feature_indexes = {feature: feature_names.index(feature) for feature in features_sorted}
+        is_classifier = self.model.model_type == ModelTypes.Classifier
+
+        # stacking the CFs of all query instances, along with the targets of every CF
+        query_ixs = [ix for ix in range(len(final_cfs_sparse_list)) if final_cfs_sparse_list[ix] is not None]
+        if len(query_ixs) == 0:
+            return final_cfs_sparse_list
+        cfs_df = pd.concat([final_cfs_sparse_list[ix][feature_names] for ix in query_ixs], ignore_index=True)
+        rows = cfs_df.to_numpy(dtype=object)
+        num_cfs = [len(final_cfs_sparse_list[ix]) for ix in query_ixs]
+        row_targets = {}
+        for name, targets in [('target_cf_class', target_cf_classes), ('stopping_threshold', stopping_thresholds),
+                              ('target_cf_range', target_cf_ranges)]:
+            if targets is not None:
+                targets = np.asarray([targets[ix] for ix in query_ixs], dtype=float).reshape(len(query_ixs), -1)
+                if name != 'target_cf_range':
+                    targets = targets[:, 0]
+                row_targets[name] = np.repeat(targets, num_cfs, axis=0)
+        # continuous features may take fractional values during the search
+        predict_dtypes = {feature: (float if feature in feature_indexes else dtype)
+                          for feature, dtype in cfs_df.dtypes.items()}
+
+        def predict_rows(candidate_rows):
+            return self.predict_fn_for_sparsity(
+                pd.DataFrame(candidate_rows, columns=feature_names).astype(predict_dtypes))
+
+        searches = []
+        for ix, query_ix in enumerate(query_ixs):
+            for _ in range(num_cfs[ix]):
+                searches.append(self._sparsity_search_steps(
+                    rows[len(searches)], query_instances_list[query_ix], features_sorted, feature_indexes,
+                    quantiles, decimal_prec, posthoc_sparsity_algorithm, is_classifier, grid_size))
+
+        # every search yields a request whenever it needs to know whether a CF is valid: None for its
+        # current CF, or a (feature index, values) pair for copies of its current CF with that feature
+        # set to each of the values. The validity of the requested CFs is then sent back.
+        requests = {}
+        for row_ix, search in enumerate(searches):
+            requests[row_ix] = next(search)
+        pending = list(range(len(searches)))
+        while len(pending) > 0:
+            candidate_rows = []
+            candidate_row_ixs = []
+            for row_ix in pending:
+                if requests[row_ix] is None:
+                    candidate_rows.append(rows[row_ix:(row_ix+1)])
+                    candidate_row_ixs.append(row_ix)
+                else:
+                    feature_ix, values = requests[row_ix]
+                    grid_rows = np.repeat(rows[row_ix:(row_ix+1)], len(values), axis=0)
+                    grid_rows[:, feature_ix] = values
+                    candidate_rows.append(grid_rows)
+                    candidate_row_ixs.extend([row_ix] * len(values))
+            validity = self._decide_sparsity_validity(
+                predict_rows(np.concatenate(candidate_rows)),
+                **{name: targets[candidate_row_ixs] for name, targets in row_targets.items()})
+
+            still_pending = []
+            start = 0
+            for row_ix, block in zip(pending, candidate_rows):
+                block_validity = validity[start:(start+len(block))]
+                start += len(block)
+                try:
+                    requests[row_ix] = searches[row_ix].send(
+                        bool(block_validity[0]) if requests[row_ix] is None else block_validity)
+                    still_pending.append(row_ix)
+                except StopIteration:
+                    pass
+            pending = still_pending
+
+        outcomes = self.get_model_output_from_scores(predict_rows(rows))
+        start = 0
+        for ix, query_ix in enumerate(query_ixs):
+            final_cfs_sparse = final_cfs_sparse_list[query_ix]
+            query_rows = rows[start:(start+num_cfs[ix])]
+            for feature, feature_ix in feature_indexes.items():
+                values = query_rows[:, feature_ix]
+                if final_cfs_sparse[feature].dtype != object:
+                    values = values.astype(float)
+                    # integer features stay integers unless the search moved them to fractional values
+                    if pd.api.types.is_integer_dtype(final_cfs_sparse[feature]) and \
+                            np.all(values == np.round(values)):
+                        values = values.astype(final_cfs_sparse[feature].dtype)
+                final_cfs_sparse[feature] = values
+            final_cfs_sparse[self.data_interface.outcome_name] = outcomes[start:(start+num_cfs[ix])]
+            start += num_cfs[ix]
+        return final_cfs_sparse_list
+
+    def _decide_sparsity_validity(self, model_scores, target_cf_class=None, stopping_threshold=None,
+                                  target_cf_range=None):
+        """Vectorized version of is_cf_valid for a matrix of model scores."""
+        model_scores = np.asarray(model_scores)
+        model_scores = model_scores.reshape(len(model_scores), -1)
+        if self.model.model_type == ModelTypes.Classifier and self.num_output_nodes == 1:  # for tensorflow/pytorch models
+            if target_cf_class is None:
+                target_cf_class = self.target_cf_class
+            if stopping_threshold is None:
+                stopping_threshold = self.stopping_threshold
+            return self._is_above_threshold(
+                model_scores[:, 0], self._broadcast_to_rows(target_cf_class, len(model_scores)),
+                self._broadcast_to_rows(stopping_threshold, len(model_scores)))
+        return self.decide_cf_validity(model_scores, target_cf_class=target_cf_class,
+                                       stopping_threshold=stopping_threshold,
+                                       target_cf_range=target_cf_range).astype(bool)
+
+    def _sparsity_search_steps(self, row, query_instance, features_sorted, feature_indexes, quantiles,
+                               decimal_prec, posthoc_sparsity_algorithm, is_classifier, grid_size):
+        """Moves the continuous features of one CF (a row of feature values, modified in place) towards
+           the query instance, one feature at a time. This is a generator that yields whenever it needs
+           to know whether the current CF is still valid and expects the answer to be sent back."""
+        # validity of the CF before any change
+        valid_orig = yield
+        for feature in features_sorted:
+            feature_ix = feature_indexes[feature]
+            diff = query_instance[feature].iat[0] - int(row[feature_ix])
+            if abs(diff) <= quantiles[feature]:
+                if posthoc_sparsity_algorithm == "linear":
+                    if is_classifier:
+                        yield from self._linear_search_steps(
+                            diff, decimal_prec, query_instance, row, feature, feature_ix, valid_orig)
+                elif posthoc_sparsity_algorithm == "binary":
+                    yield from self._binary_search_steps(
+                        diff, decimal_prec, query_instance, row, feature, feature_ix)
+                elif posthoc_sparsity_algorithm == "grid":
+                    if valid_orig:
+                        yield from self._grid_search_steps(
+                            diff, decimal_prec, query_instance, row, feature, feature_ix, grid_size)
+
+    def _linear_search_steps(self, diff, decimal_prec, query_instance, row, feature, feature_ix, valid_orig):
         """Performs a greedy linear search - moves the continuous features in CFs towards original values in
            query_instance greedily until the prediction class changes."""
-
         old_diff = diff
         change = (10**-decimal_prec[feature])  # the minimal possible change for a feature
-        current_pred = current_pred_orig
-        if self.model.model_type == ModelTypes.Classifier:
-            while((abs(diff) > 10e-4) and (np.sign(diff*old_diff) > 0) and self.is_cf_valid(current_pred)):
-                old_val = int(final_cfs_sparse.at[cf_ix, feature])
-                final_cfs_sparse.at[cf_ix, feature] += np.sign(diff)*change
-                current_pred = self.predict_fn_for_sparsity(final_cfs_sparse.loc[[cf_ix]][self.data_interface.feature_names])
-                old_diff = diff
-
-                if not self.is_cf_valid(current_pred):
-                    final_cfs_sparse.at[cf_ix, feature] = old_val
-                    diff = query_instance[feature].iat[0] - int(final_cfs_sparse.at[cf_ix, feature])
-                    return final_cfs_sparse
-
-                diff = query_instance[feature].iat[0] - int(final_cfs_sparse.at[cf_ix, feature])
-
-        return final_cfs_sparse
-
-    def do_binary_search(self, diff, decimal_prec, query_instance, cf_ix, feature, final_cfs_sparse, current_pred):
+        valid = valid_orig
+        while((abs(diff) > 10e-4) and (np.sign(diff*old_diff) > 0) and valid):
+            old_val = int(row[feature_ix])
+            row[feature_ix] += np.sign(diff)*change
+            valid = yield
+            old_diff = diff
+
+            if not valid:
+                row[feature_ix] = old_val
+                return
+
+            diff = query_instance[feature].iat[0] - int(row[feature_ix])
+
+    def _grid_search_steps(self, diff, decimal_prec, query_instance, row, feature, feature_ix, grid_size):
+        """Scores all the values between a continuous feature of a CF and the corresponding value in
+           query_instance at once, with a step of one unit of decimal precision, and moves the feature to
+           the value closest to query_instance that is reached before the prediction class changes, as the
+           linear search does. When there are more than grid_size values, a strided grid of at most
+           grid_size values is scored first and the interval where the CF becomes invalid is refined,
+           coarse to fine."""
+        change = 10**-decimal_prec[feature]  # the minimal possible change for a feature
+        direction = np.sign(diff)
+        start_val = row[feature_ix]
+        # number of minimal changes between the CF and the query instance
+        num_steps = int(np.floor(abs(query_instance[feature].iat[0] - start_val) / change + 1e-9))
+        low, high = 0, num_steps  # the CF is valid after low steps; high is the last step to consider
+        while high > low:
+            stride = max(1, int(np.ceil((high - low) / grid_size)))
+            steps = np.arange(low + stride, high + 1, stride)
+            if steps[-1] != high:
+                steps = np.append(steps, high)
+            values = np.round(start_val + direction * steps * change, decimal_prec[feature])
+            validity = yield (feature_ix, values)
+            if np.all(validity):
+                low = steps[-1]
+                break
+            first_invalid = int(np.argmin(validity))
+            if first_invalid > 0:
+                low = steps[first_invalid - 1]
+            high = steps[first_invalid] - 1
+            if stride == 1:
+                break
+        if low > 0:
+            row[feature_ix] = np.round(start_val + direction * low * change, decimal_prec[feature])
+
+    def _binary_search_steps(self, diff, decimal_prec, query_instance, row, feature, feature_ix):
         """Performs a binary search between continuous features of a CF and corresponding values
            in query_instance until the prediction class changes."""
-
-        old_val = int(final_cfs_sparse.at[cf_ix, feature])
-        final_cfs_sparse.at[cf_ix, feature] = query_instance[feature].iat[0]
-        # Prediction of the query instance
-        current_pred = self.predict_fn_for_sparsity(final_cfs_sparse.loc[[cf_ix]][self.data_interface.feature_names])
+        old_val = int(row[feature_ix])
+        row[feature_ix] = query_instance[feature].iat[0]
 
         # first check if assigning query_instance values to a CF is required.
-        if self.is_cf_valid(current_pred):
-            return final_cfs_sparse
+        valid = yield
+        if valid:
+            return
         else:
-            final_cfs_sparse.at[cf_ix, feature] = old_val
+            row[feature_ix] = old_val
 
         # move the CF values towards the query_instance
         if diff > 0:
-            left = int(final_cfs_sparse.at[cf_ix, feature])
+            left = int(row[feature_ix])
             right = query_instance[feature].iat[0]
 
             while left <= right:
                 current_val = left + ((right - left)/2)
                 current_val = round(current_val, decimal_prec[feature])
 
-                final_cfs_sparse.at[cf_ix, feature] = current_val
-                current_pred = self.predict_fn_for_sparsity(final_cfs_sparse.loc[[cf_ix]][self.data_interface.feature_names])
-
+                row[feature_ix] = current_val
                 if current_val == right or current_val == left:
                     break
 
-                if self.is_cf_valid(current_pred):
+                valid = yield
+                if valid:
                     left = current_val + (10 ** -decimal_prec[feature])
                 else:
                     right = current_val - (10 ** -decimal_prec[feature])
 
         else:
             left = query_instance[feature].iat[0]
-            right = int(final_cfs_sparse.at[cf_ix, feature])
+            right = int(row[feature_ix])
 
             while right >= left:
                 current_val = right - ((right - left)/2)
                 current_val = round(current_val, decimal_prec[feature])
 
-                final_cfs_sparse.at[cf_ix, feature] = current_val
-                current_pred = self.predict_fn_for_sparsity(final_cfs_sparse.loc[[cf_ix]][self.data_interface.feature_names])
-
+                row[feature_ix] = current_val
                 if current_val == right or current_val == left:
                     break
 
-                if self.is_cf_valid(current_pred):
+                valid = yield
+                if valid:
                     right = current_val - (10**-decimal_prec[feature])
                 else:
                     left = current_val + (10**-decimal_prec[feature])
 
-        return final_cfs_sparse
-
     def misc_init(self, stopping_threshold, desired_class, desired_range, test_pred):
         self.stopping_threshold = stopping_threshold
         if self.model.model_type == ModelTypes.Classifier:
@@ -563,23 +887,59 @@ class ExplainerBase(ABC):
                 target_range = desired_range_input
         return target_range
 
-    def decide_cf_validity(self, model_outputs):
-        validity = np.zeros(len(model_outputs), dtype=np.int32)
-        for i in range(len(model_outputs)):
-            pred = model_outputs[i]
-            if self.model.model_type == ModelTypes.Classifier:
-                if self.num_output_nodes == 2:  # binary
-                    pred_1 = pred[self.num_output_nodes-1]
-                    validity[i] = 1 if \
-                        ((self.target_cf_class == 0 and pred_1 <= self.stopping_threshold) or
-                         (self.target_cf_class == 1 and pred_1 >= self.stopping_threshold)) else 0
-                else:  # multiclass
-                    if np.argmax(pred) == self.target_cf_class:
-                        validity[i] = 1
-            elif self.model.model_type == ModelTypes.Regressor:
-                if self.target_cf_range[0] <= pred <= self.target_cf_range[1]:
-                    validity[i] = 1
-        return validity
+    def decide_cf_validity(self, model_outputs, target_cf_class=None, stopping_threshold=None, target_cf_range=None):
+        """Decides which model outputs belong to the target class or target range.
+
+        :param model_outputs: A matrix of model scores with one row per counterfactual. The rows can come
+                              from several query instances stacked together.
+        :param target_cf_class: Target class, either a scalar or an array with one target class per row.
+                                Defaults to self.target_cf_class.
+        :param stopping_threshold: Threshold for the score of class 1 in binary classification, either a scalar
+                                   or an array with one threshold per row. Defaults to self.stopping_threshold.
+        :param target_cf_range: Target range for regression, either a [min, max] pair or an array with one
+                                pair per row. Defaults to self.target_cf_range.
+
+        :returns: An integer array with 1 for every valid row and 0 otherwise.
+        """
+        model_outputs = np.asarray(model_outputs)
+        num_rows = len(model_outputs)
+        if num_rows == 0:
+            return np.zeros(0, dtype=np.int32)
+        model_outputs = model_outputs.reshape(num_rows, -1)
+
+        if self.model.model_type == ModelTypes.Classifier:
+            if target_cf_class is None:
+                target_cf_class = self.target_cf_class
+            if stopping_threshold is None:
+                stopping_threshold = self.stopping_threshold
+            target_cf_class = self._broadcast_to_rows(target_cf_class, num_rows)
+            stopping_threshold = self._broadcast_to_rows(stopping_threshold, num_rows)
+            if model_outputs.shape[1] == 2:  # binary
+                validity = self._is_above_threshold(model_outputs[:, 1], target_cf_class, stopping_threshold)
+            else:  # multiclass
+                validity = np.argmax(model_outputs, axis=1) == target_cf_class
+        else:
+            if target_cf_range is None:
+                target_cf_range = self.target_cf_range
+            target_cf_range = np.asarray(target_cf_range, dtype=float).reshape(-1, 2)
+            pred = model_outputs[:, 0]
+            validity = (target_cf_range[:, 0] <= pred) & (pred <= target_cf_range[:, 1])
+        return validity.astype(np.int32)
+
+    @staticmethod
+    def _is_above_threshold(pred_1, target_cf_class, stopping_threshold):
+        """Checks the score of class 1 against the stopping threshold in the direction of the target class."""
+        return ((target_cf_class == 0) & (pred_1 <= stopping_threshold)) | \
+            ((target_cf_class == 1) & (pred_1 >= stopping_threshold))
+
+    @staticmethod
+    def _broadcast_to_rows(values, num_rows):
+        """Broadcasts a scalar, a singleton array (tf/torch targets have a (1,1) shape) or a
+           per-row array to one value per row."""
+        values = np.asarray(values, dtype=float)
+        if values.size == 1:
+            values = values.reshape(())
+        return np.broadcast_to(values, (num_rows,))
 
     def is_cf_valid(self, model_score):
         """Check if a cf belongs to the target class or target range.
@@ -589,45 +949,26 @@ class ExplainerBase(ABC):
         correct_dim = 1 if self.model.model_type == ModelTypes.Classifier else 0
         if hasattr(model_score, "shape") and len(model_score.shape) > correct_dim:
             model_score = model_score[0]
-        # Converting target_cf_class to a scalar (tf/torch have it as (1,1) shape)
-        if self.model.model_type == ModelTypes.Classifier:
-            target_cf_class = self.target_cf_class
-            if hasattr(self.target_cf_class, "shape"):
-                if len(self.target_cf_class.shape) == 1:
-                    target_cf_class = self.target_cf_class[0]
-                elif len(self.target_cf_class.shape) == 2:
-                    target_cf_class = self.target_cf_class[0][0]
-            target_cf_class = int(target_cf_class)
-
-            if self.num_output_nodes == 1:  # for tensorflow/pytorch models
-                pred_1 = model_score[0]
-                validity = True if \
-                    ((target_cf_class == 0 and pred_1 <= self.stopping_threshold) or
-                     (target_cf_class == 1 and pred_1 >= self.stopping_threshold)) else False
-                return validity
-            if self.num_output_nodes == 2:  # binary
-                pred_1 = model_score[self.num_output_nodes-1]
-                validity = True if \
-                    ((target_cf_class == 0 and pred_1 <= self.stopping_threshold) or
-                     (target_cf_class == 1 and pred_1 >= self.stopping_threshold)) else False
-                return validity
-            else:  # multiclass
-                return np.argmax(model_score) == target_cf_class
-        else:
-            return self.target_cf_range[0] <= model_score and model_score <= self.target_cf_range[1]
+        if self.model.model_type == ModelTypes.Classifier and self.num_output_nodes == 1:  # for tensorflow/pytorch models
+            target_cf_class = self._broadcast_to_rows(self.target_cf_class, 1)
+            return bool(self._is_above_threshold(np.reshape(model_score, -1)[:1], target_cf_class,
+                                                 self.stopping_threshold)[0])
+        return bool(self.decide_cf_validity(np.reshape(model_score, (1, -1)))[0])
 
     def get_model_output_from_scores(self, model_scores):
+        """Converts model scores to outputs, the predicted class for classifiers and the predicted
+           value for regressors. model_scores holds one score row (or value) per counterfactual."""
         if self.model.model_type == ModelTypes.Classifier:
             output_type = np.int32
         else:
             output_type = np.float32
-        model_output = np.zeros(len(model_scores), dtype=output_type)
-        for i in range(len(model_scores)):
-            if self.model.model_type == ModelTypes.Classifier:
-                model_output[i] = np.argmax(model_scores[i])
-            elif self.model.model_type == ModelTypes.Regressor:
-                model_output[i] = model_scores[i]
-        return model_output
+        model_scores = np.asarray(model_scores)
+        if len(model_scores) == 0:
+            return np.zeros(0, dtype=output_type)
+        model_scores = model_scores.reshape(len(model_scores), -1)
+        if self.model.model_type == ModelTypes.Classifier:
+            return np.argmax(model_scores, axis=1).astype(output_type)
+        return model_scores[:, 0].astype(output_type)
 
     def check_permitted_range(self, permitted_range):
         """checks permitted range for continuous features
@@ -657,12 +998,58 @@ class ExplainerBase(ABC):
         """This is used in VAE-based CF explainers."""
         return 1 / (1 + np.exp(-z))
 
-    def build_KD_tree(self, data_df_copy, desired_range, desired_class, predicted_outcome_name):
-        # Stores the predictions on the training data
-        dataset_instance = self.data_interface.prepare_query_instance(
-            query_instance=data_df_copy[self.data_interface.feature_names])
+    def invalidate_KD_trees(self):
+        """Drops the cached predictions on the training data and the cached KD trees. They are rebuilt on next
+           use. The cache is also dropped automatically when the model or data_df is replaced or the shape of
+           data_df changes; call this method after modifying either of them in place."""
+        self._KD_trees = {}
+        self._KD_trees_fingerprint = None
+        self._training_predictions = None
+        self._training_dummy_columns = None
+
+    def _check_KD_trees_fingerprint(self):
+        """Drops the cached KD trees if the model or data_df was replaced or data_df changed shape."""
+        data_df = self.data_interface.data_df
+        fingerprint = (id(self.model.model), id(data_df), data_df.shape)
+        if self._KD_trees_fingerprint != fingerprint:
+            self.invalidate_KD_trees()
+            self._KD_trees_fingerprint = fingerprint
+
+    def get_training_dummy_columns(self):
+        """Returns the columns of the one-hot encoding of the training features by pd.get_dummies, which
+           query instances are aligned to before querying a KD tree. They are computed once and cached with
+           the KD trees."""
+        self._check_KD_trees_fingerprint()
+        if self._training_dummy_columns is None:
+            self._training_dummy_columns = pd.get_dummies(
+                self.data_interface.data_df[self.data_interface.feature_names]).columns
+        return self._training_dummy_columns
+
+    def get_KD_tree(self, desired_range, desired_class, predicted_outcome_name):
+        """Returns the same values as build_KD_tree for the training data. The model scores the training data
+           once per explainer, and the partition and KD tree of every desired class (or desired range for
+           regression) are built once and cached."""
+        data_df = self.data_interface.data_df
+        self._check_KD_trees_fingerprint()
 
-        predictions = self.model.model.predict(dataset_instance)
+        if self.model.model_type == ModelTypes.Classifier:
+            key = (np.asarray(desired_class).item(), predicted_outcome_name)
+        else:
+            key = (tuple(desired_range), predicted_outcome_name)
+        if key not in self._KD_trees:
+            if self._training_predictions is None:
+                self._training_predictions = self.model.model.predict(self.data_interface.prepare_query_instance(
+                    query_instance=data_df[self.data_interface.feature_names]))
+            self._KD_trees[key] = self.build_KD_tree(data_df.copy(), desired_range, desired_class,
+                                                     predicted_outcome_name, predictions=self._training_predictions)
+        return self._KD_trees[key]
+
+    def build_KD_tree(self, data_df_copy, desired_range, desired_class, predicted_outcome_name, predictions=None):
+        # Stores the predictions on the training data
+        if predictions is None:
+            dataset_instance = self.data_interface.prepare_query_instance(
+                query_instance=data_df_copy[self.data_interface.feature_names])
+            predictions = self.model.model.predict(dataset_instance)
         # TODO: Is it okay to insert a column in the original dataframe with the predicted outcome? This is memory-efficient
         data_df_copy[predicted_outcome_name] = predictions
 
@@ -5,6 +5,7 @@ import numpy as np
 from dice_ml.explainer_interfaces.explainer_base import ExplainerBase
 from dice_ml import diverse_counterfactuals as exp
 from dice_ml.utils.helpers import get_base_gen_cf_initialization
+from dice_ml.utils.rng import get_rng, get_torch_generator
 
 # Pytorch
 import torch
@@ -40,12 +41,15 @@ class FeasibleBaseVAE(ExplainerBase):
         self.wm1 = kwargs['wm1']
         self.wm2 = kwargs['wm2']
         self.wm3 = kwargs['wm3']
+        # random stream for the data split, the batch order and the latent samples
+        self.rng = get_rng(kwargs.get('random_seed'))
 
         # Initializing parameters for the DiceBaseGenCF
         self.vae_train_dataset, self.vae_val_dataset, self.vae_test_dataset, self.normalise_weights, \
             self.cf_vae, self.cf_vae_optimizer = get_base_gen_cf_initialization(
                 self.data_interface, self.encoded_size, self.cont_minx, self.cont_maxx, self.margin,
-                self.validity_reg, self.epochs, self.wm1, self.wm2, self.wm3, self.learning_rate)
+                self.validity_reg, self.epochs, self.wm1, self.wm2, self.wm3, self.learning_rate,
+                random_seed=self.rng)
 
         # Data paths
         self.base_model_dir = '../../../dice_ml/utils/sample_trained_models/'
@@ -138,7 +142,8 @@ class FeasibleBaseVAE(ExplainerBase):
             train_size = 0
 
             train_dataset = torch.tensor(self.vae_train_feat).float()
-            train_dataset = torch.utils.data.DataLoader(train_dataset, batch_size=self.batch_size, shuffle=True)
+            train_dataset = torch.utils.data.DataLoader(train_dataset, batch_size=self.batch_size, shuffle=True,
+                                                        generator=get_torch_generator(self.rng))
             for train_x in enumerate(train_dataset):
                 self.cf_vae_optimizer.zero_grad()
 
@@ -162,11 +167,24 @@ class FeasibleBaseVAE(ExplainerBase):
                 torch.save(self.cf_vae.state_dict(), self.save_path)
 
     # The input arguments for this function same as the one defined for Diverse CF
-    def generate_counterfactuals(self, query_instance, total_CFs, desired_class="opposite"):
-
+    def generate_counterfactuals(self, query_instance, total_CFs, desired_class="opposite", random_seed=None):
+        """
+        :param query_instance: Test point of interest. A dictionary of feature names and values or a single row
+                               dataframe.
+        :param total_CFs: Total number of counterfactuals required.
+        :param desired_class: Desired counterfactual class - can take 0 or 1. Default value is "opposite" to the
+                              outcome class of query_instance for binary classification.
+        :param random_seed: Seed or numpy.random.Generator for the latent samples of this call. Defaults to the
+                            stream of the explainer.
+
+        :return: A CounterfactualExamples object to store and visualize the resulting counterfactual explanations
+                 (see diverse_counterfactuals.py).
+        """
         # Loading the latest trained CFVAE model
         self.cf_vae.load_state_dict(torch.load(self.save_path))
         self.cf_vae.eval()
+        rng = get_rng(random_seed) if random_seed is not None else self.rng
+        self.cf_vae.generator = get_torch_generator(rng)
 
         query_instance = self.data_interface.get_ohe_min_max_normalized_data(query_instance)
         query_instance = np.array([query_instance.iloc[0].values])
@@ -2,6 +2,7 @@
 from dice_ml.explainer_interfaces.explainer_base import ExplainerBase
 from dice_ml.explainer_interfaces.feasible_base_vae import FeasibleBaseVAE
 from dice_ml.utils.helpers import get_base_gen_cf_initialization
+from dice_ml.utils.rng import get_rng, get_torch_generator
 
 # Pytorch
 import torch
@@ -37,6 +38,8 @@ class FeasibleModelApprox(FeasibleBaseVAE, ExplainerBase):
         self.wm1 = kwargs['wm1']
         self.wm2 = kwargs['wm2']
         self.wm3 = kwargs['wm3']
+        # random stream for the data split, the batch order and the latent samples
+        self.rng = get_rng(kwargs.get('random_seed'))
 
         # Initializing parameters for the DiceModelApproxGenCF
         self.vae_train_dataset, self.vae_val_dataset, self.vae_test_dataset, self.normalise_weights, \
@@ -44,7 +47,8 @@ class FeasibleModelApprox(FeasibleBaseVAE, ExplainerBase):
             get_base_gen_cf_initialization(
                 self.data_interface, self.encoded_size, self.cont_minx,
                 self.cont_maxx, self.margin, self.validity_reg, self.epochs,
-                self.wm1, self.wm2, self.wm3, self.learning_rate)
+                self.wm1, self.wm2, self.wm3, self.learning_rate,
+                random_seed=self.rng)
 
         # Data paths
         self.base_model_dir = '../../../dice_ml/utils/sample_trained_models/'
@@ -82,7 +86,8 @@ class FeasibleModelApprox(FeasibleBaseVAE, ExplainerBase):
             train_size = 0
 
             train_dataset = torch.tensor(self.vae_train_feat).float()
-            train_dataset = torch.utils.data.DataLoader(train_dataset, batch_size=self.batch_size, shuffle=True)
+            train_dataset = torch.utils.data.DataLoader(train_dataset, batch_size=self.batch_size, shuffle=True,
+                                                        generator=get_torch_generator(self.rng))
             for train_x in enumerate(train_dataset):
                 self.cf_vae_optimizer.zero_grad()
 
@@ -0,0 +1,152 @@
+"""Module containing helpers to estimate feature importance scores from counterfactual examples."""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from dice_ml.counterfactual_explanations import CounterfactualExplanations
+from dice_ml.diverse_counterfactuals import CounterfactualExamples
+from dice_ml.utils.exception import UserConfigValidationException
+
+
+def count_feature_changes(cf_examples_list, categorical_feature_names, continuous_feature_names, atol=1e-8):
+    """Counts, for every query instance, how many of its counterfactuals change each feature.
+       All counterfactuals are compared against their query instance in one pass per feature type.
+
+    :param cf_examples_list: A list of CounterfactualExamples objects.
+    :param categorical_feature_names: Names of the categorical features.
+    :param continuous_feature_names: Names of the continuous features.
+    :param atol: Absolute tolerance below which a continuous feature is considered unchanged.
+
+    :returns: A tuple of an integer array with one row per query instance and one column per feature
+              (categorical features first, then continuous features) holding the number of changes,
+              and an integer array holding the number of counterfactuals per query instance.
+    """
+    num_features = len(categorical_feature_names) + len(continuous_feature_names)
+
+    cfs_dfs = []
+    query_dfs = []
+    num_cfs = np.zeros(len(cf_examples_list), dtype=int)
+    for i, cf_examples in enumerate(cf_examples_list):
+        if cf_examples.final_cfs_df_sparse is not None:
+            df = cf_examples.final_cfs_df_sparse
+        else:
+            df = cf_examples.final_cfs_df
+        if df is None or len(df) == 0:
+            continue
+        num_cfs[i] = len(df)
+        cfs_dfs.append(df)
+        query_dfs.append(cf_examples.test_instance_df.iloc[[0] * len(df)])
+
+    change_counts = np.zeros((len(cf_examples_list), num_features), dtype=int)
+    if len(cfs_dfs) == 0:
+        return change_counts, num_cfs
+
+    cfs_df = pd.concat(cfs_dfs, ignore_index=True)
+    query_df = pd.concat(query_dfs, ignore_index=True)
+    categorical_changes = \
+        cfs_df[categorical_feature_names].values.astype(object) != \
+        query_df[categorical_feature_names].values.astype(object)
+    continuous_changes = ~np.isclose(query_df[continuous_feature_names].values.astype(float),
+                                     cfs_df[continuous_feature_names].values.astype(float), atol=atol)
+    changes = np.concatenate([categorical_changes, continuous_changes], axis=1).astype(int)
+
+    # summing the changes of the counterfactuals of every query instance
+    nonempty = num_cfs > 0
+    offsets = np.concatenate([[0], np.cumsum(num_cfs[nonempty])[:-1]])
+    change_counts[nonempty] = np.add.reduceat(changes, offsets, axis=0)
+    return change_counts, num_cfs
+
+
+class FeatureImportanceAccumulator:
+    """An incremental estimate of global feature importance. It only keeps the raw number of changes
+       per feature and the total number of counterfactuals, so counterfactual examples can be added
+       shard by shard and accumulators built on different shards can be merged and serialized.
+
+    :param categorical_feature_names: Names of the categorical features.
+    :param continuous_feature_names: Names of the continuous features.
+    :param atol: Absolute tolerance below which a continuous feature is considered unchanged.
+    """
+    def __init__(self, categorical_feature_names, continuous_feature_names, atol=1e-8):
+        self.categorical_feature_names = list(categorical_feature_names)
+        self.continuous_feature_names = list(continuous_feature_names)
+        self.atol = atol
+        self.change_counts = np.zeros(len(self.feature_names), dtype=int)
+        self.num_cfs = 0
+        self.num_query_instances = 0
+
+    @property
+    def feature_names(self):
+        return self.categorical_feature_names + self.continuous_feature_names
+
+    def update(self, cf_examples):
+        """Adds counterfactual examples to the accumulator.
+
+        :param cf_examples: A CounterfactualExamples object, a list of them or a
+                            CounterfactualExplanations object.
+
+        :returns: The accumulator itself.
+        """
+        if isinstance(cf_examples, CounterfactualExplanations):
+            cf_examples_list = cf_examples.cf_examples_list
+        elif isinstance(cf_examples, CounterfactualExamples):
+            cf_examples_list = [cf_examples]
+        else:
+            cf_examples_list = list(cf_examples)
+
+        change_counts, num_cfs = count_feature_changes(
+            cf_examples_list, self.categorical_feature_names, self.continuous_feature_names, atol=self.atol)
+        self.change_counts += change_counts.sum(axis=0)
+        self.num_cfs += int(num_cfs.sum())
+        self.num_query_instances += len(cf_examples_list)
+        return self
+
+    def merge(self, other):
+        """Adds the counts of another accumulator, for instance one built on another shard.
+
+        :param other: A FeatureImportanceAccumulator over the same features and with the same atol.
+
+        :returns: The accumulator itself.
+        """
+        if other.feature_names != self.feature_names or other.atol != self.atol:
+            raise UserConfigValidationException(
+                "Only accumulators over the same features and with the same atol can be merged.")
+        self.change_counts += other.change_counts
+        self.num_cfs += other.num_cfs
+        self.num_query_instances += other.num_query_instances
+        return self
+
+    def finalize(self):
+        """Returns the global feature importance scores accumulated so far.
+
+        :returns: A dictionary with the fraction of counterfactuals changing each feature, in
+                  the same format as the summary_importance of CounterfactualExplanations.
+        """
+        summary_counts = self.change_counts
+        if self.num_cfs > 0:
+            summary_counts = summary_counts / self.num_cfs
+        summary_importance = dict(zip(self.feature_names, summary_counts.tolist()))
+        return dict(sorted(summary_importance.items(), key=lambda x: x[1], reverse=True))
+
+    def to_json(self):
+        return json.dumps({
+            'categorical_feature_names': self.categorical_feature_names,
+            'continuous_feature_names': self.continuous_feature_names,
+            'atol': self.atol,
+            'change_counts': self.change_counts.tolist(),
+            'num_cfs': self.num_cfs,
+            'num_query_instances': self.num_query_instances
+        })
+
+    @staticmethod
+    def from_json(json_str):
+        accumulator_dict = json.loads(json_str)
+        accumulator = FeatureImportanceAccumulator(
+            accumulator_dict['categorical_feature_names'],
+            accumulator_dict['continuous_feature_names'],
+            atol=accumulator_dict['atol'])
+        accumulator.change_counts = np.array(accumulator_dict['change_counts'], dtype=int)
+        accumulator.num_cfs = accumulator_dict['num_cfs']
+        accumulator.num_query_instances = accumulator_dict['num_query_instances']
+        return accumulator
@@ -155,10 +155,11 @@ def get_adult_data_info():
 
 
 def get_base_gen_cf_initialization(data_interface, encoded_size, cont_minx, cont_maxx, margin, validity_reg, epochs,
-                                   wm1, wm2, wm3, learning_rate):
+                                   wm1, wm2, wm3, learning_rate, random_seed=None):
     # Dice Imports - TODO: keep this method for VAE as a spearate module or move it to feasible_base_vae.py.
     #                      Check dependencies.
     from dice_ml.utils.sample_architecture.vae_model import CF_VAE
+    from dice_ml.utils.rng import get_rng
 
     # Pytorch
     from torch import optim
@@ -178,7 +179,7 @@ def get_base_gen_cf_initialization(data_interface, encoded_size, cont_minx, cont
         normalise_weights[idx] = [_min, _max]
 
     # Train, Val, Test Splits
-    np.random.shuffle(dataset)
+    get_rng(random_seed).shuffle(dataset)
     test_fraction = 0.2
     # TODO: create an input parameter for data interface
     test_size = int(test_fraction*len(data_interface.data_df))
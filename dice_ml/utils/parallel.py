@@ -0,0 +1,138 @@
+"""
+This module contains helper functions to generate counterfactuals for many query instances in parallel workers,
+and to run the islands of the genetic algorithm in parallel workers.
+"""
+import copy
+import inspect
+import os
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from tqdm import tqdm
+
+# explainer held by the current worker, set once per worker by _init_worker
+_worker_state = threading.local()
+
+
+def get_query_seeds(num_queries, random_seed=None):
+    """Derives one deterministic seed per query instance from random_seed. The seed of a query instance
+       only depends on random_seed and on the position of the query instance, not on how the query
+       instances are distributed across workers."""
+    seed_sequence = np.random.SeedSequence(random_seed)
+    return [int(child.generate_state(1)[0]) for child in seed_sequence.spawn(num_queries)]
+
+
+def _init_worker(explainer):
+    # explainers store per-query state, so every worker keeps its own copy
+    _worker_state.explainer = copy.deepcopy(explainer)
+
+
+def _generate_counterfactuals_with_seed(explainer, query_ix, query_instance, seed, total_CFs, kwargs):
+    if seed is None:
+        # without a random_seed, the explainer keeps drawing from the random state of the current process
+        pass
+    elif 'random_seed' in inspect.signature(explainer._generate_counterfactuals).parameters:
+        kwargs = dict(kwargs, random_seed=seed)
+    else:
+        # explainers without their own random stream draw from the process-wide random state
+        random.seed(seed)
+        np.random.seed(seed)
+    return query_ix, explainer._generate_counterfactuals(query_instance, total_CFs, **kwargs)
+
+
+def _generate_counterfactuals_in_worker(query_ix, query_instance, seed, total_CFs, kwargs):
+    return _generate_counterfactuals_with_seed(
+        _worker_state.explainer, query_ix, query_instance, seed, total_CFs, kwargs)
+
+
+def _evolve_island_in_worker(island_ix, population, search_state, rng, maxiterations, island_context, kwargs):
+    explainer = _worker_state.explainer
+    explainer.set_island_context(island_context)
+    explainer.rng = rng
+    population = explainer.evolve_population(population, search_state, maxiterations=maxiterations, **kwargs)
+    return island_ix, population, search_state, explainer.rng
+
+
+def create_worker_pool(explainer, n_jobs, executor=None):
+    """Creates a pool of n_jobs workers that each hold their own copy of explainer.
+
+    :param explainer: The explainer object shipped to every worker once, through the initializer of the pool.
+    :param n_jobs: Number of workers.
+    :param executor: The concurrent.futures.Executor class used to create the pool. Defaults to ProcessPoolExecutor.
+
+    :returns: The pool of workers.
+    """
+    if executor is None:
+        executor = ProcessPoolExecutor
+    return executor(max_workers=n_jobs, initializer=_init_worker, initargs=(explainer,))
+
+
+def evolve_islands_in_parallel(pool, island_ixs, populations, search_states, rngs, maxiterations, island_context,
+                               kwargs):
+    """Runs the evolve_population method of the explainer of the workers of pool on several islands of a genetic
+       search at once. populations, search_states and rngs are lists with one entry per island, and the entries
+       of the islands in island_ixs are replaced by the results of their worker.
+
+    :param pool: A pool of workers created by create_worker_pool.
+    :param island_ixs: Indexes of the islands to evolve.
+    :param populations: Populations of the islands.
+    :param search_states: Search states of the islands, see DiceGenetic.get_initial_search_state.
+    :param rngs: Random number generators of the islands.
+    :param maxiterations: Generation count up to which every island in island_ixs evolves, in the same order.
+    :param island_context: Attributes of the explainer specific to the current query instance, set in the
+                           explainer of the worker before it evolves an island, see DiceGenetic.get_island_context.
+    :param kwargs: Other parameters accepted by the evolve_population method of the explainer.
+    """
+    futures = [pool.submit(_evolve_island_in_worker, island_ix, populations[island_ix],
+                           search_states[island_ix], rngs[island_ix], island_maxiterations, island_context,
+                           kwargs)
+               for island_ix, island_maxiterations in zip(island_ixs, maxiterations)]
+    for future in as_completed(futures):
+        island_ix, populations[island_ix], search_states[island_ix], rngs[island_ix] = future.result()
+
+
+def generate_counterfactuals_in_parallel(explainer, query_instances_list, total_CFs, n_jobs=None, executor=None,
+                                         random_seed=None, **kwargs):
+    """Generates counterfactuals for every query instance in a pool of workers.
+
+    :param explainer: The explainer object used to generate counterfactuals.
+    :param query_instances_list: A list of query instances, each a dataframe with one row.
+    :param total_CFs: Total number of counterfactuals required per query instance.
+    :param n_jobs: Number of workers. -1 or None uses all available CPUs. With n_jobs=1 and no executor,
+                   the query instances are processed in the current process.
+    :param executor: The concurrent.futures.Executor class used to create the pool of workers. Defaults to
+                     ProcessPoolExecutor. The explainer is shipped to every worker once, through the initializer
+                     of the pool. Per-query seeds are passed to the explainer, which draws from its own random
+                     stream, so results are reproducible with thread pools too. Explainers without a random_seed
+                     parameter are seeded through the process-wide random state instead, which is only
+                     reproducible with a process pool.
+    :param random_seed: Seed from which the per-query seeds are derived. When it is None and the query instances
+                        are processed in the current process, the explainer draws from the current random state.
+    :param kwargs: Other parameters accepted by the _generate_counterfactuals method of the explainer.
+
+    :returns: A list of CounterfactualExamples objects, one per query instance, in the order of the query instances.
+    """
+    cf_examples_arr = [None] * len(query_instances_list)
+
+    if n_jobs is None or n_jobs == -1:
+        n_jobs = os.cpu_count()
+    if n_jobs == 1 and executor is None:
+        seeds = [None] * len(query_instances_list) if random_seed is None else \
+            get_query_seeds(len(query_instances_list), random_seed)
+        for query_ix, query_instance in enumerate(tqdm(query_instances_list)):
+            _, cf_examples_arr[query_ix] = _generate_counterfactuals_with_seed(
+                explainer, query_ix, query_instance, seeds[query_ix], total_CFs, kwargs)
+        return cf_examples_arr
+
+    # workers are seeded even without a random_seed, so that forked workers do not share one random state
+    seeds = get_query_seeds(len(query_instances_list), random_seed)
+    with create_worker_pool(explainer, n_jobs, executor=executor) as pool:
+        futures = [pool.submit(_generate_counterfactuals_in_worker,
+                               query_ix, query_instance, seeds[query_ix], total_CFs, kwargs)
+                   for query_ix, query_instance in enumerate(query_instances_list)]
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            query_ix, cf_examples = future.result()
+            cf_examples_arr[query_ix] = cf_examples
+    return cf_examples_arr
@@ -0,0 +1,47 @@
+"""
+This module contains helper functions to create the random number generators used by the explainers. Every
+call of an explainer draws from its own numpy.random.Generator instead of the global random state, so explainers
+can run concurrently and reproducibly.
+"""
+import numpy as np
+
+
+def get_rng(random_seed=None):
+    """Returns a random number generator for random_seed.
+
+    :param random_seed: None, an int, a numpy.random.SeedSequence or a numpy.random.Generator. A generator is returned
+                        as is, so that a caller can pass its own stream down. None gives a generator seeded with
+                        fresh entropy.
+
+    :returns: A numpy.random.Generator.
+    """
+    if isinstance(random_seed, np.random.Generator):
+        return random_seed
+    return np.random.default_rng(random_seed)
+
+
+def spawn_rngs(random_seed, num_streams):
+    """Returns independent child generators derived from random_seed, for instance one per query instance of a
+       batch. The stream of a child only depends on random_seed and on its position.
+
+    :param random_seed: None, an int, a numpy.random.SeedSequence or a numpy.random.Generator. A generator is
+                        advanced to derive the children.
+    :param num_streams: Number of generators.
+
+    :returns: A list of numpy.random.Generator objects.
+    """
+    if isinstance(random_seed, np.random.Generator):
+        seed_sequence = np.random.SeedSequence(random_seed.integers(2**63, size=4))
+    elif isinstance(random_seed, np.random.SeedSequence):
+        seed_sequence = random_seed
+    else:
+        seed_sequence = np.random.SeedSequence(random_seed)
+    return [np.random.default_rng(child) for child in seed_sequence.spawn(num_streams)]
+
+
+def get_torch_generator(rng):
+    """Returns a torch.Generator seeded from a numpy.random.Generator, for the explainers based on PyTorch."""
+    import torch
+    generator = torch.Generator()
+    generator.manual_seed(int(rng.integers(2**63)))
+    return generator
@@ -9,6 +9,9 @@ class CF_VAE(nn.Module):
 
         super(CF_VAE, self).__init__()
 
+        # torch.Generator for the reparameterization noise, set by the explainer; None uses the global seed
+        self.generator = None
+
         self.encoded_size = encoded_size
         self.data_size = len(d.ohe_encoded_feature_names)
         self.minx, self.maxx, self.encoded_categorical_feature_indexes, self.encoded_continuous_feature_indexes, \
@@ -92,7 +95,9 @@ class CF_VAE(nn.Module):
         return mean
 
     def sample_latent_code(self, mean, logvar):
-        eps = torch.randn_like(logvar)
+        # the noise is drawn on the device of the generator, if any, and moved to the device of logvar
+        device = logvar.device if self.generator is None else self.generator.device
+        eps = torch.randn(logvar.shape, generator=self.generator, dtype=logvar.dtype, device=device).to(logvar.device)
         return mean + torch.sqrt(logvar)*eps
 
     def normal_likelihood(self, x, mean, logvar, raxis=1):
@@ -137,6 +142,9 @@ class AutoEncoder(nn.Module):
 
         super(AutoEncoder, self).__init__()
 
+        # torch.Generator for the reparameterization noise, set by the explainer; None uses the global seed
+        self.generator = None
+
         self.encoded_size = encoded_size
         self.data_size = len(d.encoded_feature_names)
         self.encoded_categorical_feature_indexes = d.get_data_params()[2]
@@ -224,7 +232,9 @@ class AutoEncoder(nn.Module):
         return mean
 
     def sample_latent_code(self, mean, logvar):
-        eps = torch.randn_like(logvar)
+        # the noise is drawn on the device of the generator, if any, and moved to the device of logvar
+        device = logvar.device if self.generator is None else self.generator.device
+        eps = torch.randn(logvar.shape, generator=self.generator, dtype=logvar.dtype, device=device).to(logvar.device)
         return mean + torch.sqrt(logvar)*eps
 
     def normal_likelihood(self, x, mean, logvar, raxis=1):
@@ -0,0 +1,36 @@
+"""
+This module contains sinks that write counterfactual examples incrementally, as they are produced.
+"""
+from dice_ml.constants import _SchemaVersions
+
+
+class JSONLinesSink:
+    """Writes every counterfactual example to a file as one JSON line, in the serialization format of
+       CounterfactualExamples.to_json. Each line is flushed as soon as it is written, so the results
+       produced so far survive a crash. The lines can be read back with CounterfactualExamples.from_json."""
+
+    def __init__(self, path, mode='a', serialization_version=_SchemaVersions.CURRENT_VERSION):
+        """Init method
+
+        :param path: Path of the file to write to.
+        :param mode: Mode in which the file is opened. Defaults to 'a', which appends to an existing file.
+        :param serialization_version: Serialization version passed to CounterfactualExamples.to_json.
+        """
+        self.path = path
+        self.serialization_version = serialization_version
+        self.file = open(path, mode)
+        self.count = 0
+
+    def __call__(self, cf_examples):
+        self.file.write(cf_examples.to_json(self.serialization_version) + '\n')
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -5,6 +5,7 @@ import dice_ml
 from dice_ml.utils import helpers
 
 from dice_ml.counterfactual_explanations import CounterfactualExplanations
+from dice_ml.feature_importance import FeatureImportanceAccumulator
 from dice_ml.utils.exception import UserConfigValidationException
 
 
@@ -219,6 +220,29 @@ class TestSerializationCounterfactualExplanations:
 
         assert recovered_counterfactual_explanations == counterfactual_explanations
 
+    @pytest.mark.parametrize("desired_class, total_CFs", [(0, 2)])
+    def test_random_feature_importance_accumulator(self, desired_class, sample_custom_query_10, total_CFs):
+        cf_examples_list = self.exp.generate_counterfactuals(
+            query_instances=sample_custom_query_10, desired_class=desired_class,
+            total_CFs=total_CFs).cf_examples_list
+        counterfactual_explanations = self.exp.feature_importance(
+            query_instances=None, cf_examples_list=cf_examples_list)
+
+        shard_accumulators = []
+        for shard in [cf_examples_list[:4], cf_examples_list[4:]]:
+            accumulator = self.exp.get_feature_importance_accumulator()
+            for cf_examples in shard:
+                accumulator.update(cf_examples)
+            shard_accumulators.append(FeatureImportanceAccumulator.from_json(accumulator.to_json()))
+
+        accumulator = shard_accumulators[0].merge(shard_accumulators[1])
+        assert accumulator.num_query_instances == sample_custom_query_10.shape[0]
+        assert accumulator.num_cfs == sum(len(cf_examples.final_cfs_df) for cf_examples in cf_examples_list)
+        assert accumulator.finalize() == counterfactual_explanations.summary_importance
+
+        with pytest.raises(UserConfigValidationException):
+            accumulator.merge(self.exp.get_feature_importance_accumulator(atol=1e-3))
+
     @pytest.mark.parametrize("version", ['1.0', '2.0'])
     def test_empty_counterfactual_explanations_object(self, version):
 
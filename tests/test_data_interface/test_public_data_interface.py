@@ -177,3 +177,32 @@ class TestUserDataCorruption:
                      outcome_name='income', permitted_range={'age': [45, 60]},
                      continuous_features_precision={'hours_per_week': 2})
         pd.testing.assert_frame_equal(dataset, dataset_copy)
+
+
+class TestStatisticsCache:
+
+    def test_statistics_cache(self):
+        dataset = load_iris(as_frame=True).frame
+        d = dice_ml.Data(dataframe=dataset, continuous_features=load_iris().feature_names,
+                         outcome_name='target')
+        feature = d.continuous_feature_names[0]
+
+        minx, maxx = d.get_continuous_min_max()
+        assert minx[0] == pytest.approx(dataset[feature].min())
+        assert maxx[0] == pytest.approx(dataset[feature].max())
+        # cached statistics are returned as copies, so callers can modify them freely
+        mads = d.get_mads()
+        mads[feature] = -1
+        assert d.get_mads()[feature] > 0
+
+        # replacing the training data invalidates the cache
+        d.data_df = d.data_df[d.data_df[feature] > d.data_df[feature].min()]
+        minx, _ = d.get_continuous_min_max()
+        assert minx[0] == pytest.approx(d.data_df[feature].min())
+        assert d.normalize_data(d.data_df)[feature].min() == pytest.approx(0.0)
+
+        # in-place modifications are taken into account after invalidate_statistics
+        d.data_df.loc[:, feature] = d.data_df[feature] * 2
+        d.invalidate_statistics()
+        _, maxx = d.get_continuous_min_max()
+        assert maxx[0] == pytest.approx(d.data_df[feature].max())
@@ -1,5 +1,6 @@
 import pytest
 import numpy as np
+import pandas as pd
 import dice_ml
 from dice_ml.utils import helpers
 from dice_ml.utils.exception import UserConfigValidationException
@@ -71,7 +72,7 @@ class TestDiceKDBinaryClassificationMethods:
 
     # Verifying the output of the KD tree
     @pytest.mark.parametrize("desired_class, total_CFs", [(0, 1)])
-    @pytest.mark.parametrize('posthoc_sparsity_algorithm', ['linear', 'binary', None])
+    @pytest.mark.parametrize('posthoc_sparsity_algorithm', ['linear', 'binary', 'grid', None])
     def test_KD_tree_output(self, desired_class, sample_custom_query_1, total_CFs, posthoc_sparsity_algorithm):
         self.exp._generate_counterfactuals(query_instance=sample_custom_query_1, desired_class=desired_class,
                                            total_CFs=total_CFs,
@@ -155,13 +156,29 @@ class TestDiceKDBinaryClassificationMethods:
 
     # Testing for index returned
     @pytest.mark.parametrize("desired_class, total_CFs", [(0, 1)])
-    @pytest.mark.parametrize('posthoc_sparsity_algorithm', ['linear', 'binary', None])
+    @pytest.mark.parametrize('posthoc_sparsity_algorithm', ['linear', 'binary', 'grid', None])
     def test_index(self, desired_class, sample_custom_query_index, total_CFs, posthoc_sparsity_algorithm):
         self.exp._generate_counterfactuals(query_instance=sample_custom_query_index, total_CFs=total_CFs,
                                            desired_class=desired_class,
                                            posthoc_sparsity_algorithm=posthoc_sparsity_algorithm)
         assert self.exp.final_cfs_df.index[0] == 3
 
+    # Testing that the KD trees are built once per desired class and rebuilt when the data changes
+    def test_KD_tree_cache(self, mocker):
+        predict = mocker.spy(self.exp.model.model, 'predict')
+        KD_tree_0 = self.exp.get_KD_tree(None, 0, self.exp.predicted_outcome_name)
+        KD_tree_1 = self.exp.get_KD_tree(None, 1, self.exp.predicted_outcome_name)
+        assert self.exp.get_KD_tree(None, 0.0, self.exp.predicted_outcome_name) is KD_tree_0
+        assert KD_tree_1 is not KD_tree_0
+        assert predict.call_count == 1
+        dummy_columns = self.exp.get_training_dummy_columns()
+        assert self.exp.get_training_dummy_columns() is dummy_columns
+
+        self.exp.data_interface.data_df = self.exp.data_interface.data_df.copy()
+        assert self.exp.get_KD_tree(None, 0, self.exp.predicted_outcome_name) is not KD_tree_0
+        assert predict.call_count == 2
+        assert self.exp.get_training_dummy_columns() is not dummy_columns
+
 
 class TestDiceKDMultiClassificationMethods:
     @pytest.fixture(autouse=True)
@@ -171,7 +188,7 @@ class TestDiceKDMultiClassificationMethods:
 
     # Testing that the output of multiclass classification lies in the desired_class
     @pytest.mark.parametrize("desired_class, total_CFs", [(2, 3)])
-    @pytest.mark.parametrize('posthoc_sparsity_algorithm', ['linear', 'binary', None])
+    @pytest.mark.parametrize('posthoc_sparsity_algorithm', ['linear', 'binary', 'grid', None])
     def test_KD_tree_output(self, desired_class, sample_custom_query_2, total_CFs,
                             posthoc_sparsity_algorithm):
         self.exp_multi._generate_counterfactuals(query_instance=sample_custom_query_2, total_CFs=total_CFs,
@@ -216,7 +233,7 @@ class TestDiceKDRegressionMethods:
     # Testing that the output of regression lies in the desired_range
     @pytest.mark.parametrize("desired_range, total_CFs", [([1, 2.8], 6)])
     @pytest.mark.parametrize("version", ['2.0', '1.0'])
-    @pytest.mark.parametrize('posthoc_sparsity_algorithm', ['linear', 'binary', None])
+    @pytest.mark.parametrize('posthoc_sparsity_algorithm', ['linear', 'binary', 'grid', None])
     def test_KD_tree_output(self, desired_range, sample_custom_query_2, total_CFs, version, posthoc_sparsity_algorithm):
         cf_examples = self.exp_regr._generate_counterfactuals(query_instance=sample_custom_query_2, total_CFs=total_CFs,
                                                               desired_range=desired_range,
@@ -251,3 +268,25 @@ class TestDiceKDRegressionMethods:
     def test_zero_cfs(self, desired_class, desired_range, sample_custom_query_4, total_CFs):
         self.exp_regr._generate_counterfactuals(query_instance=sample_custom_query_4, total_CFs=total_CFs,
                                                 desired_range=desired_range)
+
+    # Testing that batch mode returns valid counterfactuals for every query instance, and runs the post-hoc
+    # sparsity search of all query instances together with the same results as one query instance at a time
+    @pytest.mark.parametrize("desired_range, total_CFs", [([1, 2.8], 2)])
+    def test_batch_mode(self, desired_range, sample_custom_query_10, total_CFs, mocker):
+        sparsity_batch = mocker.spy(self.exp_regr, 'do_posthoc_sparsity_enhancement_batch')
+        counterfactual_explanations = self.exp_regr.generate_counterfactuals(
+                                            query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                            desired_range=desired_range, batch_mode=True)
+
+        assert len(counterfactual_explanations.cf_examples_list) == sample_custom_query_10.shape[0]
+        for cf_examples in counterfactual_explanations.cf_examples_list:
+            assert cf_examples.final_cfs_df.shape[0] == total_CFs
+        assert all(desired_range[0] <= i <= desired_range[1] for i in self.exp_regr.cfs_preds)
+        assert sparsity_batch.call_count == 1
+
+        sequential_explanations = self.exp_regr.generate_counterfactuals(
+                                            query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                            desired_range=desired_range)
+        for cf_examples, sequential_cf_examples in zip(counterfactual_explanations.cf_examples_list,
+                                                       sequential_explanations.cf_examples_list):
+            pd.testing.assert_frame_equal(cf_examples.final_cfs_df_sparse, sequential_cf_examples.final_cfs_df_sparse)
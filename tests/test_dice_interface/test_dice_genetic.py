@@ -1,7 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
 import pytest
 import dice_ml
 from dice_ml.utils import helpers
 from dice_ml.utils.exception import UserConfigValidationException
+from dice_ml.explainer_interfaces import dice_genetic
+from dice_ml.explainer_interfaces.dice_genetic import FitnessCache
 
 
 @pytest.fixture
@@ -67,6 +73,86 @@ class TestDiceGeneticBinaryClassificationMethods:
                                                  initialization=initialization)
         assert all(ans.final_cfs_df[self.exp.data_interface.outcome_name].values == [desired_class] * total_CFs)
 
+    # Testing that offsprings only mutate the features to vary
+    def test_mate(self, sample_custom_query_2):
+        self.exp.setup(["Numerical"], None, sample_custom_query_2, "inverse_mad")
+        self.exp.feature_range = self.exp.get_valid_feature_range(normalized=False)
+        self.exp.mutation_ranges = self.exp.get_mutation_ranges(["Numerical"])
+        query_instance = self.exp.label_encode(sample_custom_query_2.copy()).values[0].astype(float)
+        parents = np.tile(query_instance, (500, 1))
+        offsprings = self.exp.mate(parents, parents, ["Numerical"], query_instance)
+
+        assert offsprings.shape == parents.shape
+        numerical_ix = self.exp.data_interface.feature_names.index("Numerical")
+        mutated = offsprings[offsprings[:, numerical_ix] != query_instance[numerical_ix], numerical_ix]
+        assert len(mutated) > 0
+        low, high = self.exp.feature_range["Numerical"]
+        assert np.all((mutated >= low) & (mutated <= high))
+        # mutated genes are resampled within the range rather than collapsing onto one value
+        assert len(np.unique(mutated)) > 1
+        precision = self.exp.data_interface.get_decimal_precisions()[numerical_ix]
+        np.testing.assert_array_equal(mutated, np.round(mutated, precision))
+        assert np.all(np.delete(offsprings, numerical_ix, axis=1) == np.delete(parents, numerical_ix, axis=1))
+        assert self.exp.mate(parents[0], parents[0], ["Numerical"], query_instance).shape == query_instance.shape
+
+    # Testing that the hash-based dedup of a population matches np.unique, including its order
+    def test_get_unique_rows(self):
+        population = np.array([[3.0, 1.0], [1.0, 2.0], [3.0, 1.0], [0.0, 5.0], [-0.0, 5.0], [1.0, 2.0]])
+        np.testing.assert_array_equal(self.exp.get_unique_rows(population), population[[3, 1, 0]])
+        population = np.random.default_rng(0).integers(3, size=(200, 4)).astype(float)
+        np.testing.assert_array_equal(self.exp.get_unique_rows(population), np.unique(population, axis=0))
+        assert self.exp.get_unique_rows(population[:0]).shape == (0, 4)
+
+    # Testing that label decoding inverts label encoding, for one instance and for many
+    def test_label_decode(self):
+        data_df = self.exp.data_interface.data_df[self.exp.data_interface.feature_names]
+        encoded = self.exp.label_encode(data_df.copy()).values
+        pd.testing.assert_frame_equal(self.exp.label_decode(encoded), data_df.reset_index(drop=True),
+                                      check_dtype=False, check_categorical=False)
+        pd.testing.assert_frame_equal(self.exp.label_decode(encoded[1]), data_df[1:2].reset_index(drop=True),
+                                      check_dtype=False, check_categorical=False)
+        assert self.exp.label_decode_cfs([]) is None
+        assert len(self.exp.label_decode_cfs(list(encoded))) == len(data_df)
+
+    # Testing that the fitness cache reuses the loss terms of known genomes without changing the results
+    @pytest.mark.parametrize("desired_class, total_CFs", [(1, 2)])
+    def test_fitness_cache(self, desired_class, sample_custom_query_2, total_CFs):
+        cfs = []
+        for fitness_cache_size in [None, 10000]:
+            features_to_vary = self.exp.setup("all", None, sample_custom_query_2, "inverse_mad")
+            ans = self.exp._generate_counterfactuals(query_instance=sample_custom_query_2,
+                                                     features_to_vary=features_to_vary, total_CFs=total_CFs,
+                                                     desired_class=desired_class, initialization="random",
+                                                     random_seed=9, fitness_cache_size=fitness_cache_size)
+            cfs.append(ans.final_cfs_df)
+        pd.testing.assert_frame_equal(cfs[0], cfs[1])
+        assert len(self.exp.fitness_cache_stats) == 1
+        assert self.exp.fitness_cache_stats[0]['hits'] > 0
+        assert 0 < self.exp.fitness_cache_stats[0]['hit_rate'] < 1
+
+    @pytest.mark.parametrize("desired_class", [1])
+    def test_do_random_init(self, desired_class, sample_custom_query_2, mocker):
+        features_to_vary = self.exp.setup("all", None, sample_custom_query_2, "inverse_mad")
+        self.exp._generate_counterfactuals(query_instance=sample_custom_query_2, features_to_vary=features_to_vary,
+                                           total_CFs=2, desired_class=desired_class, initialization="random",
+                                           maxiterations=1, random_seed=3)
+        query_instance = self.exp.label_encode(sample_custom_query_2).values[0]
+        spy = mocker.spy(self.exp, 'predict_fn_scores')
+        inits = self.exp.do_random_init(20, features_to_vary, query_instance, desired_class, None)
+        assert inits.shape == (20, self.exp.data_interface.number_of_features)
+        assert self.exp._decide_sparsity_validity(self.exp.predict_fn_scores(inits)).all()
+        assert spy.call_count <= 3
+
+        # once the budget is used up, the population is completed with invalid candidates, also when the budget
+        # is not a multiple of the block size or is smaller than the population
+        self.exp.target_cf_class = np.array([[5]])
+        for max_init_model_rows in [250, 105, 10]:
+            spy.reset_mock()
+            self.exp.max_init_model_rows = max_init_model_rows
+            inits = self.exp.do_random_init(20, features_to_vary, query_instance, 5, None)
+            assert inits.shape == (20, self.exp.data_interface.number_of_features)
+            assert sum(len(call.args[0]) for call in spy.call_args_list) == max_init_model_rows
+
     # Testing that the features_to_vary argument actually varies only the features that you wish to vary
     @pytest.mark.parametrize("desired_class, total_CFs, features_to_vary, initialization",
                              [(1, 2, ["Numerical"], "kdtree"), (1, 2, ["Numerical"], "random")])
@@ -109,10 +195,13 @@ class TestDiceGeneticBinaryClassificationMethods:
                                                  total_CFs=total_CFs, desired_class=desired_class,
                                                  initialization=initialization)
 
+        # under the loss, an invalid counterfactual can outrank the second valid one, so fewer than total_CFs
+        # counterfactuals may be returned
+        assert ans.final_cfs_df.shape[0] > 0
         for feature in permitted_range:
             assert all(
-                permitted_range[feature][0] <= ans.final_cfs_df[feature].values[i] <= permitted_range[feature][1] for i
-                in range(total_CFs))
+                permitted_range[feature][0] <= value <= permitted_range[feature][1]
+                for value in ans.final_cfs_df[feature].values)
 
     # Testing if an error is thrown when the query instance has an unknown categorical variable
     @pytest.mark.parametrize("desired_class, total_CFs", [(0, 1)])
@@ -242,3 +331,101 @@ class TestDiceGeneticRegressionMethods:
         self.exp._generate_counterfactuals(query_instance=sample_custom_query_2,
                                            total_CFs=total_CFs, desired_range=desired_range,
                                            initialization=initialization)
+
+    # Testing that batch mode returns valid counterfactuals for every query instance
+    @pytest.mark.parametrize("desired_range, total_CFs, initialization",
+                             [([1, 2.8], 2, "kdtree"), ([1, 2.8], 2, "random")])
+    def test_batch_mode(self, desired_range, sample_custom_query_10, total_CFs, initialization):
+        counterfactual_explanations = self.exp.generate_counterfactuals(
+                                            query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                            desired_range=desired_range, initialization=initialization,
+                                            batch_mode=True)
+
+        assert len(counterfactual_explanations.cf_examples_list) == sample_custom_query_10.shape[0]
+        for cf_examples in counterfactual_explanations.cf_examples_list:
+            for i in cf_examples.final_cfs_df[self.exp.data_interface.outcome_name].values:
+                assert desired_range[0] <= i <= desired_range[1]
+
+    # Testing that a random seed makes the counterfactuals reproducible, also across the threads of a pool
+    @pytest.mark.parametrize("desired_range, total_CFs", [([1, 2.8], 2)])
+    def test_random_seed(self, desired_range, sample_custom_query_10, total_CFs):
+        cf_examples_lists = []
+        for executor in [None, ThreadPoolExecutor]:
+            counterfactual_explanations = self.exp.generate_counterfactuals(
+                                                query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                                desired_range=desired_range, initialization="random",
+                                                n_jobs=2, executor=executor, random_seed=3, maxiterations=20)
+            cf_examples_lists.append(counterfactual_explanations.cf_examples_list)
+
+        for cf_examples_1, cf_examples_2 in zip(*cf_examples_lists):
+            pd.testing.assert_frame_equal(cf_examples_1.final_cfs_df, cf_examples_2.final_cfs_df)
+
+    # Testing that the island model returns valid counterfactuals, reproducibly across worker pools, with one
+    # pool of workers for all the query instances
+    @pytest.mark.parametrize("desired_range, total_CFs", [([1, 2.8], 2)])
+    def test_islands(self, desired_range, sample_custom_query_10, total_CFs, mocker):
+        create_worker_pool = mocker.spy(dice_genetic, 'create_worker_pool')
+        cf_examples_lists = []
+        for island_executor in [ThreadPoolExecutor, None]:
+            counterfactual_explanations = self.exp.generate_counterfactuals(
+                                                query_instances=sample_custom_query_10[:3], total_CFs=total_CFs,
+                                                desired_range=desired_range, initialization="random",
+                                                num_islands=3, migration_interval=2, island_executor=island_executor,
+                                                random_seed=5, maxiterations=20)
+            cf_examples_lists.append(counterfactual_explanations.cf_examples_list)
+        assert create_worker_pool.call_count == 2
+
+        for cf_examples_1, cf_examples_2 in zip(*cf_examples_lists):
+            pd.testing.assert_frame_equal(cf_examples_1.final_cfs_df, cf_examples_2.final_cfs_df)
+            for i in cf_examples_1.final_cfs_df[self.exp.data_interface.outcome_name].values:
+                assert desired_range[0] <= i <= desired_range[1]
+
+        # the workers get a copy of the explainer without the training data and the caches
+        worker_explainer = self.exp.get_island_worker_explainer()
+        assert worker_explainer.label_encoded_data is None and worker_explainer._KD_trees == {}
+        assert self.exp.label_encoded_data is not None and self.exp._island_pool is None
+
+        with pytest.raises(UserConfigValidationException):
+            self.exp.generate_counterfactuals(query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                              desired_range=desired_range, num_islands=0)
+
+    # Testing that evolving the populations of a batch side by side gives the same counterfactuals
+    @pytest.mark.parametrize("desired_range, total_CFs, initialization",
+                             [([1, 2.8], 2, "kdtree"), ([1, 2.8], 2, "random")])
+    def test_stack_populations(self, desired_range, sample_custom_query_10, total_CFs, initialization, mocker):
+        cf_examples_lists = []
+        model_calls = []
+        spy = mocker.spy(self.exp, 'get_loss_model_output')
+        for stack_populations in [False, True]:
+            spy.reset_mock()
+            counterfactual_explanations = self.exp.generate_counterfactuals(
+                                                query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                                desired_range=desired_range, initialization=initialization,
+                                                batch_mode=True, random_seed=7, maxiterations=20,
+                                                stack_populations=stack_populations)
+            cf_examples_lists.append(counterfactual_explanations.cf_examples_list)
+            model_calls.append(spy.call_count)
+
+        for cf_examples_1, cf_examples_2 in zip(*cf_examples_lists):
+            pd.testing.assert_frame_equal(cf_examples_1.final_cfs_df, cf_examples_2.final_cfs_df)
+        # one model call per generation for the whole batch
+        assert model_calls[1] <= 20 < model_calls[0]
+
+        with pytest.raises(UserConfigValidationException):
+            self.exp.generate_counterfactuals(query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                              desired_range=desired_range, batch_mode=True, stack_populations=True,
+                                              num_islands=2)
+
+
+class TestFitnessCache:
+    def test_lru_eviction(self):
+        cache = FitnessCache(maxsize=2)
+        cache.put(b'a', 1)
+        cache.put(b'b', 2)
+        assert cache.get(b'a') == 1
+        cache.put(b'c', 3)
+        assert len(cache) == 2
+        assert cache.get(b'b') is None
+        assert cache.get(b'a') == 1 and cache.get(b'c') == 3
+        assert cache.hits == 3 and cache.misses == 1
+        assert cache.hit_rate == 0.75
@@ -1,9 +1,13 @@
+import sys
 import pytest
+import pandas as pd
 import dice_ml
 from dice_ml.utils import helpers
 from dice_ml.utils.exception import UserConfigValidationException
+from dice_ml.utils.sinks import JSONLinesSink
 from dice_ml.diverse_counterfactuals import CounterfactualExamples
 from dice_ml.counterfactual_explanations import CounterfactualExplanations
+from dice_ml.explainer_interfaces.dice_random import UniqueRowsReservoir
 
 
 @pytest.fixture
@@ -166,6 +170,57 @@ class TestDiceRandomBinaryClassificationMethods:
                                            total_CFs=total_CFs, desired_class=desired_class,
                                            desired_range=desired_range, permitted_range=permitted_range)
 
+    def test_get_samples(self):
+        self.exp.setup("all", {'Numerical': [10, 20]}, pd.DataFrame({'Categorical': ['a'], 'Numerical': [15]}), None)
+        samples = self.exp.get_samples({}, self.exp.feature_range, sampling_random_seed=7, sampling_size=500)
+        assert samples.shape == (500, 2)
+        assert samples['Numerical'].between(10, 20).all()
+        assert set(samples['Categorical']) <= set(self.exp.feature_range['Categorical'])
+        pd.testing.assert_frame_equal(
+            samples, self.exp.get_samples({}, self.exp.feature_range, sampling_random_seed=7, sampling_size=500))
+
+        fixed_samples = self.exp.get_samples({'Categorical': 'b'}, self.exp.feature_range,
+                                             sampling_random_seed=7, sampling_size=10)
+        assert (fixed_samples['Categorical'] == 'b').all()
+
+    @pytest.mark.parametrize("sampling", ["sobol", "lhs"])
+    def test_get_samples_space_filling(self, sampling):
+        self.exp.setup("all", {'Numerical': [10, 20]}, pd.DataFrame({'Categorical': ['a'], 'Numerical': [15]}), None)
+        samples = self.exp.get_samples({}, self.exp.feature_range, sampling_random_seed=7, sampling_size=300,
+                                       sampling=sampling)
+        assert samples.shape == (300, 2)
+        assert samples['Numerical'].between(10, 20).all()
+        # the levels of a categorical feature are stratified
+        level_counts = samples['Categorical'].value_counts()
+        assert len(level_counts) == len(self.exp.feature_range['Categorical'])
+        assert level_counts.max() - level_counts.min() <= 1
+
+    @pytest.mark.parametrize("desired_class, total_CFs, sampling", [(0, 2, "sobol"), (0, 2, "lhs")])
+    def test_sampling(self, desired_class, sample_custom_query_1, total_CFs, sampling):
+        ans = self.exp.generate_counterfactuals(query_instances=sample_custom_query_1, desired_class=desired_class,
+                                                total_CFs=total_CFs, sampling=sampling, random_seed=5)
+        assert all(ans.cf_examples_list[0].final_cfs_df[self.exp.data_interface.outcome_name].values ==
+                   [desired_class] * total_CFs)
+
+        with pytest.raises(UserConfigValidationException):
+            self.exp.generate_counterfactuals(query_instances=sample_custom_query_1, desired_class=desired_class,
+                                              total_CFs=total_CFs, sampling="grid")
+
+    # Testing that the space-filling designs fail with a clear message when scipy.stats.qmc cannot be imported
+    @pytest.mark.parametrize("sampling", ["sobol", "lhs"])
+    def test_sampling_without_qmc(self, sample_custom_query_1, sampling, monkeypatch):
+        monkeypatch.setitem(sys.modules, 'scipy.stats', None)
+        with pytest.raises(UserConfigValidationException, match="scipy>=1.7"):
+            self.exp.generate_counterfactuals(query_instances=sample_custom_query_1, desired_class=0,
+                                              total_CFs=2, sampling=sampling)
+
+    @pytest.mark.parametrize("desired_class, total_CFs", [(0, 2)])
+    def test_random_seed(self, desired_class, sample_custom_query_1, total_CFs):
+        cfs = [self.exp.generate_counterfactuals(query_instances=sample_custom_query_1, desired_class=desired_class,
+                                                 total_CFs=total_CFs, random_seed=5).cf_examples_list[0].final_cfs_df
+               for _ in range(2)]
+        pd.testing.assert_frame_equal(cfs[0], cfs[1])
+
 
 class TestDiceRandomMultiClassificationMethods:
     @pytest.fixture(autouse=True)
@@ -271,3 +326,173 @@ class TestDiceRandomRegressionMethods:
         self.exp._generate_counterfactuals(features_to_vary=features_to_vary, query_instance=sample_custom_query_2,
                                            total_CFs=total_CFs, desired_class=desired_class,
                                            desired_range=desired_range, permitted_range=permitted_range)
+
+    # Testing that batch mode returns valid counterfactuals for every query instance
+    @pytest.mark.parametrize("desired_range, total_CFs", [([1, 2.8], 2)])
+    def test_batch_mode(self, desired_range, sample_custom_query_10, total_CFs):
+        counterfactual_explanations = self.exp.generate_counterfactuals(
+                                            query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                            desired_range=desired_range, batch_mode=True)
+
+        assert len(counterfactual_explanations.cf_examples_list) == sample_custom_query_10.shape[0]
+        for cf_examples in counterfactual_explanations.cf_examples_list:
+            outcomes = cf_examples.final_cfs_df[self.exp.data_interface.outcome_name].values
+            assert len(outcomes) == total_CFs
+            assert all(desired_range[0] <= i <= desired_range[1] for i in outcomes)
+
+    # Testing that a shared candidate pool gives valid counterfactuals for every query instance
+    @pytest.mark.parametrize("desired_range, total_CFs", [([1, 2.8], 2)])
+    def test_batch_mode_shared_pool(self, desired_range, sample_custom_query_10, total_CFs):
+        cf_examples_lists = []
+        for _ in range(2):
+            counterfactual_explanations = self.exp.generate_counterfactuals(
+                                                query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                                desired_range=desired_range, batch_mode=True, shared_pool=True,
+                                                random_seed=11)
+            cf_examples_lists.append(counterfactual_explanations.cf_examples_list)
+
+        assert len(cf_examples_lists[0]) == sample_custom_query_10.shape[0]
+        for cf_examples_1, cf_examples_2 in zip(*cf_examples_lists):
+            outcomes = cf_examples_1.final_cfs_df[self.exp.data_interface.outcome_name].values
+            assert len(outcomes) == total_CFs
+            assert all(desired_range[0] <= i <= desired_range[1] for i in outcomes)
+            pd.testing.assert_frame_equal(cf_examples_1.final_cfs_df, cf_examples_2.final_cfs_df)
+
+    # Testing that adaptive sampling stops early on easy queries and respects the row budget
+    @pytest.mark.parametrize("desired_range, total_CFs", [([1, 2.8], 2)])
+    def test_adaptive_sampling(self, desired_range, sample_custom_query_10, total_CFs):
+        counterfactual_explanations = self.exp.generate_counterfactuals(
+                                            query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                            desired_range=desired_range, batch_mode=True, adaptive=True,
+                                            max_model_rows=500)
+
+        assert len(self.exp.budget_used) == sample_custom_query_10.shape[0]
+        for cf_examples, budget_used in zip(counterfactual_explanations.cf_examples_list, self.exp.budget_used):
+            assert budget_used['model_rows'] <= 500
+            if not budget_used['budget_exhausted']:
+                assert len(cf_examples.final_cfs_df) == total_CFs
+
+        self.exp.generate_counterfactuals(query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                          desired_range=desired_range, batch_mode=True, time_budget=0)
+        assert all(budget_used['budget_exhausted'] and budget_used['model_rows'] == 0
+                   for budget_used in self.exp.budget_used)
+
+    # Testing that every query instance reports the time until it left the search, not that of the batch
+    @pytest.mark.parametrize("desired_range, total_CFs", [([0.5, 1.2], 2)])
+    def test_adaptive_elapsed_per_query(self, desired_range, sample_custom_query_10, total_CFs):
+        self.exp.generate_counterfactuals(query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                          desired_range=desired_range, batch_mode=True, adaptive=True,
+                                          max_model_rows=500, random_seed=3)
+
+        # the query instances of a batch are swept in lockstep, so the ones that scored fewer rows left the
+        # search earlier
+        model_rows = [budget_used['model_rows'] for budget_used in self.exp.budget_used]
+        assert len(set(model_rows)) > 1
+        for budget_used_1 in self.exp.budget_used:
+            for budget_used_2 in self.exp.budget_used:
+                if budget_used_1['model_rows'] < budget_used_2['model_rows']:
+                    assert budget_used_1['elapsed'] < budget_used_2['elapsed']
+
+    # Testing that adaptive sampling with only a time budget does not grow its samples past sample_size
+    @pytest.mark.parametrize("desired_range, total_CFs", [([100, 200], 2)])
+    def test_adaptive_time_budget(self, desired_range, sample_custom_query_10, total_CFs, mocker):
+        spy = mocker.spy(self.exp, 'predict_fn')
+        self.exp.generate_counterfactuals(query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                          desired_range=desired_range, batch_mode=True, adaptive=True,
+                                          sample_size=50, time_budget=0.5)
+
+        num_queries = sample_custom_query_10.shape[0]
+        round_rows = [len(call.args[0]) for call in spy.call_args_list[1:]]
+        assert max(round_rows) <= num_queries * 50
+        for budget_used in self.exp.budget_used:
+            assert budget_used['budget_exhausted']
+            assert budget_used['model_rows'] <= 50 * len(round_rows)
+            assert budget_used['elapsed'] < 1.5
+
+    # Testing that the counterfactuals do not depend on the number of workers
+    @pytest.mark.parametrize("desired_range, total_CFs", [([1, 2.8], 2)])
+    def test_n_jobs(self, desired_range, sample_custom_query_10, total_CFs):
+        cf_examples_lists = []
+        for n_jobs in [1, 2]:
+            counterfactual_explanations = self.exp.generate_counterfactuals(
+                                                query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                                desired_range=desired_range, n_jobs=n_jobs, random_seed=17)
+            cf_examples_lists.append(counterfactual_explanations.cf_examples_list)
+
+        assert len(cf_examples_lists[1]) == sample_custom_query_10.shape[0]
+        for cf_examples_1, cf_examples_2 in zip(*cf_examples_lists):
+            pd.testing.assert_frame_equal(cf_examples_1.final_cfs_df, cf_examples_2.final_cfs_df)
+
+    # Testing that the sequential default derives the same per-query seeds as a single worker
+    @pytest.mark.parametrize("desired_range, total_CFs", [([1, 2.8], 2)])
+    def test_sequential_matches_n_jobs(self, desired_range, sample_custom_query_10, total_CFs):
+        cf_examples_lists = [
+            self.exp.generate_counterfactuals(query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                              desired_range=desired_range, n_jobs=n_jobs,
+                                              random_seed=17).cf_examples_list
+            for n_jobs in [None, 1]]
+
+        assert len(cf_examples_lists[0]) == sample_custom_query_10.shape[0]
+        for cf_examples_1, cf_examples_2 in zip(*cf_examples_lists):
+            pd.testing.assert_frame_equal(cf_examples_1.final_cfs_df, cf_examples_2.final_cfs_df)
+
+    # Testing that streaming yields counterfactuals for every query instance and writes them to the sink
+    @pytest.mark.parametrize("desired_range, total_CFs", [([1, 2.8], 2)])
+    def test_iter_counterfactuals(self, desired_range, sample_custom_query_10, total_CFs, tmp_path):
+        csv_path = tmp_path / "queries.csv"
+        sample_custom_query_10.to_csv(csv_path, index=False)
+        sink_path = tmp_path / "cfs.jsonl"
+        with JSONLinesSink(sink_path) as sink:
+            cf_examples_list = list(self.exp.iter_counterfactuals(
+                pd.read_csv(csv_path, chunksize=4), total_CFs=total_CFs, chunk_size=3,
+                sink=sink, desired_range=desired_range))
+
+        assert len(cf_examples_list) == sample_custom_query_10.shape[0]
+        for cf_examples in cf_examples_list:
+            outcomes = cf_examples.final_cfs_df[self.exp.data_interface.outcome_name].values
+            assert all(desired_range[0] <= i <= desired_range[1] for i in outcomes)
+        with open(sink_path) as f:
+            lines = f.readlines()
+        assert len(lines) == sample_custom_query_10.shape[0]
+        assert CounterfactualExamples.from_json(lines[0]).final_cfs_df.shape[0] == \
+            cf_examples_list[0].final_cfs_df.shape[0]
+
+    # Testing that invalid streaming arguments are rejected when iter_counterfactuals is called,
+    # before the returned generator is advanced
+    @pytest.mark.parametrize("chunk_size, sink", [(0, None), (-3, None), (2.5, None), (3, "cfs.jsonl")])
+    def test_iter_counterfactuals_invalid_arguments(self, sample_custom_query_10, chunk_size, sink):
+        with pytest.raises(UserConfigValidationException):
+            self.exp.iter_counterfactuals(sample_custom_query_10, total_CFs=2, chunk_size=chunk_size,
+                                          sink=sink, desired_range=[1, 2.8])
+
+    def test_iter_counterfactuals_unsupported_source(self):
+        with pytest.raises(ValueError):
+            self.exp.iter_counterfactuals(42, total_CFs=2, desired_range=[1, 2.8])
+
+    # Testing that the sparsity search of all query instances keeps the counterfactuals valid
+    @pytest.mark.parametrize("desired_range, total_CFs, posthoc_sparsity_algorithm",
+                             [([1, 2.8], 2, "linear"), ([1, 2.8], 2, "binary")])
+    def test_batch_mode_posthoc_sparsity(self, desired_range, sample_custom_query_10, total_CFs,
+                                         posthoc_sparsity_algorithm):
+        counterfactual_explanations = self.exp.generate_counterfactuals(
+                                            query_instances=sample_custom_query_10, total_CFs=total_CFs,
+                                            desired_range=desired_range, batch_mode=True,
+                                            posthoc_sparsity_algorithm=posthoc_sparsity_algorithm)
+
+        for cf_examples in counterfactual_explanations.cf_examples_list:
+            assert cf_examples.final_cfs_df_sparse.shape[0] == cf_examples.final_cfs_df.shape[0]
+            outcomes = cf_examples.final_cfs_df_sparse[self.exp.data_interface.outcome_name].values
+            assert all(desired_range[0] <= i <= desired_range[1] for i in outcomes)
+
+
+class TestUniqueRowsReservoir:
+    def test_dedup_and_capacity(self):
+        reservoir = UniqueRowsReservoir(3)
+        assert reservoir.to_frame() is None
+        reservoir.add(pd.DataFrame({'Categorical': ['a', 'a', 'b'], 'Numerical': [1.0, 1.0, 2.0]}))
+        reservoir.add(pd.DataFrame({'Categorical': ['b', 'c', 'd'], 'Numerical': [2.0, 3.0, 4.0]}))
+        assert reservoir.num_unique == 4
+        rows = reservoir.to_frame()
+        assert rows.shape == (3, 2)
+        assert not rows.duplicated().any()
+        assert rows['Numerical'].dtype == float
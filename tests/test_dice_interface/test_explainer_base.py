@@ -1,3 +1,5 @@
+import numpy as np
+import pandas as pd
 import pytest
 from dice_ml.utils.exception import UserConfigValidationException
 from dice_ml.explainer_interfaces.explainer_base import ExplainerBase
@@ -16,6 +18,35 @@ class TestExplainerBaseBinaryClassification:
                     total_CFs=0,
                     desired_class=desired_class)
 
+    @pytest.mark.parametrize("binary_classification_exp_object", ['random'],
+                             indirect=['binary_classification_exp_object'])
+    def test_decide_cf_validity_per_row_targets(self, binary_classification_exp_object):
+        exp = binary_classification_exp_object  # explainer object
+        scores = np.array([[0.9, 0.1], [0.3, 0.7], [0.9, 0.1], [0.3, 0.7]])
+        validity = exp.decide_cf_validity(scores, target_cf_class=np.array([0, 0, 1, 1]),
+                                          stopping_threshold=np.array([0.25, 0.25, 0.75, 0.6]))
+        assert list(validity) == [1, 0, 0, 1]
+        exp.num_output_nodes = 2
+        exp.target_cf_class = np.array([[1]])
+        exp.stopping_threshold = 0.5
+        assert exp.is_cf_valid(scores[1:2])
+        assert list(exp.get_model_output_from_scores(scores)) == [0, 1, 0, 1]
+
+    @pytest.mark.parametrize("binary_classification_exp_object", ['random'],
+                             indirect=['binary_classification_exp_object'])
+    def test_validate_query_instances(self, binary_classification_exp_object):
+        exp = binary_classification_exp_object  # explainer object
+        query_instances = pd.DataFrame({'Categorical': ['a', 'z', 'b', 'c'], 'Numerical': [25, 50, 75, 100]})
+        errors = exp.validate_query_instances(query_instances, features_to_vary=['Numerical'],
+                                              permitted_range={'Categorical': ['a', 'c']})
+        assert list(errors['outside_dataset', 'Categorical']) == [False, True, False, False]
+        assert list(errors['outside_permitted_range', 'Categorical']) == [False, True, True, False]
+        assert list(errors.any(axis=1)) == [False, True, True, False]
+
+        assert not exp.validate_query_instances(query_instances.iloc[[0, 2, 3]]).values.any()
+        with pytest.raises(ValueError, match="has a value outside the dataset"):
+            exp.generate_counterfactuals(query_instances, total_CFs=1, desired_class="opposite")
+
 
 class TestExplainerBaseMultiClassClassification:
 
@@ -30,6 +61,14 @@ class TestExplainerBaseMultiClassClassification:
                     total_CFs=0,
                     desired_class=desired_class)
 
+    @pytest.mark.parametrize("multi_classification_exp_object", ['random'],
+                             indirect=['multi_classification_exp_object'])
+    def test_decide_cf_validity_per_row_targets(self, multi_classification_exp_object):
+        exp = multi_classification_exp_object  # explainer object
+        scores = np.array([[0.6, 0.3, 0.1], [0.2, 0.3, 0.5], [0.2, 0.3, 0.5]])
+        validity = exp.decide_cf_validity(scores, target_cf_class=np.array([0, 1, 2]), stopping_threshold=0.5)
+        assert list(validity) == [1, 0, 1]
+
 
 class TestExplainerBaseRegression:
 
@@ -44,6 +83,16 @@ class TestExplainerBaseRegression:
                     total_CFs=0,
                     desired_class=desired_class)
 
+    @pytest.mark.parametrize("regression_exp_object", ['random'], indirect=['regression_exp_object'])
+    def test_decide_cf_validity_per_row_targets(self, regression_exp_object):
+        exp = regression_exp_object  # explainer object
+        preds = np.array([1.5, 1.5, 3.0])
+        validity = exp.decide_cf_validity(preds, target_cf_range=np.array([[1, 2], [2, 3], [2, 3]]))
+        assert list(validity) == [1, 0, 1]
+        exp.target_cf_range = [1, 2]
+        assert list(exp.decide_cf_validity(preds)) == [1, 1, 0]
+        assert not exp.is_cf_valid(preds[2])
+
 
 class TestExplainerBase:
 